@@ -0,0 +1,261 @@
+"""
+Throughput and latency benchmarks for the ibwebapi clients.
+
+Runs each scenario against the bundled mock gateway (in its own thread and event
+loop) and reports requests per second and p50/p99 latency per call. The mock
+gateway enforces the endpoint rate limits declared in ``IBKREndpoint`` (and the
+``--global-rate-limit``, which the client is given too), so results are comparable
+between releases as long as the same options are used. A client that exceeds the
+limits gets 429 responses; they are reported per scenario and fail the run. With the package installed
+(``pip install -e .``)::
+
+    python benchmarks/run_benchmarks.py --conids 100 --latency 0.02 --json results.json
+
+Use ``--memory`` to also report the peak traced allocation per scenario; tracing
+slows everything down, so compare timings only between runs with the same flag.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.contract_search.contract_search import Exchange
+from ibwebapi.ibkr_client import IBKRClient
+from ibwebapi.market_data.market_data import BarSize, TimePeriod
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    calls: int
+    seconds: float
+    latencies: List[float] = field(repr=False)
+    gateway_requests: int = 0
+    throttled: int = 0
+    peak_memory: Optional[int] = None
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.seconds if self.seconds else 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.gateway_requests / self.seconds if self.seconds else 0.0
+
+    def percentile(self, q: float) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[int(q) - 1]
+
+    def summary(self) -> dict:
+        result = asdict(self)
+        del result["latencies"]
+        result.update(
+            calls_per_second=round(self.calls_per_second, 2),
+            requests_per_second=round(self.requests_per_second, 2),
+            p50_ms=round(self.percentile(50) * 1000, 3),
+            p99_ms=round(self.percentile(99) * 1000, 3),
+        )
+        return result
+
+
+class GatewayThread:
+    """Runs a mock gateway on its own event loop so it does not compete with the client."""
+
+    def __init__(self, gateway: MockGateway):
+        self.gateway = gateway
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self) -> MockGateway:
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.gateway.start(), self.loop).result()
+        return self.gateway
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        asyncio.run_coroutine_threadsafe(self.gateway.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def _throttled(gateway: MockGateway) -> int:
+    return sum(n for (_, status), n in gateway.responses.items() if status == 429)
+
+
+async def measure(
+    name: str,
+    gateway: MockGateway,
+    calls: List[Callable[[], Awaitable]],
+    concurrency: int,
+    trace_memory: bool,
+) -> BenchmarkResult:
+    """Runs ``calls`` with at most ``concurrency`` in flight and times each one."""
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    requests_before = sum(gateway.requests.values())
+    throttled_before = _throttled(gateway)
+
+    async def timed(call: Callable[[], Awaitable]) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    seconds = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        name,
+        len(calls),
+        seconds,
+        latencies,
+        sum(gateway.requests.values()) - requests_before,
+        _throttled(gateway) - throttled_before,
+        peak,
+    )
+
+
+async def run(args: argparse.Namespace, gateway: MockGateway) -> List[BenchmarkResult]:
+    conids = [str(265598 + i) for i in range(args.conids)]
+    symbols = [f"T{i:05d}" for i in range(args.conids)]
+    end = datetime(2024, 1, 10, 16, 0)
+    results: List[BenchmarkResult] = []
+
+    async def scenario(name: str, calls: List[Callable[[], Awaitable]]) -> None:
+        result = await measure(name, gateway, calls, args.concurrency, args.memory)
+        results.append(result)
+        print(
+            f"{name:<22} {result.calls:>6} calls {result.seconds:>8.2f}s "
+            f"{result.requests_per_second:>8.1f} req/s "
+            f"p50 {result.percentile(50) * 1000:>8.2f} ms "
+            f"p99 {result.percentile(99) * 1000:>8.2f} ms"
+            + (f" {result.throttled} x 429" if result.throttled else "")
+            + (f" peak {result.peak_memory / 1e6:.1f} MB" if result.peak_memory else "")
+        )
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        async with IBKRClient(
+            gateway.base_url,
+            cache_dir=cache_dir,
+            global_rate_limit=args.global_rate_limit,
+        ) as client:
+
+            def history(conid: str) -> Callable[[], Awaitable]:
+                return lambda: client.get_historical_data_columnar(
+                    conid, BarSize.MIN_5, TimePeriod.DAY_1, start_time=end
+                )
+
+            await scenario("history (cold)", [history(c) for c in conids])
+            await scenario("history (cached)", [history(c) for c in conids])
+            await scenario(
+                "backfill 30d 1min",
+                [
+                    lambda: client.backfill(
+                        conids[0], BarSize.MIN_1, end - timedelta(days=30), end
+                    )
+                ],
+            )
+            await scenario(
+                "snapshot",
+                [lambda: client.get_snapshot([int(c) for c in conids], max_polls=2)],
+            )
+            await scenario(
+                "stock info (cold)",
+                [lambda s=s: client.get_stock_info(s) for s in symbols],
+            )
+            await scenario(
+                "stock info (cached)",
+                [lambda s=s: client.get_stock_info(s) for s in symbols],
+            )
+            await scenario(
+                "batched symbols",
+                [lambda: client.get_contracts_for_stocks(symbols, Exchange.NASDAQ, True)],
+            )
+            await scenario(
+                "contract index",
+                [lambda: client.build_contract_index([Exchange.NASDAQ], force_refresh=True)],
+            )
+            await scenario(
+                "account summaries",
+                [
+                    lambda a=account: client.get_account_summary(a)
+                    for account in [f"U{i:07d}" for i in range(1, args.conids + 1)]
+                ],
+            )
+            await scenario("portfolio snapshot", [client.get_portfolio_snapshot])
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--conids", type=int, default=50, help="Contracts per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Calls in flight")
+    parser.add_argument("--latency", type=float, default=0.0, help="Gateway latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Gateway jitter (s)")
+    parser.add_argument(
+        "--fault-rate", type=float, default=0.0, help="Probability of a 503 response"
+    )
+    parser.add_argument(
+        "--global-rate-limit",
+        type=float,
+        default=50.0,
+        help="Requests per second across all endpoints (gateway and client)",
+    )
+    parser.add_argument(
+        "--no-rate-limit",
+        action="store_true",
+        help="Do not enforce the endpoint rate limits in the gateway",
+    )
+    parser.add_argument("--memory", action="store_true", help="Trace peak memory")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, force=True)
+    behaviors = {
+        endpoint: EndpointBehavior(
+            rate_limit=None if args.no_rate_limit else endpoint.value.rate_limit,
+            latency=args.latency,
+            jitter=args.jitter,
+            fault_rates={503: args.fault_rate} if args.fault_rate else {},
+            payload_size=args.conids if endpoint is IBKREndpoint.PORTFOLIO_ACCOUNTS else None,
+        )
+        for endpoint in IBKREndpoint
+    }
+
+    gateway = MockGateway(
+        behaviors=behaviors,
+        global_rate_limit=None if args.no_rate_limit else args.global_rate_limit,
+    )
+    with GatewayThread(gateway):
+        results = asyncio.run(run(args, gateway))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([result.summary() for result in results], f, indent=2)
+
+    throttled = sum(result.throttled for result in results)
+    if throttled:
+        raise SystemExit(f"The client exceeded the rate limits: {throttled} x 429")
+
+
+if __name__ == "__main__":
+    main()
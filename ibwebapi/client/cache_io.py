@@ -0,0 +1,56 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Set
+
+from ibwebapi.client.codec import default_codec
+
+
+def atomic_write(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """
+    Writes a file through a temporary file in the same directory and renames it into
+    place, so readers (including memory-mapped ones) never see a partial file and
+    concurrent writers cannot interleave.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: Path, obj: Any) -> None:
+    data = default_codec.dumps(obj)
+    atomic_write(path, lambda f: f.write(data))
+
+
+def read_json(path: Path) -> Any:
+    """Returns the decoded contents of ``path``, or None if it does not exist."""
+    try:
+        with Path(path).open("rb") as f:
+            return default_codec.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+class CacheDirectories:
+    """Creates cache directories at most once per process."""
+
+    def __init__(self):
+        self._created: Set[Path] = set()
+        self._lock = threading.Lock()
+
+    def ensure(self, path: Path) -> Path:
+        if path not in self._created:
+            path.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._created.add(path)
+        return path
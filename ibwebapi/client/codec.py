@@ -0,0 +1,252 @@
+import codecs
+import json
+import re
+from dataclasses import is_dataclass
+from datetime import date, datetime
+from enum import Enum
+from json.decoder import WHITESPACE
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+
+JSONInput = Union[bytes, bytearray, memoryview, str]
+T = TypeVar("T")
+
+_NUMBER_CHARS = re.compile(r"[0-9.eE+-]*")
+
+
+def _default(obj: Any) -> Any:
+    """Serializes the non-JSON types used by the API models."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return obj.__dict__
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONCodec:
+    """
+    JSON encoding and decoding with the standard library.
+
+    Faster backends subclass this; all of them decode bytes or str, encode to
+    compact UTF-8 bytes, and serialize datetimes, enums and dataclasses the same way.
+    """
+
+    name = "json"
+    # Whether loads_as decodes straight into dataclasses
+    typed_decoding = False
+
+    def loads(self, data: JSONInput) -> Any:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def loads_as(self, data: JSONInput, type_: Type[T]) -> T:
+        """
+        Decodes JSON directly into ``type_`` (e.g. a dataclass) in a single pass.
+
+        :raises NotImplementedError: If the backend does not support typed decoding
+        :raises ValueError: If the document does not match ``type_``
+        """
+        raise NotImplementedError(f"The {self.name} codec does not decode into types")
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON codec backed by ``orjson``."""
+
+    name = "orjson"
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError as e:
+            raise ImportError("The orjson codec requires the 'orjson' package") from e
+
+        self._loads = orjson.loads
+        self._dumps = orjson.dumps
+        # Keep dataclasses and datetimes consistent with the other backends
+        self._options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+
+    def loads(self, data: JSONInput) -> Any:
+        return self._loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._dumps(obj, default=_default, option=self._options)
+
+
+class MsgspecCodec(JSONCodec):
+    """JSON codec backed by ``msgspec``."""
+
+    name = "msgspec"
+    typed_decoding = True
+
+    def __init__(self):
+        try:
+            import msgspec
+        except ImportError as e:
+            raise ImportError("The msgspec codec requires the 'msgspec' package") from e
+
+        self._decoder_type = msgspec.json.Decoder
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder(enc_hook=_default)
+        self._typed_decoders: Dict[type, Any] = {}
+
+    def loads(self, data: JSONInput) -> Any:
+        return self._decoder.decode(data)
+
+    def loads_as(self, data: JSONInput, type_: Type[T]) -> T:
+        decoder = self._typed_decoders.get(type_)
+        if decoder is None:
+            decoder = self._typed_decoders[type_] = self._decoder_type(type_)
+        # msgspec's ValidationError is a ValueError
+        return decoder.decode(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+
+_CODECS: Dict[str, Type[JSONCodec]] = {
+    codec.name: codec for codec in (JSONCodec, OrjsonCodec, MsgspecCodec)
+}
+
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """
+    Returns a JSON codec.
+
+    :param name: "json", "orjson" or "msgspec"; None picks the fastest installed backend
+    :return: The codec
+    """
+    if name is not None:
+        try:
+            return _CODECS[name]()
+        except KeyError:
+            raise ValueError(f"Unknown JSON codec: {name}") from None
+    for codec in (MsgspecCodec, OrjsonCodec):
+        try:
+            return codec()
+        except ImportError:
+            continue
+    return JSONCodec()
+
+
+# Shared by clients and caches unless a codec is passed explicitly
+default_codec = get_codec()
+
+
+class JSONArrayParser:
+    """
+    Incremental parser for a JSON array received in chunks.
+
+    :meth:`feed` returns the elements completed by each chunk, so only the element
+    being received is buffered, never the whole array. A body that is not an array
+    (e.g. a single object) is buffered and returned as one element by :meth:`close`.
+
+    :param codec: Codec for decoding runs of complete elements (default: the fastest
+        installed)
+    """
+
+    def __init__(self, codec: Optional[JSONCodec] = None):
+        self._codec = codec or default_codec
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._in_array: Optional[bool] = None
+        self._separator = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Adds a chunk of the body and returns the elements it completed."""
+        self._buffer = self._buffer[self._pos :] + self._text.decode(chunk)
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """Returns the remaining elements; raises ValueError if the body was truncated."""
+        self._buffer = self._buffer[self._pos :] + self._text.decode(b"", final=True)
+        self._pos = 0
+        if self._in_array is False:
+            self.done = True
+            return [self._codec.loads(self._buffer)]
+        elements = self._parse(final=True)
+        if not self.done:
+            raise ValueError("JSON array ended unexpectedly")
+        return elements
+
+    def _parse(self, final: bool) -> List[Any]:
+        buffer = self._buffer
+        end = len(buffer)
+        pos = WHITESPACE.match(buffer, self._pos).end()
+        if self._in_array is None:
+            if pos == end:
+                return []
+            self._in_array = buffer[pos] == "["
+            pos += self._in_array
+        if not self._in_array:
+            return []
+
+        elements = self._parse_objects(buffer, pos)
+        if elements:
+            pos = self._pos
+        while not self.done:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos == end:
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                pos += 1
+            elif self._separator:
+                if buffer[pos] != ",":
+                    raise ValueError(f"Expected ',' or ']', got {buffer[pos]!r}")
+                self._separator = False
+                pos += 1
+            else:
+                try:
+                    element, element_end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number at the end of the buffer may continue in the next chunk
+                if (
+                    not final
+                    and isinstance(element, (int, float))
+                    and _NUMBER_CHARS.match(buffer, element_end).end() == end
+                ):
+                    break
+                elements.append(element)
+                self._separator = True
+                pos = element_end
+        self._pos = pos
+        return elements
+
+    def _parse_objects(self, buffer: str, pos: int) -> List[Any]:
+        """
+        Decodes the elements up to the last ``},`` with a single codec call.
+
+        This is only a shortcut for arrays of objects: if that ``},`` does not end a
+        top-level element the slice is not valid JSON and nothing is consumed.
+        """
+        cut = buffer.rfind("},", pos)
+        if cut == -1:
+            return []
+        if self._separator:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if buffer[pos] != ",":
+                return []
+            pos += 1
+        try:
+            elements = self._codec.loads(f"[{buffer[pos:cut + 1]}]")
+        except ValueError:
+            return []
+        self._separator = True
+        self._pos = cut + 1
+        return elements
@@ -1,27 +1,48 @@
 from dataclasses import dataclass
-from enum import Enum, auto
+from enum import Enum, IntEnum, auto
+
+
+class Priority(IntEnum):
+    """Scheduling priority of a request; lower values are sent first."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
 
 
 @dataclass
 class Endpoint:
     path: str
     rate_limit: int = 10
+    # Whether requests also draw from the gateway-wide rate budget
+    shared_budget: bool = True
+    priority: Priority = Priority.NORMAL
 
     def __str__(self):
         return self.path
 
 
 class IBKREndpoint(Enum):
-    TICKLE = Endpoint("/tickle", 1)
-    ACCOUNT_SUMMARY = Endpoint("/portfolio/{accountId}/summary", 5)
+    TICKLE = Endpoint("/tickle", 1, shared_budget=False, priority=Priority.INTERACTIVE)
+    AUTH_STATUS = Endpoint(
+        "/iserver/auth/status", 1, shared_budget=False, priority=Priority.INTERACTIVE
+    )
+    ACCOUNT_SUMMARY = Endpoint(
+        "/portfolio/{accountId}/summary", 5, priority=Priority.INTERACTIVE
+    )
     PORTFOLIO_ACCOUNTS = Endpoint("/portfolio/accounts")
+    POSITIONS = Endpoint("/portfolio/{accountId}/positions/{pageId}")
+    LEDGER = Endpoint("/portfolio/{accountId}/ledger")
     HISTORICAL_DATA = Endpoint("/iserver/marketdata/history", 5)
+    MARKET_DATA_SNAPSHOT = Endpoint(
+        "/iserver/marketdata/snapshot", priority=Priority.INTERACTIVE
+    )
     CONTRACT_SEARCH = Endpoint("/iserver/secdef/search")
     STOCK_INFO = Endpoint("/trsrv/stocks")
     CONTRACT_DETAILS = Endpoint("/iserver/contract/{conid}/info")
     CONTRACT_INFO = Endpoint("/iserver/contract/{conid}/info-quick")
-    CONTRACT_RULES = Endpoint("/iserver/contract/rules")
+    CONTRACT_RULES = Endpoint("/iserver/contract/rules", priority=Priority.INTERACTIVE)
     SECDEF = Endpoint("/trsrv/secdef")
     SECDEF_INFO = Endpoint("/iserver/secdef/info")
-    ALL_CONIDS = Endpoint("/trsrv/all-conids")
+    ALL_CONIDS = Endpoint("/trsrv/all-conids", priority=Priority.BULK)
     STRIKES = Endpoint("/iserver/secdef/strikes")
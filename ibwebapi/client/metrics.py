@@ -0,0 +1,184 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds of the default histogram buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_HELP = {
+    "ibkr_request_queue_seconds": (
+        "histogram",
+        "Time spent waiting for the rate limiter",
+    ),
+    "ibkr_request_ttfb_seconds": (
+        "histogram",
+        "Time from sending a request to receiving its response headers",
+    ),
+    "ibkr_request_duration_seconds": (
+        "histogram",
+        "Total request time including queueing and retries",
+    ),
+    "ibkr_response_bytes": ("histogram", "Size of response bodies"),
+    "ibkr_response_decode_seconds": ("histogram", "Time spent decoding response bodies"),
+    "ibkr_responses_total": ("counter", "Responses by status"),
+    "ibkr_retries_total": ("counter", "Retried requests by status"),
+    "ibkr_cache_requests_total": ("counter", "Local cache lookups by result"),
+    "ibkr_coalesced_requests_total": (
+        "counter",
+        "Requests served by an identical request already in flight",
+    ),
+    "ibkr_rate_limit": ("gauge", "Currently allowed requests per second"),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram; observations cost one bisect and two additions."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the upper bound of the bucket containing the ``q`` quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    In-process request metrics with Prometheus text export.
+
+    Clients record into an instance passed as ``metrics``; without one nothing is
+    measured. Histograms and counters are keyed by metric name and labels (usually
+    the endpoint name).
+
+    :param callback: Called with ``(name, labels, value)`` for every observation,
+        e.g. to forward metrics to another system
+    """
+
+    def __init__(
+        self, callback: Optional[Callable[[str, Dict[str, str], float], None]] = None
+    ):
+        self.callback = callback
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> None:
+        key = (name, tuple(labels.items()))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+        if self.callback is not None:
+            self.callback(name, labels, value)
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(labels.items()))
+        self._counters[key] = self._counters.get(key, 0) + amount
+        if self.callback is not None:
+            self.callback(name, labels, amount)
+
+    def register_gauge(
+        self, name: str, label: str, collect: Callable[[], Dict[str, float]]
+    ) -> None:
+        """
+        Adds values that are read at export time, replacing an earlier gauge of the
+        same name.
+
+        :param name: Metric name
+        :param label: Name of the label the keys of ``collect()`` are exported as
+        :param collect: Returns the current values keyed by label value
+        """
+        self._gauges[name] = (label, collect)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        return self._histograms.get((name, tuple(labels.items())))
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get((name, tuple(labels.items())), 0)
+
+    def to_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        described = set()
+
+        def describe(name: str) -> None:
+            if name not in described and name in _HELP:
+                kind, text = _HELP[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            describe(name)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{name}_bucket{bucket_labels} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in sorted(self._counters.items()):
+            describe(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, (label, collect) in self._gauges.items():
+            describe(name)
+            for key, value in sorted(collect().items()):
+                lines.append(f"{name}{_format_labels(((label, key),))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Collection, Deque, Dict, Optional, Tuple
+
+from ibwebapi.client.endpoints import IBKREndpoint, Priority
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket with priority lanes.
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity`` (default 1,
+    which spaces requests ``1 / rate`` apart, so no one-second window ever sees more
+    than ``rate`` of them). A call to :meth:`acquire` only waits until a token is
+    available; it does not hold anything while the caller performs its request, so
+    many requests can be in flight at once.
+
+    Waiters are served by :class:`Priority`, in arrival order within a priority. To
+    keep lower priorities from starving, a waiter is promoted by one level for every
+    ``aging`` seconds it has waited.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, aging: float = 10.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else 1.0
+        self.aging = aging
+        self._tokens = self.capacity
+        self._updated: Optional[float] = None
+        self._lanes: Dict[int, Deque[Tuple[float, asyncio.Future]]] = {}
+        self._waiting = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        """Waits until a token is available and consumes it."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._refill(now)
+        if not self._waiting and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        waiter = loop.create_future()
+        entry = (now, waiter)
+        self._lanes.setdefault(int(priority), deque()).append(entry)
+        self._waiting += 1
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The token was granted but the caller went away; give it back.
+                self._tokens = min(self.capacity, self._tokens + 1)
+                self._dispatch()
+            else:
+                try:
+                    self._lanes[int(priority)].remove(entry)
+                    self._waiting -= 1
+                except ValueError:
+                    pass
+            raise
+
+    def _pop_waiter(self, now: float) -> asyncio.Future:
+        # Lowest priority value first, after crediting the time spent waiting
+        best = min(
+            (lane for lane in self._lanes.items() if lane[1]),
+            key=lambda lane: (lane[0] - (now - lane[1][0][0]) / self.aging, lane[1][0][0]),
+        )
+        self._waiting -= 1
+        return best[1].popleft()[1]
+
+    def set_rate(self, rate: float, capacity: Optional[float] = None) -> None:
+        """Changes the refill rate; tokens accrued so far are kept."""
+        self._refill(asyncio.get_running_loop().time())
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else 1.0
+        self._tokens = min(self._tokens, self.capacity)
+        if self._waiting:
+            self._dispatch()
+
+    def pause(self, delay: float) -> None:
+        """Withholds tokens so that the next one is granted ``delay`` seconds from now."""
+        self._refill(asyncio.get_running_loop().time())
+        self._tokens = min(self._tokens, 1 - delay * self.rate)
+        if self._waiting:
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        now = loop.time()
+        self._refill(now)
+        while self._waiting and self._tokens >= 1:
+            waiter = self._pop_waiter(now)
+            if waiter.done():
+                continue
+            self._tokens -= 1
+            waiter.set_result(None)
+
+        if self._waiting:
+            delay = (1 - self._tokens) / self.rate
+            self._wakeup = loop.call_later(delay, self._dispatch)
+
+
+class AdaptiveRate:
+    """
+    Additive-increase/multiplicative-decrease controller for one endpoint's rate.
+
+    Throttling responses multiply the rate by ``decrease``; a burst of rejections
+    within ``increase_interval`` counts as one signal. After ``increase_interval``
+    seconds without throttling, each successful response raises the rate by
+    ``increase`` times the ceiling, until the configured ceiling is reached again.
+
+    :param ceiling: Configured maximum rate in requests per second
+    :param floor: Lowest rate the controller will go down to
+    :param decrease: Factor applied to the rate when throttled
+    :param increase: Fraction of the ceiling added per probe step
+    :param increase_interval: Minimum seconds between rate changes
+    """
+
+    def __init__(
+        self,
+        ceiling: float,
+        floor: float = 0.5,
+        decrease: float = 0.5,
+        increase: float = 0.1,
+        increase_interval: float = 1.0,
+    ):
+        self.ceiling = float(ceiling)
+        self.floor = min(floor, self.ceiling)
+        self.decrease = decrease
+        self.increase = increase
+        self.increase_interval = increase_interval
+        self.rate = self.ceiling
+        self.throttled = 0
+        self._changed: Optional[float] = None
+        self._decreased: Optional[float] = None
+
+    def on_throttled(self, now: float) -> bool:
+        """Records a throttling response; returns whether the rate changed."""
+        self.throttled += 1
+        if self._decreased is not None and now - self._decreased < self.increase_interval:
+            return False
+        self.rate = max(self.floor, self.rate * self.decrease)
+        self._changed = self._decreased = now
+        return True
+
+    def on_success(self, now: float) -> bool:
+        """Records a successful response; returns whether the rate changed."""
+        if self.rate >= self.ceiling:
+            return False
+        if self._changed is not None and now - self._changed < self.increase_interval:
+            return False
+        self.rate = min(self.ceiling, self.rate + self.ceiling * self.increase)
+        self._changed = now
+        return True
+
+
+class RateLimiter:
+    """
+    Request scheduler with one token bucket per :class:`IBKREndpoint` and an optional
+    gateway-wide budget shared by all endpoints.
+
+    With ``adaptive`` enabled, each endpoint's rate starts at its configured
+    ``rate_limit`` and is adjusted from response feedback (see :class:`AdaptiveRate`):
+    it shrinks when the gateway answers with a throttling status and probes back up
+    to the configured ceiling while requests succeed.
+
+    Within each budget, requests are dispatched by priority: the per-call priority if
+    given, otherwise the endpoint's default (see :class:`Priority`).
+
+    :param global_rate_limit: Maximum requests per second across all endpoints (None disables)
+    :param burst: Bucket capacity as a multiple of the per-second rate. None (the
+        default) keeps one token per bucket, so every one-second window stays within
+        the endpoint's ``rate_limit``; larger capacities let up to
+        ``capacity + rate - 1`` requests through in the first second after a pause
+    :param adaptive: Adjust endpoint rates from response statuses
+    :param throttle_statuses: Statuses that signal the rate is too high
+    :param aging: Seconds of waiting that promote a request by one priority level
+    """
+
+    def __init__(
+        self,
+        global_rate_limit: Optional[float] = None,
+        burst: Optional[float] = None,
+        adaptive: bool = True,
+        throttle_statuses: Collection[int] = (429, 503),
+        aging: float = 10.0,
+    ):
+        self.burst = burst
+        self.aging = aging
+        self.adaptive = adaptive
+        self.throttle_statuses = set(throttle_statuses)
+        self._buckets: Dict[IBKREndpoint, TokenBucket] = {}
+        self._controllers: Dict[IBKREndpoint, AdaptiveRate] = {}
+        self._global: Optional[TokenBucket] = (
+            self._make_bucket(global_rate_limit) if global_rate_limit else None
+        )
+
+    def _capacity(self, rate: float) -> float:
+        return max(1.0, rate * self.burst) if self.burst else 1.0
+
+    def _make_bucket(self, rate: float) -> TokenBucket:
+        return TokenBucket(rate, self._capacity(rate), self.aging)
+
+    def bucket(self, endpoint: IBKREndpoint) -> Optional[TokenBucket]:
+        """Returns the token bucket for the given endpoint, creating it on first use."""
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            rate_limit = endpoint.value.rate_limit
+            if rate_limit <= 0:
+                return None
+            bucket = self._buckets[endpoint] = self._make_bucket(rate_limit)
+            if self.adaptive:
+                self._controllers[endpoint] = AdaptiveRate(rate_limit)
+        return bucket
+
+    async def acquire(
+        self, endpoint: IBKREndpoint, priority: Optional[Priority] = None
+    ) -> None:
+        """
+        Waits until a request to the given endpoint may be sent.
+
+        :param endpoint: The endpoint to send to
+        :param priority: Priority of the request (default: the endpoint's priority)
+        """
+        if priority is None:
+            priority = endpoint.value.priority
+        bucket = self.bucket(endpoint)
+        if bucket is not None:
+            await bucket.acquire(priority)
+        # Session upkeep (tickle, auth status) has its own lane outside the global budget
+        if self._global is not None and endpoint.value.shared_budget:
+            await self._global.acquire(priority)
+
+    def feedback(
+        self, endpoint: IBKREndpoint, status: int, retry_after: Optional[float] = None
+    ) -> None:
+        """
+        Reports the status of a response so the endpoint's rate can adapt.
+
+        :param endpoint: The endpoint the request was sent to
+        :param status: HTTP status of the response
+        :param retry_after: Seconds from a ``Retry-After`` header; no tokens are
+            granted for the endpoint before then
+        """
+        bucket = self.bucket(endpoint)
+        if bucket is None:
+            return
+        if retry_after and status in self.throttle_statuses:
+            bucket.pause(retry_after)
+
+        controller = self._controllers.get(endpoint)
+        if controller is None:
+            return
+        now = asyncio.get_running_loop().time()
+        if status in self.throttle_statuses:
+            changed = controller.on_throttled(now)
+        elif status < 400:
+            changed = controller.on_success(now)
+        else:
+            changed = False
+        if changed:
+            logger.info(
+                f"Rate for {endpoint.name} adjusted to {controller.rate:.2f}/s "
+                f"(ceiling {controller.ceiling:.2f}/s)"
+            )
+            bucket.set_rate(controller.rate, self._capacity(controller.rate))
+
+    def effective_rate(self, endpoint: IBKREndpoint) -> Optional[float]:
+        """Returns the rate currently allowed for an endpoint (None if unlimited)."""
+        bucket = self.bucket(endpoint)
+        return None if bucket is None else bucket.rate
+
+    def effective_rates(self) -> Dict[str, float]:
+        """Returns the current rate of every endpoint used so far, keyed by name."""
+        return {endpoint.name: bucket.rate for endpoint, bucket in self._buckets.items()}
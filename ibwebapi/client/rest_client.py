@@ -1,12 +1,21 @@
 import asyncio
 import logging
-from typing import Any, Dict, Optional, Set
+import time
+import warnings
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
 from urllib.parse import urlencode
 
 import aiohttp
 from aiohttp import ClientResponse, ClientSession
 
-from ibwebapi.client.endpoints import Endpoint, IBKREndpoint
+from ibwebapi.client.codec import JSONArrayParser, JSONCodec, default_codec
+from ibwebapi.client.endpoints import Endpoint, IBKREndpoint, Priority
+from ibwebapi.client.metrics import SIZE_BUCKETS, Metrics
+from ibwebapi.client.rate_limiter import RateLimiter
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.client.session_health import SessionUnavailableError
+from ibwebapi.client.transport import Transport, default_transport, iter_chunks
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -23,17 +32,47 @@ class IBKRRESTClient:
         retry_statuses: Optional[Set[int]] = None,
         initial_retry_delay: float = 1.0,
         max_retry_delay: float = 60.0,
-        unauthorized_initial_delay: float = 60.0,
-        unauthorized_retry_delay: float = 300.0,  # 5 minutes
-        unauthorized_max_retries: int = 12,  # Try for up to 1 hour by default
+        unauthorized_initial_delay: Optional[float] = None,
+        unauthorized_retry_delay: Optional[float] = None,
+        unauthorized_max_retries: int = 12,
+        reauth_timeout: Optional[float] = 3600.0,  # Wait for up to 1 hour by default
+        keepalive: bool = True,
+        keepalive_interval: Optional[float] = None,
+        global_rate_limit: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        shared_session: Optional[IBKRSession] = None,
+        metrics: Optional[Metrics] = None,
+        transport: Optional[Transport] = None,
+        codec: Optional[JSONCodec] = None,
     ):
+        for name, value in (
+            ("unauthorized_initial_delay", unauthorized_initial_delay),
+            ("unauthorized_retry_delay", unauthorized_retry_delay),
+        ):
+            if value is not None:
+                warnings.warn(
+                    f"{name} is deprecated and has no effect; requests after a 401 "
+                    f"wait for the session health check (see reauth_timeout)",
+                    DeprecationWarning,
+                    stacklevel=2,
+                )
         self.base_url = base_url
         self.session_timeout = session_timeout
         self.session: Optional[ClientSession] = None
         self.connected = False
         self._endpoint_map = {endpoint: endpoint.value for endpoint in IBKREndpoint}
-        self._last_request_time = 0.0
-        self._rate_limit_lock = asyncio.Lock()
+        self.shared_session = shared_session or IBKRSession(
+            global_rate_limit=global_rate_limit, rate_limiter=rate_limiter
+        )
+        self.rate_limiter = self.shared_session.rate_limiter
+        self.coalesced_requests = 0
+        self.metrics = metrics
+        self.transport = transport or default_transport
+        self.codec = codec or default_codec
+        if metrics is not None:
+            metrics.register_gauge(
+                "ibkr_rate_limit", "endpoint", self.rate_limiter.effective_rates
+            )
         self.max_retries = max_retries
         self.retry_statuses = retry_statuses or {
             429,
@@ -43,9 +82,15 @@ class IBKRRESTClient:
         }  # Common transient errors
         self.initial_retry_delay = initial_retry_delay
         self.max_retry_delay = max_retry_delay
-        self.unauthorized_initial_delay = unauthorized_initial_delay
-        self.unauthorized_retry_delay = unauthorized_retry_delay
         self.unauthorized_max_retries = unauthorized_max_retries
+        self.reauth_timeout = reauth_timeout
+        self.health = self.shared_session.health
+        self.keepalive = keepalive
+        self.keepalive_interval = keepalive_interval or session_timeout
+        # Registered with the shared session, which runs one keepalive for all clients
+        self._keepalive = partial(
+            self.shared_session.tickle, self.base_url, self.transport, self.codec
+        )
 
     async def __aenter__(self):
         await self.connect()
@@ -57,29 +102,39 @@ class IBKRRESTClient:
     async def connect(self):
         """Establishes a connection with the IBKR API and keeps it alive."""
         backoff = 1
-        while not self.connected:
-            try:
-                self.session = aiohttp.ClientSession(
-                    connector=aiohttp.TCPConnector(ssl=True, verify_ssl=False)
-                )
-                logger.info("Attempting to connect to IBKR API with rate limiting...")
-                await self.tickle()
-                logger.info("Connection established.")
-                self.connected = True
-                backoff = 1
-            except aiohttp.ClientError as e:
-                logger.error(
-                    f"Connection failed: {e}. Retrying in {backoff} seconds..."
-                )
-                await asyncio.sleep(backoff)
-                backoff = min(backoff * 2, 60)
+        acquired = self.session is None
+        keepalive = self._keepalive if self.keepalive else None
+        if acquired:
+            self.session = await self.shared_session.acquire(
+                keepalive, self.keepalive_interval
+            )
+        try:
+            while not self.connected:
+                try:
+                    logger.info("Attempting to connect to IBKR API with rate limiting...")
+                    await self.tickle()
+                    logger.info("Connection established.")
+                    self.connected = True
+                    backoff = 1
+                except aiohttp.ClientError as e:
+                    logger.error(
+                        f"Connection failed: {e}. Retrying in {backoff} seconds..."
+                    )
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
+        except BaseException:
+            # E.g. the session did not recover in time, or the caller gave up
+            if acquired:
+                self.session = None
+                await self.shared_session.release(keepalive)
+            raise
 
     async def disconnect(self):
-        """Closes the session gracefully."""
+        """Releases the shared session, closing it if no other client uses it."""
         if self.session:
-            await self.session.close()
             self.session = None
             self.connected = False
+            await self.shared_session.release(self._keepalive)
             logger.info("Disconnected from IBKR API.")
 
     def _get_retry_params(
@@ -87,10 +142,8 @@ class IBKRRESTClient:
     ) -> tuple[float, int]:
         """Get retry delay and max retries based on status code."""
         if status_code == 401:
-            # For unauthorized errors, use longer delays
-            if retry_count == 0:
-                return self.unauthorized_initial_delay, self.unauthorized_max_retries
-            return self.unauthorized_retry_delay, self.unauthorized_max_retries
+            # Unauthorized requests wait for the session health check instead
+            return 0.0, self.unauthorized_max_retries
         else:
             # For other errors, use exponential backoff
             delay = min(
@@ -105,75 +158,253 @@ class IBKRRESTClient:
         endpoint: IBKREndpoint,
         path_params: Dict[str, Any] | None = None,
         query_params: Dict[str, Any] | None = None,
+        coalesce: bool = True,
+        priority: Optional[Priority] = None,
         **kwargs,
     ) -> Dict[str, Any]:
-        """Generic method to make API requests with rate limiting and retries."""
+        """
+        Generic method to make API requests with rate limiting and retries.
+
+        Requests waiting for the rate limit are sent by ``priority`` (default: the
+        endpoint's priority), so bulk work does not delay interactive calls.
+
+        Identical GET requests that are already in flight (same endpoint, path and
+        query parameters) are not sent again; every caller receives the result of
+        the request in flight, so results must be treated as read-only. Requests
+        are only shared between calls with the same priority, and between clients
+        with the same transport, codec and metrics, so a caller never waits at
+        another caller's priority or gets a response handled differently.
+        Pass ``coalesce=False`` to always send a separate request.
+        """
         if not self.session:
             raise RuntimeError("Not connected to IBKR API")
 
-        # Calculate wait time based on rate limit
-        rate_limit = endpoint.value.rate_limit
-        wait_time = 1.0 / rate_limit if rate_limit > 0 else 0
+        url = self._url(endpoint, path_params, query_params)
+        if not coalesce or method.upper() != "GET" or kwargs:
+            return await self._send_request(method, endpoint, url, priority, **kwargs)
+
+        if priority is None:
+            priority = endpoint.value.priority
+        key = (
+            method.upper(),
+            url,
+            int(priority),
+            id(self.transport),
+            id(self.codec),
+            id(self.metrics),
+        )
+        inflight = self.shared_session.inflight
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._send_request(method, endpoint, url, priority)
+            )
+            inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_inflight(key, t))
+        else:
+            self.coalesced_requests += 1
+            if self.metrics is not None:
+                self.metrics.increment(
+                    "ibkr_coalesced_requests_total", endpoint=endpoint.name
+                )
+            logger.debug(f"Coalesced request to: {url}")
+        # Shielded so a cancelled caller does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _url(
+        self,
+        endpoint: IBKREndpoint,
+        path_params: Optional[Dict[str, Any]],
+        query_params: Optional[Dict[str, Any]],
+    ) -> str:
+        url = f"{self.base_url}{self._endpoint_map[endpoint]}"
+        if path_params:
+            url = url.format(**path_params)
+        if query_params:
+            url += f"?{urlencode(query_params)}"
+        return url
+
+    async def _stream_request(
+        self,
+        method: str,
+        endpoint: IBKREndpoint,
+        path_params: Optional[Dict[str, Any]] = None,
+        query_params: Optional[Dict[str, Any]] = None,
+        priority: Optional[Priority] = None,
+        chunk_size: int = 1 << 16,
+        max_pending: int = 16,
+        **kwargs,
+    ) -> AsyncIterator[Any]:
+        """
+        Makes an API request whose response is a JSON array and yields its elements
+        while the body is still being received, so the array is never held in memory.
+
+        Rate limiting, session health checks and retries work as in :meth:`_request`,
+        but only until the body starts arriving: an error while streaming is raised
+        to the caller after the elements received so far.
+
+        :param chunk_size: Bytes read from the response at a time
+        :param max_pending: Parsed chunks buffered before reading pauses for the caller
+        """
+        if not self.session:
+            raise RuntimeError("Not connected to IBKR API")
+
+        url = self._url(endpoint, path_params, query_params)
+        pending: asyncio.Queue = asyncio.Queue(max_pending)
+
+        metrics = self.metrics
+        started = time.perf_counter()
+
+        async def read(response: ClientResponse) -> None:
+            parser = JSONArrayParser(self.codec)
+            size = 0
+            decoding = 0.0
+            async for chunk in iter_chunks(response, chunk_size):
+                size += len(chunk)
+                decode_started = time.perf_counter()
+                elements = parser.feed(chunk)
+                decoding += time.perf_counter() - decode_started
+                if elements:
+                    await pending.put(elements)
+            decode_started = time.perf_counter()
+            elements = parser.close()
+            decoding += time.perf_counter() - decode_started
+            if metrics is not None:
+                self._observe_response(metrics, endpoint, size, decoding, started)
+            if elements:
+                await pending.put(elements)
+
+        task = asyncio.ensure_future(
+            self._send_request(method, endpoint, url, priority, read=read, **kwargs)
+        )
+        getter: Optional[asyncio.Future] = None
+        try:
+            while True:
+                if task.done():
+                    while not pending.empty():
+                        for element in pending.get_nowait():
+                            yield element
+                    task.result()
+                    return
+                getter = asyncio.ensure_future(pending.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    for element in getter.result():
+                        yield element
+                else:
+                    getter.cancel()
+        finally:
+            # The caller may stop iterating (or be cancelled) part-way through;
+            # wait for the reader and the pending get so neither outlives the stream
+            pending_tasks = [task] if getter is None else [task, getter]
+            for pending_task in pending_tasks:
+                pending_task.cancel()
+            await asyncio.gather(*pending_tasks, return_exceptions=True)
+
+    def _finish_inflight(self, key: tuple, task: asyncio.Future) -> None:
+        if self.shared_session.inflight.get(key) is task:
+            del self.shared_session.inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved; callers awaiting the task still get it
+            task.exception()
+
+    async def _send_request(
+        self,
+        method: str,
+        endpoint: IBKREndpoint,
+        url: str,
+        priority: Optional[Priority] = None,
+        read: Optional[Callable[[ClientResponse], Awaitable[Any]]] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
         retry_count = 0
         last_error = None
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        # A coalesced request may outlive the client that sent it; the pool cancels
+        # in-flight requests when it closes
+        session = self.session
 
         while True:
             try:
-                async with self._rate_limit_lock:
-                    # Wait for rate limit
-                    now = asyncio.get_event_loop().time()
-                    time_since_last = now - self._last_request_time
-                    if time_since_last < wait_time:
-                        await asyncio.sleep(wait_time - time_since_last)
-
-                    url = f"{self.base_url}{self._endpoint_map[endpoint]}"
-                    if path_params:
-                        url = url.format(**path_params)
-                    if query_params:
-                        url += f"?{urlencode(query_params)}"
-
-                    logger.debug(f"Making request to: {url}")
-                    async with getattr(self.session, method.lower())(
-                        url, **kwargs
-                    ) as response:
-                        if (
-                            response.status == 401
-                            or response.status in self.retry_statuses
-                        ):
-                            retry_delay, max_retries = self._get_retry_params(
-                                response.status, retry_count
-                            )
+                # Requests are parked here while the session re-authenticates
+                await self.health.wait(self.reauth_timeout)
+                # Only the send is gated; nothing is held across the round trip
+                if metrics is None:
+                    await self.rate_limiter.acquire(endpoint, priority)
+                else:
+                    queued = time.perf_counter()
+                    await self.rate_limiter.acquire(endpoint, priority)
+                    sent = time.perf_counter()
+                    metrics.observe(
+                        "ibkr_request_queue_seconds", sent - queued, endpoint=endpoint.name
+                    )
 
-                            if retry_count >= max_retries:
-                                error_msg = await response.text()
-                                logger.error(
-                                    f"Max retries ({max_retries}) exceeded for status {response.status}. "
-                                    f"Last error: {error_msg}"
-                                )
-                                response.raise_for_status()
+                logger.debug(f"Making request to: {url}")
+                async with self.transport.request(
+                    session, method, url, endpoint, **kwargs
+                ) as response:
+                    if metrics is not None:
+                        metrics.observe(
+                            "ibkr_request_ttfb_seconds",
+                            time.perf_counter() - sent,
+                            endpoint=endpoint.name,
+                        )
+                        metrics.increment(
+                            "ibkr_responses_total",
+                            endpoint=endpoint.name,
+                            status=str(response.status),
+                        )
+                    retry_after = self._retry_after(response)
+                    self.rate_limiter.feedback(endpoint, response.status, retry_after)
+                    if response.status == 401 or response.status in self.retry_statuses:
+                        retry_delay, max_retries = self._get_retry_params(
+                            response.status, retry_count
+                        )
+                        if retry_after:
+                            retry_delay = max(retry_delay, retry_after)
 
+                        if retry_count >= max_retries:
                             error_msg = await response.text()
-                            if response.status == 401:
-                                logger.warning(
-                                    f"Gateway authentication failed (status 401). "
-                                    f"Attempt {retry_count + 1}/{max_retries}. "
-                                    f"Waiting {retry_delay:.1f} seconds for gateway to recover. "
-                                    f"Error: {error_msg}"
-                                )
-                            else:
-                                logger.warning(
-                                    f"Received status {response.status} from {url}. "
-                                    f"Attempt {retry_count + 1}/{max_retries}. "
-                                    f"Retrying in {retry_delay:.1f} seconds. Error: {error_msg}"
-                                )
-
-                            await asyncio.sleep(retry_delay)
-                            retry_count += 1
-                            continue
+                            logger.error(
+                                f"Max retries ({max_retries}) exceeded for status {response.status}. "
+                                f"Last error: {error_msg}"
+                            )
+                            response.raise_for_status()
 
+                        if metrics is not None:
+                            metrics.increment(
+                                "ibkr_retries_total",
+                                endpoint=endpoint.name,
+                                status=str(response.status),
+                            )
+                        error_msg = await response.text()
+                        if response.status == 401:
+                            logger.warning(
+                                f"Gateway authentication failed (status 401). "
+                                f"Attempt {retry_count + 1}/{max_retries}. "
+                                f"Waiting for the gateway session to recover. "
+                                f"Error: {error_msg}"
+                            )
+                            self.health.report_unauthorized(self._auth_probe())
+                        else:
+                            logger.warning(
+                                f"Received status {response.status} from {url}. "
+                                f"Attempt {retry_count + 1}/{max_retries}. "
+                                f"Retrying in {retry_delay:.1f} seconds. Error: {error_msg}"
+                            )
+                    else:
                         await self._handle_response(response)
-                        self._last_request_time = asyncio.get_event_loop().time()
-                        return await response.json()
+                        if read is not None:
+                            return await read(response)
+                        if metrics is None:
+                            return self._decode(await response.read())
+                        return await self._json_with_metrics(response, endpoint, started)
+
+                # Back off after the response has been released
+                await asyncio.sleep(retry_delay)
+                retry_count += 1
+                continue
 
             except aiohttp.ClientResponseError as e:
                 last_error = e
@@ -193,9 +424,10 @@ class IBKRRESTClient:
                         logger.warning(
                             f"Gateway authentication failed (status 401). "
                             f"Attempt {retry_count + 1}/{max_retries}. "
-                            f"Waiting {retry_delay:.1f} seconds for gateway to recover. "
+                            f"Waiting for the gateway session to recover. "
                             f"Error: {str(e)}"
                         )
+                        self.health.report_unauthorized(self._auth_probe())
                     else:
                         logger.warning(
                             f"Request failed with status {e.status}. "
@@ -213,6 +445,66 @@ class IBKRRESTClient:
                 self.connected = False
                 raise
 
+    async def _json_with_metrics(
+        self, response: ClientResponse, endpoint: IBKREndpoint, started: float
+    ) -> Any:
+        """Decodes a response body, recording its size and the time spent decoding."""
+        body = await response.read()
+        decode_started = time.perf_counter()
+        data = self._decode(body)
+        decoding = time.perf_counter() - decode_started
+        self._observe_response(self.metrics, endpoint, len(body), decoding, started)
+        return data
+
+    @staticmethod
+    def _observe_response(
+        metrics: Metrics,
+        endpoint: IBKREndpoint,
+        size: int,
+        decoding: float,
+        started: float,
+    ) -> None:
+        """Records a response's size, decode time and the request's total duration."""
+        name = endpoint.name
+        metrics.observe("ibkr_response_bytes", size, SIZE_BUCKETS, endpoint=name)
+        metrics.observe("ibkr_response_decode_seconds", decoding, endpoint=name)
+        metrics.observe(
+            "ibkr_request_duration_seconds", time.perf_counter() - started, endpoint=name
+        )
+
+    def _decode(self, body: bytes) -> Any:
+        # Like aiohttp's response.json(), an empty body decodes to None
+        return self.codec.loads(body) if body.strip() else None
+
+    def _record_cache(self, cache: str, hit: bool) -> None:
+        """Counts a local cache lookup if metrics are enabled."""
+        if self.metrics is not None:
+            self.metrics.increment(
+                "ibkr_cache_requests_total", cache=cache, result="hit" if hit else "miss"
+            )
+
+    @staticmethod
+    def _retry_after(response: ClientResponse) -> Optional[float]:
+        """Returns the ``Retry-After`` header in seconds, if given as a number."""
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def _auth_probe(self) -> Callable[[], Awaitable[bool]]:
+        """
+        Returns the auth probe for the shared session.
+
+        The probe runs on the shared connection pool rather than this client's
+        session, so it keeps working if this client disconnects.
+        """
+        return partial(
+            self.shared_session.probe_auth, self.base_url, self.transport, self.codec
+        )
+
     async def _handle_response(self, response: ClientResponse) -> None:
         """Handle API response and raise appropriate exceptions."""
         if response.status >= 400:
@@ -222,14 +514,35 @@ class IBKRRESTClient:
 
     async def tickle(self) -> Dict[str, Any]:
         """Sends a tickle request to keep the session alive."""
-        return await self._request("GET", IBKREndpoint.TICKLE)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await self._request("GET", IBKREndpoint.TICKLE)
+        self.shared_session.record_tickle(
+            response, loop.time() - started, self._auth_probe()
+        )
+        return response
+
+    @property
+    def last_tickle(self) -> Optional[Dict[str, Any]]:
+        """Last ``/tickle`` response on the shared session (None before the first)."""
+        return self.shared_session.last_tickle
+
+    @property
+    def tickle_rtt(self) -> Optional[float]:
+        """Round trip time of the last tickle in seconds."""
+        return self.shared_session.tickle_rtt
+
+    @property
+    def authenticated(self) -> Optional[bool]:
+        """Brokerage session state from the last tickle (None if not known)."""
+        return self.shared_session.authenticated
 
     async def run(self):
         """Main loop to maintain the connection and send periodic tickles."""
+        # The shared session tickles the gateway while this client is connected
+        self.keepalive = True
         async with self:
             try:
-                while True:
-                    await self.tickle()
-                    await asyncio.sleep(self.session_timeout)
+                await asyncio.Event().wait()
             except asyncio.CancelledError:
                 logger.info("Stopping client...")
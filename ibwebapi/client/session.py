@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+from aiohttp import ClientSession
+
+from ibwebapi.client.codec import JSONCodec, default_codec
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.rate_limiter import RateLimiter
+from ibwebapi.client.session_health import SessionHealth, SessionUnavailableError
+from ibwebapi.client.transport import Transport, default_transport
+
+logger = logging.getLogger(__name__)
+
+
+class IBKRSession:
+    """
+    Keep-alive connection pool and rate budget shared by any number of API clients.
+
+    Pass one instance to several clients (``IBKRMarketData``, ``IBKRContractSearch``,
+    ``IBKRPortfolio``, ...) so they reuse the same TLS connections to the gateway and
+    draw from the same per-endpoint and global rate limits. The underlying
+    ``aiohttp.ClientSession`` is opened by the first client that connects and closed
+    when the last one disconnects.
+
+    The pool also keeps the gateway session alive: while any client asked for a
+    keepalive, one task tickles the gateway at the shortest interval requested and
+    records the response in ``last_tickle``, which all clients read.
+
+    :param limit: Maximum number of simultaneous connections (0 for no limit)
+    :param limit_per_host: Maximum number of simultaneous connections per host (0 for no limit)
+    :param ttl_dns_cache: Seconds to cache resolved gateway addresses (None caches forever)
+    :param keepalive_timeout: Seconds an idle connection is kept open for reuse
+    :param verify_ssl: Verify the gateway certificate (the gateway ships a self-signed one)
+    :param global_rate_limit: Maximum requests per second across all endpoints
+    :param rate_limiter: Use an existing rate limiter instead of creating one
+    :param auth_probe_interval: Seconds between the first auth probes after a 401
+    :param max_auth_probe_interval: Upper bound for the (doubling) auth probe interval
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        ttl_dns_cache: Optional[int] = 300,
+        keepalive_timeout: float = 30.0,
+        verify_ssl: bool = False,
+        global_rate_limit: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        auth_probe_interval: float = 2.0,
+        max_auth_probe_interval: float = 30.0,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.verify_ssl = verify_ssl
+        self.rate_limiter = rate_limiter or RateLimiter(global_rate_limit)
+        self.health = SessionHealth(auth_probe_interval, max_auth_probe_interval)
+        # In-flight GET requests, shared for request coalescing; keyed by method,
+        # URL, priority and the identities of the client's transport, codec, metrics
+        self.inflight: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        self.http: Optional[ClientSession] = None
+        self.last_tickle: Optional[Dict[str, Any]] = None
+        self.tickle_rtt: Optional[float] = None
+        self._users = 0
+        self._lock = asyncio.Lock()
+        # Keepalive tickle -> interval in seconds, for each client that wants one
+        self._keepalives: Dict[Callable[[], Awaitable[Any]], float] = {}
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    async def acquire(
+        self,
+        keepalive: Optional[Callable[[], Awaitable[Any]]] = None,
+        keepalive_interval: float = 60.0,
+    ) -> ClientSession:
+        """
+        Registers a user of the pool and returns the shared HTTP session.
+
+        :param keepalive: Coroutine function tickling the gateway (see :meth:`tickle`);
+            the first one registered starts the pool's keepalive task
+        :param keepalive_interval: Seconds between tickles for this user
+        """
+        async with self._lock:
+            if self.http is None or self.http.closed:
+                connector = aiohttp.TCPConnector(
+                    ssl=None if self.verify_ssl else False,
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.ttl_dns_cache,
+                    use_dns_cache=True,
+                    keepalive_timeout=self.keepalive_timeout,
+                )
+                self.http = aiohttp.ClientSession(connector=connector)
+                logger.debug("Opened shared IBKR HTTP session.")
+            self._users += 1
+            if keepalive is not None:
+                self._keepalives[keepalive] = keepalive_interval
+                if self._keepalive_task is None:
+                    self._keepalive_task = asyncio.create_task(self._keep_alive())
+            return self.http
+
+    async def release(self, keepalive: Optional[Callable[[], Awaitable[Any]]] = None) -> None:
+        """
+        Unregisters a user of the pool, closing it once nobody uses it.
+
+        :param keepalive: The keepalive the user registered with :meth:`acquire`;
+            the keepalive task stops when the last one is released
+        """
+        async with self._lock:
+            self._users = max(0, self._users - 1)
+            self._keepalives.pop(keepalive, None)
+            if self._users == 0:
+                self._keepalives.clear()
+            if not self._keepalives:
+                await self._stop_keepalive()
+            if self._users == 0 and self.http is not None:
+                self._cancel_inflight()
+                await self.health.close()
+                await self.http.close()
+                self.http = None
+                logger.debug("Closed shared IBKR HTTP session.")
+
+    async def _keep_alive(self) -> None:
+        """Calls one registered keepalive at the shortest interval until cancelled."""
+        while self._keepalives:
+            await asyncio.sleep(min(self._keepalives.values()))
+            keepalive = next(iter(self._keepalives), None)
+            if keepalive is None:
+                break
+            try:
+                await keepalive()
+                logger.debug(f"Keepalive tickle took {self.tickle_rtt * 1000:.0f} ms")
+            except (aiohttp.ClientError, SessionUnavailableError) as e:
+                logger.warning(f"Keepalive tickle failed: {e}")
+        self._keepalive_task = None
+
+    async def _stop_keepalive(self) -> None:
+        task, self._keepalive_task = self._keepalive_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def authenticated(self) -> Optional[bool]:
+        """Brokerage session state from the last tickle (None if not known)."""
+        if not self.last_tickle:
+            return None
+        auth_status = self.last_tickle.get("iserver", {}).get("authStatus", {})
+        if "authenticated" not in auth_status:
+            return None
+        return bool(auth_status["authenticated"])
+
+    def record_tickle(
+        self,
+        response: Any,
+        rtt: float,
+        probe: Callable[[], Awaitable[bool]],
+    ) -> None:
+        """
+        Records a ``/tickle`` response and starts re-authentication probing if it
+        reports the brokerage session as unauthenticated.
+
+        :param response: Decoded response body
+        :param rtt: Round trip time of the request in seconds
+        :param probe: Auth probe for :meth:`SessionHealth.report_unauthorized`
+        """
+        self.tickle_rtt = rtt
+        if isinstance(response, dict):
+            self.last_tickle = response
+            if self.authenticated is False:
+                self.health.report_unauthorized(probe)
+
+    async def tickle(
+        self,
+        base_url: str,
+        transport: Optional[Transport] = None,
+        codec: Optional[JSONCodec] = None,
+    ) -> Dict[str, Any]:
+        """
+        Sends ``/tickle`` on the pool directly and records the response.
+
+        :param base_url: Gateway API URL
+        :param transport: Transport to send the tickle with (default: direct)
+        :param codec: Codec for the response (default: the fastest installed)
+        :raises aiohttp.ClientError: If the pool is closed or the tickle fails
+        """
+        if self.http is None or self.http.closed:
+            raise aiohttp.ClientConnectionError("The shared session is closed")
+        transport = transport or default_transport
+        codec = codec or default_codec
+        probe = partial(self.probe_auth, base_url, transport, codec)
+        loop = asyncio.get_running_loop()
+        await self.rate_limiter.acquire(IBKREndpoint.TICKLE)
+        started = loop.time()
+        url = f"{base_url}{IBKREndpoint.TICKLE.value}"
+        async with transport.request(
+            self.http, "GET", url, IBKREndpoint.TICKLE
+        ) as response:
+            self.rate_limiter.feedback(IBKREndpoint.TICKLE, response.status)
+            if response.status == 401:
+                self.health.report_unauthorized(probe)
+            response.raise_for_status()
+            body = codec.loads(await response.read())
+        self.record_tickle(body, loop.time() - started, probe)
+        return body
+
+    def _cancel_inflight(self) -> None:
+        for task in self.inflight.values():
+            task.cancel()
+        self.inflight.clear()
+
+    async def probe_auth(
+        self,
+        base_url: str,
+        transport: Optional[Transport] = None,
+        codec: Optional[JSONCodec] = None,
+    ) -> bool:
+        """
+        Checks whether the gateway session is authenticated again.
+
+        Sends ``/tickle`` and ``/iserver/auth/status`` on the pool directly, so the
+        probe is not parked behind the requests waiting for it and does not depend
+        on any one client staying connected.
+
+        :param base_url: Gateway API URL
+        :param transport: Transport to send the probe with (default: direct)
+        :param codec: Codec for the responses (default: the fastest installed)
+        """
+        if self.http is None or self.http.closed:
+            return False
+        transport = transport or default_transport
+        codec = codec or default_codec
+        status: Dict[str, Any] = {}
+        for method, endpoint in (
+            ("GET", IBKREndpoint.TICKLE),
+            ("POST", IBKREndpoint.AUTH_STATUS),
+        ):
+            await self.rate_limiter.acquire(endpoint)
+            url = f"{base_url}{endpoint.value}"
+            async with transport.request(self.http, method, url, endpoint) as response:
+                if response.status != 200:
+                    return False
+                status = codec.loads(await response.read())
+        return bool(status.get("authenticated"))
+
+    async def close(self) -> None:
+        """Closes the pool regardless of how many clients still use it."""
+        async with self._lock:
+            self._users = 0
+            self._keepalives.clear()
+            await self._stop_keepalive()
+            self._cancel_inflight()
+            await self.health.close()
+            if self.http is not None:
+                await self.http.close()
+                self.http = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState(Enum):
+    HEALTHY = "healthy"
+    REAUTHENTICATING = "reauthenticating"
+
+
+class SessionUnavailableError(RuntimeError):
+    """Raised when a request gives up waiting for the gateway session to recover."""
+
+
+class SessionHealth:
+    """
+    Authentication state of a gateway session, shared by all clients using it.
+
+    The first 401 moves the session to ``REAUTHENTICATING`` and starts a single
+    probe task; requests wait on one event instead of each sleeping on its own,
+    and resume as soon as a probe finds the session authenticated again.
+
+    :param probe_interval: Seconds between the first auth probes
+    :param max_probe_interval: Upper bound for the probe interval, which doubles
+        after each failed probe
+    """
+
+    def __init__(self, probe_interval: float = 2.0, max_probe_interval: float = 30.0):
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.state = SessionState.HEALTHY
+        self.outages = 0
+        self._healthy = asyncio.Event()
+        self._healthy.set()
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.state is SessionState.HEALTHY
+
+    def report_unauthorized(self, probe: Callable[[], Awaitable[bool]]) -> None:
+        """
+        Marks the session as unauthenticated and starts probing it, unless a
+        probe is already running.
+
+        :param probe: Coroutine function returning True once the session is
+            authenticated again; it must not wait on this object itself
+        """
+        if not self.healthy:
+            return
+        logger.warning("Gateway session is not authenticated; pausing requests.")
+        self.state = SessionState.REAUTHENTICATING
+        self.outages += 1
+        self._healthy.clear()
+        self._probe_task = asyncio.create_task(self._probe(probe))
+
+    async def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits until the session is healthy.
+
+        :param timeout: Maximum seconds to wait (None waits indefinitely)
+        :raises SessionUnavailableError: If the session did not recover in time
+        """
+        if self.healthy:
+            return
+        try:
+            await asyncio.wait_for(self._healthy.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise SessionUnavailableError(
+                f"Gateway session did not recover within {timeout} seconds"
+            ) from None
+
+    async def _probe(self, probe: Callable[[], Awaitable[bool]]) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        interval = self.probe_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await probe():
+                    break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.debug(f"Auth probe failed: {e}")
+            interval = min(interval * 2, self.max_probe_interval)
+        logger.info(
+            f"Gateway session authenticated again after {loop.time() - started:.1f} seconds."
+        )
+        self.mark_healthy()
+
+    def mark_healthy(self) -> None:
+        """Marks the session as authenticated and releases all waiting requests."""
+        self.state = SessionState.HEALTHY
+        self._healthy.set()
+        self._probe_task = None
+
+    async def close(self) -> None:
+        """
+        Stops probing and resets the state to healthy, so clients reusing the
+        session do not wait for a probe that no longer runs; the next 401 starts
+        a new one.
+        """
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+        self.mark_healthy()
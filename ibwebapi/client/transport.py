@@ -0,0 +1,281 @@
+import abc
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import aiohttp
+from aiohttp import ClientSession
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from ibwebapi.client.endpoints import IBKREndpoint
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept in recordings; the client only looks at these
+RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+ReplayKey = Tuple[str, str, Optional[str]]
+
+
+class Transport(abc.ABC):
+    """
+    Sends a client's HTTP requests.
+
+    ``request`` returns an async context manager yielding an object with the
+    ``aiohttp.ClientResponse`` interface the client uses (``status``, ``headers``,
+    ``read()``, ``text()``, ``json()``, ``raise_for_status()``).
+    """
+
+    @abc.abstractmethod
+    def request(
+        self,
+        session: ClientSession,
+        method: str,
+        url: str,
+        endpoint: IBKREndpoint,
+        **kwargs,
+    ) -> AsyncContextManager[Any]:
+        """
+        Sends a request.
+
+        :param session: The client's HTTP session (unused by offline transports)
+        :param method: HTTP method
+        :param url: Full request URL
+        :param endpoint: Endpoint the request is for
+        :param kwargs: Further arguments for ``aiohttp.ClientSession.request``
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PassthroughTransport(Transport):
+    """Sends requests to the gateway unchanged (the default)."""
+
+    def request(self, session, method, url, endpoint, **kwargs):
+        return session.request(method, url, **kwargs)
+
+
+# Shared by clients unless a transport is passed explicitly
+default_transport = PassthroughTransport()
+
+
+async def iter_chunks(response: Any, chunk_size: int) -> AsyncIterator[bytes]:
+    """Yields a response body in chunks of at most ``chunk_size`` bytes as it arrives."""
+    async for chunk in response.content.iter_chunked(chunk_size):
+        yield chunk
+
+
+def _request_body(kwargs: Dict[str, Any]) -> Optional[str]:
+    body = kwargs.get("json", kwargs.get("data"))
+    return None if body is None else json.dumps(body, sort_keys=True, default=str)
+
+
+class RecordingTransport(PassthroughTransport):
+    """
+    Sends requests to the gateway and appends every exchange to a log.
+
+    The log has one compact JSON object per line with the request (method,
+    endpoint, path and query, body) and the response (status, relevant headers,
+    body, time to first byte and total time), so it can be replayed with
+    :class:`ReplayTransport` against any base URL. The client is handed the
+    recorded body as a :class:`ReplayedResponse`, so it reads exactly what was
+    written to the log. Records are serialized and written in a worker thread,
+    so large bodies do not stall the event loop.
+
+    :param path: Log file; existing recordings are appended to
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.records = 0
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self._file_lock = threading.Lock()
+
+    @asynccontextmanager
+    async def request(self, session, method, url, endpoint, **kwargs):
+        started = time.perf_counter()
+        async with session.request(method, url, **kwargs) as response:
+            ttfb = time.perf_counter() - started
+            body = await response.read()
+            recorded = ReplayedResponse(
+                method.upper(), url, response.status, response.headers, body
+            )
+            await asyncio.to_thread(
+                self._write,
+                {
+                    "ts": round(time.time(), 6),
+                    "m": method.upper(),
+                    "e": endpoint.name,
+                    "u": URL(url).path_qs,
+                    "q": _request_body(kwargs),
+                    "s": response.status,
+                    "h": {
+                        h: response.headers[h]
+                        for h in RECORDED_HEADERS
+                        if h in response.headers
+                    },
+                    "b": body.decode("utf-8", errors="replace"),
+                    "ttfb": round(ttfb, 6),
+                    "el": round(time.perf_counter() - started, 6),
+                },
+            )
+            yield recorded
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._file_lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self.records += 1
+
+    def close(self) -> None:
+        with self._file_lock:
+            self._file.close()
+
+
+class _BodyReader:
+    """Serves a response body held in memory like ``aiohttp.StreamReader``."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._body), n):
+            yield self._body[start : start + n]
+
+
+class ReplayedResponse:
+    """A recorded response exposing the ``aiohttp.ClientResponse`` interface used."""
+
+    def __init__(
+        self, method: str, url: str, status: int, headers: Mapping[str, str], body: bytes
+    ):
+        self.method = method
+        self.url = URL(url)
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self.content = _BodyReader(body)
+        self._body = body
+
+    @property
+    def request_info(self) -> aiohttp.RequestInfo:
+        return aiohttp.RequestInfo(
+            self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url
+        )
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        return self._body.decode(encoding or "utf-8")
+
+    async def json(self, *, loads=json.loads, **kwargs) -> Any:
+        return loads(self._body) if self._body.strip() else None
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self.request_info,
+                (),
+                status=self.status,
+                message=self._body.decode("utf-8", errors="replace")[:200],
+                headers=self.headers,
+            )
+
+
+class ReplayMissError(LookupError):
+    """Raised when a replayed request has no recorded response."""
+
+
+class ReplayTransport(Transport):
+    """
+    Serves recorded responses without any network access.
+
+    Requests are matched by method, path with query and request body. Identical
+    requests get their recorded responses in order, starting over once all were
+    used. Session upkeep requests (tickle, auth status) that were not recorded are
+    answered as authenticated so clients can connect offline.
+
+    :param path: Log written by :class:`RecordingTransport`
+    :param speed: Replay each response after its recorded duration divided by
+        ``speed`` (1.0 is real time); None replays as fast as possible
+    """
+
+    def __init__(self, path: Union[str, Path], speed: Optional[float] = None):
+        self.path = Path(path)
+        self.speed = speed
+        self.served = 0
+        self._responses: Dict[ReplayKey, Deque[Dict[str, Any]]] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = (record["m"], record["u"], record.get("q"))
+                self._responses.setdefault(key, deque()).append(record)
+        logger.info(f"Loaded {len(self)} recorded responses from {self.path}")
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._responses.values())
+
+    def _next(
+        self, method: str, url: str, endpoint: IBKREndpoint, kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        key = (method.upper(), URL(url).path_qs, _request_body(kwargs))
+        responses = self._responses.get(key)
+        if responses:
+            record = responses[0]
+            responses.rotate(-1)
+            return record
+        if endpoint in (IBKREndpoint.TICKLE, IBKREndpoint.AUTH_STATUS):
+            body: Dict[str, Any] = {
+                "authenticated": True,
+                "competing": False,
+                "connected": True,
+            }
+            if endpoint is IBKREndpoint.TICKLE:
+                body = {"session": "replay", "iserver": {"authStatus": body}}
+            return {"s": 200, "h": {}, "b": json.dumps(body), "el": 0.0}
+        raise ReplayMissError(f"No recorded response for {method.upper()} {key[1]}")
+
+    @asynccontextmanager
+    async def request(
+        self, session, method, url, endpoint, **kwargs
+    ) -> AsyncIterator[ReplayedResponse]:
+        record = self._next(method, url, endpoint, kwargs)
+        if self.speed:
+            await asyncio.sleep(record.get("el", 0.0) / self.speed)
+        self.served += 1
+        yield ReplayedResponse(
+            method.upper(),
+            url,
+            record["s"],
+            record.get("h", {}),
+            record["b"].encode("utf-8"),
+        )
@@ -0,0 +1,152 @@
+from array import array
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Union
+
+from ibwebapi.client.cache_io import atomic_write_json, read_json
+
+
+class ContractRecord(NamedTuple):
+    ticker: str
+    conid: int
+    exchange: str
+
+
+class ContractIndex:
+    """
+    In-memory symbol/conid index built from ``/trsrv/all-conids``.
+
+    Rows are stored column-wise (tickers, an int64 conid array and a small exchange
+    code table) with hash lookups by ticker, conid and exchange.
+
+    ``/trsrv/all-conids`` does not say whether a contract is a US one, so the index
+    carries a single ``is_us`` flag for all its contracts, as given by whoever built
+    it (None if not known).
+    """
+
+    def __init__(self, refreshed: Optional[date] = None, is_us: Optional[bool] = None):
+        self.refreshed = refreshed or date.today()
+        self.is_us = is_us
+        self._tickers: List[str] = []
+        self._conids = array("q")
+        self._exchange_codes = array("H")
+        self._exchanges: List[str] = []
+        self._exchange_ids: Dict[str, int] = {}
+        self._by_ticker: Dict[str, List[int]] = {}
+        self._by_conid: Dict[int, int] = {}
+        self._by_exchange: Dict[int, List[int]] = {}
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Union[ContractRecord, Dict[str, Any]]],
+        refreshed: Optional[date] = None,
+        is_us: Optional[bool] = None,
+    ) -> "ContractIndex":
+        """Builds an index from contract records or ``/trsrv/all-conids`` entries."""
+        index = cls(refreshed, is_us)
+        for record in records:
+            if isinstance(record, dict):
+                if "ticker" not in record or "conid" not in record:
+                    continue
+                index.add(record["ticker"], record["conid"], record.get("exchange", ""))
+            else:
+                index.add(*record)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._conids)
+
+    def __contains__(self, conid: int) -> bool:
+        return int(conid) in self._by_conid
+
+    def add(self, ticker: str, conid: int, exchange: str) -> None:
+        conid = int(conid)
+        if conid in self._by_conid:
+            return
+        code = self._exchange_ids.get(exchange)
+        if code is None:
+            code = self._exchange_ids[exchange] = len(self._exchanges)
+            self._exchanges.append(exchange)
+
+        row = len(self._conids)
+        self._tickers.append(ticker)
+        self._conids.append(conid)
+        self._exchange_codes.append(code)
+        self._by_ticker.setdefault(ticker, []).append(row)
+        self._by_conid[conid] = row
+        self._by_exchange.setdefault(code, []).append(row)
+
+    def _record(self, row: int) -> ContractRecord:
+        return ContractRecord(
+            self._tickers[row],
+            self._conids[row],
+            self._exchanges[self._exchange_codes[row]],
+        )
+
+    def get(self, conid: int) -> Optional[ContractRecord]:
+        """Returns the record for a conid."""
+        row = self._by_conid.get(int(conid))
+        return None if row is None else self._record(row)
+
+    def find(self, ticker: str) -> List[ContractRecord]:
+        """Returns all records for a ticker across the indexed exchanges."""
+        return [self._record(row) for row in self._by_ticker.get(ticker, [])]
+
+    def lookup(self, ticker: str, exchange: Optional[Any] = None) -> Optional[int]:
+        """
+        Resolves a ticker to a conid.
+
+        :param ticker: The symbol to resolve
+        :param exchange: Exchange (name or ``Exchange``) to prefer; None accepts any
+        :return: The conid if found, None otherwise
+        """
+        rows = self._by_ticker.get(ticker)
+        if not rows:
+            return None
+        if exchange is None:
+            return self._conids[rows[0]]
+        name = getattr(exchange, "value", exchange)
+        code = self._exchange_ids.get(name)
+        for row in rows:
+            if self._exchange_codes[row] == code:
+                return self._conids[row]
+        return None
+
+    def exchange(self, exchange: Any) -> List[ContractRecord]:
+        """Returns all records listed on an exchange."""
+        code = self._exchange_ids.get(getattr(exchange, "value", exchange))
+        if code is None:
+            return []
+        return [self._record(row) for row in self._by_exchange.get(code, [])]
+
+    def is_stale(self, max_age: timedelta) -> bool:
+        return date.today() - self.refreshed > max_age
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Writes the index to ``path`` as compact JSON."""
+        atomic_write_json(
+            Path(path),
+            {
+                "refreshed": self.refreshed.isoformat(),
+                "is_us": self.is_us,
+                "exchanges": self._exchanges,
+                "tickers": self._tickers,
+                "conids": self._conids.tolist(),
+                "exchange_codes": self._exchange_codes.tolist(),
+            },
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional["ContractIndex"]:
+        """Reads an index written by :meth:`save`; returns None if the file does not exist."""
+        stored = read_json(Path(path))
+        if stored is None:
+            return None
+        index = cls(date.fromisoformat(stored["refreshed"]), stored.get("is_us"))
+        exchanges = stored["exchanges"]
+        for ticker, conid, code in zip(
+            stored["tickers"], stored["conids"], stored["exchange_codes"]
+        ):
+            index.add(ticker, conid, exchanges[code])
+        return index
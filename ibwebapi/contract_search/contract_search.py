@@ -1,10 +1,25 @@
+import asyncio
 import json
+import logging
 from dataclasses import dataclass, field
+from datetime import timedelta
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+from urllib.parse import quote_plus
 
+import aiohttp
+
+from ibwebapi.client.codec import JSONInput, default_codec
 from ibwebapi.client.endpoints import IBKREndpoint
 from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.contract_search.contract_index import ContractIndex, ContractRecord
+from ibwebapi.contract_search.metadata_cache import MetadataCache
+
+logger = logging.getLogger(__name__)
+
+# Keeps /trsrv/stocks URLs well below common 2 KB request-line limits
+STOCK_INFO_MAX_QUERY_LENGTH = 1500
 
 
 class Exchange(Enum):
@@ -148,62 +163,218 @@ class StockData:
     stocks: List[StockInfo] = field(default_factory=list)
 
 
+def _contract_to_json(contract: Contract) -> Dict[str, Any]:
+    return {
+        "conid": contract.conid,
+        "exchange": contract.exchange.value,
+        "isUS": contract.isUS,
+    }
+
+
+def _stock_info_to_json(stock: StockInfo) -> Dict[str, Any]:
+    return {
+        "name": stock.name,
+        "chineseName": stock.chineseName,
+        "assetClass": stock.assetClass.value,
+        "contracts": [_contract_to_json(contract) for contract in stock.contracts],
+    }
+
+
+def _stock_data_to_json(data: StockData) -> Dict[str, Any]:
+    return {"stocks": [_stock_info_to_json(stock) for stock in data.stocks]}
+
+
 class StockDataEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, StockData):
-            return {"stocks": [self.default(stock) for stock in obj.stocks]}
-        elif isinstance(obj, StockInfo):
-            return {
-                "name": obj.name,
-                "chineseName": obj.chineseName,
-                "assetClass": obj.assetClass.value,
-                "contracts": [self.default(contract) for contract in obj.contracts],
-            }
-        elif isinstance(obj, Contract):
-            return {
-                "conid": obj.conid,
-                "exchange": obj.exchange.value,
-                "isUS": obj.isUS,
-            }
-        elif isinstance(obj, Enum):
-            return obj.value
-        return super().default(obj)
+    """
+    Serializes :class:`StockData` with the default codec in one pass; kept so
+    ``json.dumps(data, cls=StockDataEncoder)`` still works.
+    """
 
+    def encode(self, o: Any) -> str:
+        if isinstance(o, StockData):
+            o = _stock_data_to_json(o)
+        elif isinstance(o, StockInfo):
+            o = _stock_info_to_json(o)
+        elif isinstance(o, Contract):
+            o = _contract_to_json(o)
+        return default_codec.dumps(o).decode()
 
-class StockDataDecoder(json.JSONDecoder):
-    def __init__(self, *args, **kwargs):
-        json.JSONDecoder.__init__(self, object_hook=self.object_hook, *args, **kwargs)
+    def iterencode(self, o: Any, _one_shot: bool = False):
+        yield self.encode(o)
 
-    def object_hook(self, dct: Dict[str, Any]) -> Any:
-        if "stocks" in dct:
-            return StockData(
-                stocks=[self.object_hook(stock) for stock in dct["stocks"]]
-            )
-        elif "name" in dct and "assetClass" in dct:
-            return StockInfo(
-                name=dct["name"],
-                chineseName=dct["chineseName"],
-                assetClass=AssetClass(dct["assetClass"]),
-                contracts=[self.object_hook(contract) for contract in dct["contracts"]],
-            )
-        elif "conid" in dct:
-            return Contract(
-                conid=dct["conid"],
-                exchange=Exchange(dct.get("exchange", "UNKNOWN")),
-                isUS=dct.get("isUS"),
-            )
+
+class StockDataDecoder(json.JSONDecoder):
+    """
+    Decodes a ``{"stocks": [...]}`` document into :class:`StockData` via
+    :func:`decode_stock_data`; kept so ``json.loads(s, cls=StockDataDecoder)``
+    still works. Other documents are returned as parsed.
+    """
+
+    def decode(self, s: Any, _w: Any = None) -> Any:
+        if default_codec.typed_decoding:
+            try:
+                return default_codec.loads_as(s, StockData)
+            except ValueError:
+                pass
+        dct = default_codec.loads(s)
+        if isinstance(dct, dict) and "stocks" in dct:
+            return _stock_data_from_json(dct)
         return dct
 
 
-def encode_stock_data(data: StockData) -> str:
-    return json.dumps(data, cls=StockDataEncoder)
+def _exchange_or_unknown(value: Optional[str]) -> Exchange:
+    try:
+        return Exchange(value)
+    except ValueError:
+        return Exchange.UNKNOWN
+
+
+def _contract_from_json(dct: Dict[str, Any]) -> Contract:
+    return Contract(
+        conid=dct["conid"],
+        exchange=_exchange_or_unknown(dct.get("exchange")),
+        isUS=dct.get("isUS"),
+    )
+
 
+def _stock_info_from_json(dct: Dict[str, Any]) -> StockInfo:
+    return StockInfo(
+        name=dct["name"],
+        chineseName=dct.get("chineseName"),
+        assetClass=AssetClass(dct["assetClass"]),
+        contracts=[_contract_from_json(contract) for contract in dct["contracts"]],
+    )
 
-def decode_stock_data(json_str: str) -> StockData:
-    return json.loads(json_str, object_hook=stock_data_decoder)
+
+_ASSET_CLASSES = {asset_class.value for asset_class in AssetClass}
+
+
+def _parse_stock_data(stocks: List[Dict[str, Any]]) -> StockData:
+    """Builds :class:`StockData` from one symbol's entries in a ``/trsrv/stocks`` response."""
+    return StockData(
+        stocks=[
+            _stock_info_from_json(stock)
+            for stock in stocks
+            if stock.get("assetClass") in _ASSET_CLASSES
+        ]
+    )
+
+
+def _find_conid(stock_data: StockData, exchange: Exchange, is_us: bool) -> Optional[int]:
+    for stock in stock_data.stocks:
+        if stock.assetClass == AssetClass.STK:
+            for contract in stock.contracts:
+                if contract.exchange == exchange and contract.isUS == is_us:
+                    return contract.conid
+    return None
+
+
+def _find_stock_conid(
+    stock_info: Any, symbol: str, exchange: Exchange, is_us: bool
+) -> Optional[int]:
+    """Finds a symbol's conid in a ``/trsrv/stocks`` response."""
+    stocks = stock_info.get(symbol) if isinstance(stock_info, dict) else None
+    if not stocks:
+        return None
+    return _find_conid(_parse_stock_data(stocks), exchange, is_us)
+
+
+def encode_stock_data(data: StockData) -> str:
+    return default_codec.dumps(_stock_data_to_json(data)).decode()
+
+
+def _stock_data_from_json(dct: Dict[str, Any]) -> StockData:
+    return StockData(
+        stocks=[_stock_info_from_json(stock) for stock in dct.get("stocks", [])]
+    )
+
+
+def decode_stock_data(json_str: JSONInput) -> StockData:
+    """
+    Decodes serialized :class:`StockData`.
+
+    Codecs with typed decoding (msgspec) build the models in a single pass; other
+    codecs, and documents the typed decoder rejects (e.g. exchanges missing from
+    :class:`Exchange`, which map to ``UNKNOWN``), go through the parsed dicts.
+    """
+    if default_codec.typed_decoding:
+        try:
+            return default_codec.loads_as(json_str, StockData)
+        except ValueError:
+            pass
+    return _stock_data_from_json(default_codec.loads(json_str))
+
+
+def _batch_symbols(symbols: List[str], max_length: int) -> List[List[str]]:
+    """Packs symbols into batches whose encoded ``symbols=`` query stays within ``max_length``."""
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    length = len("symbols=")
+    for symbol in symbols:
+        # Each additional symbol also adds an encoded comma (%2C)
+        size = len(quote_plus(symbol)) + (3 if batch else 0)
+        if batch and length + size > max_length:
+            batches.append(batch)
+            batch, length, size = [], len("symbols="), len(quote_plus(symbol))
+        batch.append(symbol)
+        length += size
+    if batch:
+        batches.append(batch)
+    return batches
 
 
 class IBKRContractSearch(IBKRRESTClient):
+    def __init__(
+        self,
+        *args,
+        metadata_cache: Optional[MetadataCache] = None,
+        use_metadata_cache: bool = True,
+        **kwargs,
+    ):
+        """
+        :param metadata_cache: Cache for contract metadata responses (default: in-memory)
+        :param use_metadata_cache: Set to False to always query the gateway
+        """
+        super().__init__(*args, **kwargs)
+        self.contract_index: Optional[ContractIndex] = None
+        self.metadata_cache: Optional[MetadataCache] = None
+        if use_metadata_cache:
+            self.metadata_cache = metadata_cache or MetadataCache()
+
+    async def _cached_request(
+        self,
+        method: str,
+        endpoint: IBKREndpoint,
+        cache_params: Dict[str, Any],
+        force_refresh: bool = False,
+        **kwargs,
+    ) -> Any:
+        """Makes a request through the metadata cache."""
+        if self.metadata_cache is None:
+            return await self._request(method, endpoint, **kwargs)
+        if not force_refresh:
+            hit, value = await self.metadata_cache.get(endpoint, cache_params)
+            self._record_cache("metadata", hit)
+            if hit:
+                return value
+        value = await self._request(method, endpoint, **kwargs)
+        await self.metadata_cache.set(endpoint, cache_params, value)
+        return value
+
+    async def invalidate_metadata(
+        self,
+        endpoint: Optional[IBKREndpoint] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Drops cached contract metadata.
+
+        :param endpoint: Only drop entries for this endpoint (default: all)
+        :param params: Only drop the entry for these parameters, as passed to the endpoint
+        """
+        if self.metadata_cache is not None:
+            await self.metadata_cache.invalidate(endpoint, params)
+
     async def search_contract(self, symbol: str) -> Dict[str, Any]:
         """
         Searches for a contract by symbol and returns the contract details.
@@ -216,32 +387,45 @@ class IBKRContractSearch(IBKRRESTClient):
             "GET", IBKREndpoint.CONTRACT_SEARCH, query_params=query_params
         )
 
-    async def get_stock_info(self, symbols: str) -> Dict[str, List[Dict[str, Any]]]:
+    async def get_stock_info(
+        self, symbols: str, force_refresh: bool = False
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Retrieves detailed stock information for given symbols.
 
         :param symbols: Comma-separated string of stock symbols
+        :param force_refresh: Bypass the metadata cache
         :return: Dictionary with symbols as keys and lists of stock info as values
         """
         query_params = {"symbols": symbols}
 
-        response = await self._request(
+        response = await self._cached_request(
             "GET",
             IBKREndpoint.STOCK_INFO,
+            query_params,
+            force_refresh,
             query_params=query_params,
         )
 
         return response
 
-    async def get_contract_details(self, conid: int) -> Dict[str, Any]:
+    async def get_contract_details(
+        self, conid: int, force_refresh: bool = False
+    ) -> Dict[str, Any]:
         """
         Returns a list of contract details for the given conid.
 
         :param conid: The contract identifier
+        :param force_refresh: Bypass the metadata cache
         :return: Dictionary containing contract details
         """
-        return await self._request(
-            "GET", IBKREndpoint.CONTRACT_DETAILS, path_params={"conid": conid}
+        path_params = {"conid": conid}
+        return await self._cached_request(
+            "GET",
+            IBKREndpoint.CONTRACT_DETAILS,
+            path_params,
+            force_refresh,
+            path_params=path_params,
         )
 
     async def test_module(self) -> str:
@@ -249,24 +433,29 @@ class IBKRContractSearch(IBKRRESTClient):
         return "test_module"
 
     async def get_contract_rules(
-        self, conid: int, isBuy: bool = True
+        self, conid: int, isBuy: bool = True, force_refresh: bool = False
     ) -> Dict[str, Any]:
         """
         Returns trading related rules for a specific contract and side.
 
         :param conid: The contract identifier
         :param isBuy: True for buy side rules, False for sell side rules
+        :param force_refresh: Bypass the metadata cache
         :return: Dictionary containing contract rules
         """
         data = {"conid": conid, "isBuy": isBuy}
-        return await self._request("POST", IBKREndpoint.CONTRACT_RULES, json=data)
+        return await self._cached_request(
+            "POST", IBKREndpoint.CONTRACT_RULES, data, force_refresh, json=data
+        )
 
-    async def get_secdef(self, conid: int) -> Dict[str, Any]:
+    async def get_secdef(self, conid: int, force_refresh: bool = False) -> Dict[str, Any]:
         """
         Returns the security definition for the given conid.
         """
         data = {"conids": conid}
-        return await self._request("GET", IBKREndpoint.SECDEF, query_params=data)
+        return await self._cached_request(
+            "GET", IBKREndpoint.SECDEF, data, force_refresh, query_params=data
+        )
 
     async def get_secdef_info(
         self,
@@ -275,6 +464,7 @@ class IBKRContractSearch(IBKRRESTClient):
         month: Optional[str] = None,
         strike: Optional[float] = None,
         right: Optional[str] = None,
+        force_refresh: bool = False,
     ) -> Dict[str, Any]:
         """
         Validates the contract ID for the derivative contract.
@@ -284,6 +474,7 @@ class IBKRContractSearch(IBKRRESTClient):
         :param month: The expiration month (e.g., "JAN25")
         :param strike: The strike price
         :param right: The option right (e.g., "C" for call, "P" for put)
+        :param force_refresh: Bypass the metadata cache
         :return: Dictionary containing contract validation information
         """
         query_params: dict[str, Union[str, float, int]] = {"conid": conid}
@@ -296,8 +487,12 @@ class IBKRContractSearch(IBKRRESTClient):
         if right:
             query_params["right"] = right
 
-        return await self._request(
-            "GET", IBKREndpoint.SECDEF_INFO, query_params=query_params
+        return await self._cached_request(
+            "GET",
+            IBKREndpoint.SECDEF_INFO,
+            query_params,
+            force_refresh,
+            query_params=query_params,
         )
 
     async def get_all_conids(self, exchange: Exchange) -> List[Dict[str, Any]]:
@@ -312,20 +507,111 @@ class IBKRContractSearch(IBKRRESTClient):
         )
         return [response] if isinstance(response, dict) else response
 
-    async def get_strikes(self, conid: int, sectype: str, month: str) -> Dict[str, Any]:
+    async def iter_all_conids(
+        self, exchange: Exchange, chunk_size: int = 1 << 16
+    ) -> AsyncIterator[ContractRecord]:
+        """
+        Streams all contracts made available on a requested exchange.
+
+        The response is parsed while it is received and each entry is yielded as a
+        compact record, so the full list is never held in memory. Records can be
+        added to an index or written to a file as they arrive::
+
+            async for ticker, conid, exchange in client.iter_all_conids(Exchange.NYSE):
+                f.write(f"{ticker},{conid},{exchange}\n")
+
+        :param exchange: The exchange to retrieve contracts for
+        :param chunk_size: Bytes of the response parsed at a time
+        :return: Async iterator of contract records in response order
+        """
+        entries = self._stream_request(
+            "GET",
+            IBKREndpoint.ALL_CONIDS,
+            query_params={"exchange": exchange.value},
+            chunk_size=chunk_size,
+        )
+        try:
+            async for entry in entries:
+                if "ticker" in entry and "conid" in entry:
+                    yield ContractRecord(
+                        entry["ticker"], int(entry["conid"]), entry.get("exchange", "")
+                    )
+        finally:
+            # Ends the request right away if the caller stops iterating early
+            await entries.aclose()
+
+    async def build_contract_index(
+        self,
+        exchanges: Iterable[Exchange],
+        path: Optional[Union[str, Path]] = None,
+        max_age: timedelta = timedelta(days=1),
+        force_refresh: bool = False,
+        is_us: Optional[bool] = None,
+    ) -> ContractIndex:
+        """
+        Builds a local symbol/conid index from all contracts on the given exchanges.
+
+        If ``path`` points to an index refreshed within ``max_age`` it is loaded instead
+        of querying the gateway; a freshly built index is written to ``path``. The
+        index is kept as ``self.contract_index`` and used by
+        :meth:`get_contract_for_stock` and :meth:`get_contracts_for_stocks` for
+        lookups whose ``is_us`` matches the one given here.
+
+        :param exchanges: Exchanges to index
+        :param path: File to persist the index to
+        :param max_age: Maximum age of a persisted index before it is rebuilt
+        :param force_refresh: Rebuild from the gateway even if a fresh index exists
+        :param is_us: Whether the contracts on these exchanges are US ones; the
+            gateway does not say, and an index without it is not used for lookups
+        :return: The contract index
+        """
+        index = None
+        if path is not None and not force_refresh:
+            index = await asyncio.to_thread(ContractIndex.load, path)
+            if index is not None and (index.is_stale(max_age) or index.is_us != is_us):
+                index = None
+
+        if index is None:
+            # Exchanges are streamed one after another, which keeps the index order
+            # (and so lookups without an exchange) independent of response timing
+            index = ContractIndex(is_us=is_us)
+            for exchange in exchanges:
+                async for record in self.iter_all_conids(exchange):
+                    index.add(*record)
+            if path is not None:
+                await asyncio.to_thread(index.save, path)
+
+        self.contract_index = index
+        return index
+
+    async def get_strikes(
+        self, conid: int, sectype: str, month: str, force_refresh: bool = False
+    ) -> Dict[str, Any]:
         """
         Retrieves all strikes for a given underlying and expiration.
 
         :param conid: The contract identifier of the underlying
         :param sectype: The security type (e.g., "OPT" for options)
         :param month: The expiration month (e.g., "JAN25")
+        :param force_refresh: Bypass the metadata cache
         :return: Dictionary containing strike information
         """
         query_params = {"conid": conid, "secType": sectype, "month": month}
-        return await self._request(
-            "GET", IBKREndpoint.STRIKES, query_params=query_params
+        return await self._cached_request(
+            "GET",
+            IBKREndpoint.STRIKES,
+            query_params,
+            force_refresh,
+            query_params=query_params,
         )
 
+    def _index_lookup(self, symbol: str, exchange: Exchange, is_us: bool) -> Optional[int]:
+        """Looks a symbol up in the contract index if it was built for ``is_us``."""
+        index = self.contract_index
+        if index is None or index.is_us is None or index.is_us != is_us:
+            return None
+        return index.lookup(symbol, exchange)
+
     async def get_contract_for_stock(
         self, symbol: str, exchange: Exchange, is_us: bool
     ) -> Optional[int]:
@@ -337,18 +623,75 @@ class IBKRContractSearch(IBKRRESTClient):
         :param is_us: Whether the stock is a US stock
         :return: The conid if found, None otherwise
         """
+        conid = self._index_lookup(symbol, exchange, is_us)
+        if conid is not None:
+            return conid
+
         stock_info = await self.get_stock_info(symbol)
+        return _find_stock_conid(stock_info, symbol, exchange, is_us)
 
-        if symbol not in stock_info:
-            return None
+    async def get_contracts_for_stocks(
+        self, symbols: Iterable[str], exchange: Exchange, is_us: bool
+    ) -> Dict[str, Optional[int]]:
+        """
+        Resolves many stock symbols to conids.
 
-        for stock in stock_info[symbol]:
-            if stock["assetClass"] == "STK":
-                for contract in stock["contracts"]:
-                    if (
-                        contract.get("exchange") == exchange.value
-                        and contract.get("isUS") == is_us
-                    ):
-                        return contract["conid"]
+        Symbols found in the contract index or the metadata cache are resolved
+        locally. The rest are packed into as few comma-separated ``/trsrv/stocks``
+        requests as the URL length allows, and the requests run concurrently within
+        the rate limit. Responses are cached per symbol, under the same key as
+        :meth:`get_stock_info` for that symbol alone.
 
-        return None
+        A failed request is logged and its symbols are left out of the result, so the
+        symbols of the other requests are still returned.
+
+        :param symbols: The symbols to resolve
+        :param exchange: The exchange to search in
+        :param is_us: Whether the stocks are US stocks
+        :return: Dictionary mapping each symbol to its conid, or None if not found
+        """
+        result: Dict[str, Optional[int]] = {}
+        remaining: List[str] = []
+        for symbol in dict.fromkeys(symbols):
+            conid = self._index_lookup(symbol, exchange, is_us)
+            if conid is not None:
+                result[symbol] = conid
+                continue
+            if self.metadata_cache is not None:
+                hit, stock_info = await self.metadata_cache.get(
+                    IBKREndpoint.STOCK_INFO, {"symbols": symbol}
+                )
+                self._record_cache("metadata", hit)
+                if hit:
+                    result[symbol] = _find_stock_conid(stock_info, symbol, exchange, is_us)
+                    continue
+            remaining.append(symbol)
+
+        async def resolve(batch: List[str]) -> None:
+            try:
+                stock_info = await self._request(
+                    "GET",
+                    IBKREndpoint.STOCK_INFO,
+                    query_params={"symbols": ",".join(batch)},
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+                # RuntimeError: disconnected, or the gateway session did not recover
+                logger.error(f"Stock info request for {len(batch)} symbols failed: {e}")
+                return
+            if not isinstance(stock_info, dict):
+                stock_info = {}
+            for symbol in batch:
+                entry = {symbol: stock_info.get(symbol) or []}
+                if self.metadata_cache is not None:
+                    await self.metadata_cache.set(
+                        IBKREndpoint.STOCK_INFO, {"symbols": symbol}, entry
+                    )
+                result[symbol] = _find_stock_conid(entry, symbol, exchange, is_us)
+
+        await asyncio.gather(
+            *(
+                resolve(batch)
+                for batch in _batch_symbols(remaining, STOCK_INFO_MAX_QUERY_LENGTH)
+            )
+        )
+        return result
@@ -0,0 +1,169 @@
+import asyncio
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from ibwebapi.client.endpoints import IBKREndpoint
+
+DEFAULT_TTLS: Dict[IBKREndpoint, float] = {
+    IBKREndpoint.STRIKES: 60 * 60,
+}
+
+
+class MetadataCache:
+    """
+    Size-bounded LRU cache with per-endpoint TTLs for contract metadata.
+
+    Entries live in memory and, if ``path`` is given, in an SQLite database so they
+    survive restarts. SQLite access runs in a worker thread; expired rows are
+    deleted when the database is opened and whenever an entry is written.
+
+    Values are copied on the way in and out, so callers may modify what they get.
+
+    :param max_entries: Maximum number of entries kept in memory
+    :param default_ttl: Seconds an entry stays valid unless overridden per endpoint
+    :param ttls: Per-endpoint TTL overrides in seconds
+    :param path: SQLite database file for persistent storage (None keeps entries in memory only)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        default_ttl: float = 24 * 60 * 60,
+        ttls: Optional[Dict[IBKREndpoint, float]] = None,
+        path: Optional[Union[str, Path]] = None,
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "endpoint TEXT, key TEXT, expires REAL, value TEXT, "
+                "PRIMARY KEY (endpoint, key))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_expires ON metadata (expires)"
+            )
+            self._purge_expired()
+            self._db.commit()
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def ttl(self, endpoint: IBKREndpoint) -> float:
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    async def get(
+        self, endpoint: IBKREndpoint, params: Dict[str, Any]
+    ) -> Tuple[bool, Any]:
+        """
+        Looks up a cached response.
+
+        :return: ``(True, value)`` on a hit, ``(False, None)`` on a miss
+        """
+        key = (endpoint.name, self.make_key(params))
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._db_get, key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, copy.deepcopy(entry[1])
+        if entry is not None:
+            self._entries.pop(key, None)
+        self.misses += 1
+        return False, None
+
+    async def set(
+        self, endpoint: IBKREndpoint, params: Dict[str, Any], value: Any
+    ) -> None:
+        """Stores a response for the endpoint's TTL."""
+        key = (endpoint.name, self.make_key(params))
+        entry = (time.time() + self.ttl(endpoint), copy.deepcopy(value))
+        self._remember(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, entry)
+
+    async def invalidate(
+        self,
+        endpoint: Optional[IBKREndpoint] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Removes cached entries.
+
+        :param endpoint: Only remove entries for this endpoint (default: all endpoints)
+        :param params: Only remove the entry for these request parameters
+        """
+        if endpoint is None:
+            self._entries.clear()
+        elif params is None:
+            for key in [k for k in self._entries if k[0] == endpoint.name]:
+                del self._entries[key]
+        else:
+            self._entries.pop((endpoint.name, self.make_key(params)), None)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_delete, endpoint, params)
+
+    def _remember(self, key: Tuple[str, str], entry: Tuple[float, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: Tuple[str, str]) -> Optional[Tuple[float, Any]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires, value FROM metadata WHERE endpoint = ? AND key = ?", key
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _db_set(self, key: Tuple[str, str], entry: Tuple[float, Any]) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                (*key, entry[0], json.dumps(entry[1])),
+            )
+            self._purge_expired()
+            self._db.commit()
+
+    def _purge_expired(self) -> None:
+        self._db.execute("DELETE FROM metadata WHERE expires <= ?", (time.time(),))
+
+    def _db_delete(
+        self, endpoint: Optional[IBKREndpoint], params: Optional[Dict[str, Any]]
+    ) -> None:
+        with self._db_lock:
+            if endpoint is None:
+                self._db.execute("DELETE FROM metadata")
+            elif params is None:
+                self._db.execute(
+                    "DELETE FROM metadata WHERE endpoint = ?", (endpoint.name,)
+                )
+            else:
+                self._db.execute(
+                    "DELETE FROM metadata WHERE endpoint = ? AND key = ?",
+                    (endpoint.name, self.make_key(params)),
+                )
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
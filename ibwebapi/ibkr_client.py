@@ -0,0 +1,16 @@
+from ibwebapi.contract_search.contract_search import IBKRContractSearch
+from ibwebapi.market_data.market_data import IBKRMarketData
+from ibwebapi.portfolio.portfolio import IBKRPortfolio
+
+
+class IBKRClient(IBKRMarketData, IBKRContractSearch, IBKRPortfolio):
+    """
+    Single client exposing market data, contract search and portfolio endpoints.
+
+    All API mixins go through one connection pool and one rate budget. To share them
+    with other clients as well, pass the same ``shared_session``::
+
+        async with IBKRSession(limit=20, global_rate_limit=50) as pool:
+            async with IBKRClient(base_url, shared_session=pool) as client:
+                ...
+    """
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ibwebapi.market_data.columnar import BarColumns
+from ibwebapi.market_data.market_data import BarSize, IBKRMarketData
+
+logger = logging.getLogger(__name__)
+
+
+class CompletedBar(NamedTuple):
+    conid: int
+    bar: BarSize
+    t: int  # bar start, epoch ms
+    o: float
+    h: float
+    l: float  # noqa: E741
+    c: float
+    v: float
+    # The bar's window was not observed from start to end, e.g. the first bar
+    # after subscribing or a reconnect, or the open bar at shutdown
+    partial: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the bar in the gateway's history format (as used by ``HistoricalBar``)."""
+        return {"t": self.t, "o": self.o, "h": self.h, "l": self.l, "c": self.c, "v": self.v}
+
+
+class _BarState:
+    __slots__ = ("start", "o", "h", "l", "c", "v", "observed")
+
+    def __init__(self, start: int, price: float, size: float, observed: bool):
+        self.start = start
+        self.o = self.h = self.l = self.c = price
+        self.v = size
+        self.observed = observed
+
+
+class BarAggregator:
+    """
+    Rolls trades into OHLCV bars incrementally.
+
+    Keeps one open bar per ``(conid, BarSize)`` and updates it in place, so each trade
+    costs O(1) per bar size. A bar is completed when a trade arrives in a later bar
+    window or when :meth:`flush` is called with a time past its end. Bars are aligned
+    to the epoch plus ``offset_ms`` and time-stamped with their start.
+
+    The first bar of each contract began before the aggregator saw any trades, so it
+    is completed as ``partial``; so are open bars dropped by :meth:`reset` after a
+    gap in the trade stream and bars flushed before their window ended.
+
+    :param bar_sizes: Intraday bar sizes to build
+    :param offset_ms: Shift of the bar grid relative to the epoch
+    """
+
+    def __init__(self, bar_sizes: Iterable[BarSize], offset_ms: int = 0):
+        self.bar_sizes = list(bar_sizes)
+        for bar in self.bar_sizes:
+            if bar.duration_ms >= BarSize.DAY_1.duration_ms:
+                raise ValueError(f"Only intraday bars can be aggregated, not {bar.value}")
+        self.offset_ms = offset_ms
+        self._durations = [(bar, bar.duration_ms) for bar in self.bar_sizes]
+        self._open: Dict[Tuple[int, BarSize], _BarState] = {}
+
+    def add_trade(
+        self, conid: int, t: int, price: float, size: float = 0.0
+    ) -> List[CompletedBar]:
+        """
+        Adds a trade and returns the bars it completed.
+
+        :param conid: Contract identifier
+        :param t: Trade time in epoch ms
+        :param price: Trade price
+        :param size: Trade size
+        """
+        completed: List[CompletedBar] = []
+        for bar, duration in self._durations:
+            start = t - (t - self.offset_ms) % duration
+            key = (conid, bar)
+            state = self._open.get(key)
+            if state is None:
+                self._open[key] = _BarState(start, price, size, observed=False)
+            elif start == state.start:
+                if price > state.h:
+                    state.h = price
+                elif price < state.l:
+                    state.l = price
+                state.c = price
+                state.v += size
+            elif start > state.start:
+                completed.append(self._complete(conid, bar, state))
+                self._open[key] = _BarState(start, price, size, observed=True)
+            # Trades for an already completed bar are dropped
+        return completed
+
+    def add_tick(self, tick: Any) -> List[CompletedBar]:
+        """Adds a streaming tick; ticks without a last price are ignored."""
+        if tick.last is None:
+            return []
+        return self.add_trade(tick.conid, tick.t, tick.last, tick.last_size or 0.0)
+
+    def flush(self, now: Optional[int] = None) -> List[CompletedBar]:
+        """
+        Completes open bars.
+
+        :param now: Only complete bars whose window ended by this time (epoch ms);
+            None completes all open bars, as partial
+        """
+        completed: List[CompletedBar] = []
+        ended = now is not None
+        for (conid, bar), state in list(self._open.items()):
+            if now is None or state.start + bar.duration_ms <= now:
+                completed.append(self._complete(conid, bar, state, ended))
+                del self._open[(conid, bar)]
+        return completed
+
+    def reset(self, conid: Optional[int] = None) -> List[CompletedBar]:
+        """
+        Drops open bars after trades may have been missed, e.g. on a reconnect.
+
+        :param conid: Contract whose bars to drop (default: all)
+        :return: The dropped bars, completed as partial
+        """
+        completed: List[CompletedBar] = []
+        for (bar_conid, bar), state in list(self._open.items()):
+            if conid is None or bar_conid == conid:
+                completed.append(self._complete(bar_conid, bar, state, ended=False))
+                del self._open[(bar_conid, bar)]
+        return completed
+
+    @staticmethod
+    def _complete(
+        conid: int, bar: BarSize, state: _BarState, ended: bool = True
+    ) -> CompletedBar:
+        partial = not (state.observed and ended)
+        return CompletedBar(
+            conid, bar, state.start, state.o, state.h, state.l, state.c, state.v, partial
+        )
+
+    async def run(
+        self,
+        ticks: AsyncIterator[Any],
+        market_data: IBKRMarketData,
+        outside_rth: bool = False,
+        persist_interval: float = 60.0,
+    ) -> None:
+        """
+        Aggregates a tick stream and appends completed bars to the local bar store.
+
+        Completed bars are buffered and written every ``persist_interval`` seconds
+        and when the stream ends. Only fully observed bars are stored: partial bars
+        are dropped, as are open bars at the end and, when ``ticks`` counts its
+        ``interruptions`` (like a streaming :class:`Subscription`), open bars at
+        each interruption.
+
+        :param ticks: Async iterator of ticks, e.g. a market data subscription
+        :param market_data: Client whose bar store receives the bars
+        :param outside_rth: Store the bars as including data outside regular trading hours
+        :param persist_interval: Seconds between writes to the bar store
+        """
+        loop = asyncio.get_running_loop()
+        pending: List[CompletedBar] = []
+        last_persist = loop.time()
+        interruptions = getattr(ticks, "interruptions", 0)
+        try:
+            async for tick in ticks:
+                if getattr(ticks, "interruptions", 0) != interruptions:
+                    interruptions = getattr(ticks, "interruptions", 0)
+                    self.reset()
+                pending.extend(bar for bar in self.add_tick(tick) if not bar.partial)
+                if pending and loop.time() - last_persist >= persist_interval:
+                    await self.persist(pending, market_data, outside_rth)
+                    pending = []
+                    last_persist = loop.time()
+        finally:
+            # Bars whose window ended while the stream was still observed are complete
+            ended = self.flush(int(time.time() * 1000))
+            pending.extend(bar for bar in ended if not bar.partial)
+            self.reset()
+            if pending:
+                await self.persist(pending, market_data, outside_rth)
+
+    @staticmethod
+    async def persist(
+        bars: Iterable[CompletedBar], market_data: IBKRMarketData, outside_rth: bool = False
+    ) -> None:
+        """Appends bars to the bar store of ``market_data``, skipping partial ones."""
+        groups: Dict[Tuple[int, BarSize], List[CompletedBar]] = {}
+        for bar in bars:
+            if not bar.partial:
+                groups.setdefault((bar.conid, bar.bar), []).append(bar)
+        for (conid, bar_size), group in groups.items():
+            group.sort(key=lambda b: b.t)
+            await market_data.append_bars(
+                str(conid),
+                bar_size,
+                BarColumns.from_rows([(b.t, b.o, b.h, b.l, b.c, b.v) for b in group]),
+                outside_rth,
+            )
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ibwebapi.client.cache_io import (
+    CacheDirectories,
+    atomic_write_json,
+    read_json,
+)
+from ibwebapi.market_data.columnar import BarColumns, read_bars, write_bars
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[int, int]
+
+# Appended segments per series before they are compacted into the main file
+MAX_SEGMENTS = 64
+
+
+@dataclass(frozen=True)
+class BarKey:
+    conid: str
+    bar: str
+    outside_rth: bool
+    exchange: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        name = f"bars_{self.bar}_orth={'1' if self.outside_rth else '0'}"
+        return name + (f"_exchange={self.exchange}" if self.exchange else "")
+
+
+def add_interval(intervals: List[Interval], new: Interval) -> List[Interval]:
+    """Adds ``new`` to a sorted list of disjoint intervals, merging overlaps."""
+    start, end = new
+    merged: List[Interval] = []
+    for s, e in intervals:
+        if e < start or s > end:
+            merged.append((s, e))
+        else:
+            start, end = min(start, s), max(end, e)
+    merged.append((start, end))
+    merged.sort()
+    return merged
+
+
+def subtract_intervals(wanted: Interval, covered: List[Interval]) -> List[Interval]:
+    """Returns the parts of ``wanted`` not contained in the ``covered`` intervals."""
+    start, end = wanted
+    gaps: List[Interval] = []
+    for s, e in covered:
+        if e <= start:
+            continue
+        if s >= end:
+            break
+        if s > start:
+            gaps.append((start, s))
+        start = max(start, e)
+    if start < end:
+        gaps.append((start, end))
+    return gaps
+
+
+@dataclass
+class BarSeries:
+    """Bars for one :class:`BarKey`, sorted by timestamp (epoch ms)."""
+
+    bars: BarColumns = field(default_factory=BarColumns)
+    coverage: List[Interval] = field(default_factory=list)
+    meta: Dict[str, Any] = field(default_factory=dict)
+    # Segment files written since the last compaction: (number, bar count)
+    segments: List[Tuple[int, int]] = field(default_factory=list)
+
+    def merge(self, bars: BarColumns) -> None:
+        """Merges bars into the series; newer bars replace older ones with the same timestamp."""
+        self.bars = self.bars.merge(bars)
+
+    def slice(self, start: int, end: int) -> BarColumns:
+        """Returns a view of the bars with ``start <= t <= end``."""
+        return self.bars.between(start, end)
+
+
+class BarStore:
+    """
+    Time-indexed local store of historical bars.
+
+    Bars are kept per ``(conid, bar size, outside RTH[, exchange])`` together with the
+    time ranges already fetched from the gateway, so overlapping requests only need to
+    fetch the ranges that are missing. Each series is stored as a columnar ``.bars``
+    file (memory-mapped on load) plus a small JSON sidecar with coverage and metadata.
+    New bars are appended as small segment files next to it, which are compacted into
+    the main file once they hold as many bars as it does, so storing a series chunk by
+    chunk does not rewrite it every time.
+
+    Disk access in the async methods runs in a worker thread, and writes to a series
+    are serialized and atomic.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._series: Dict[BarKey, BarSeries] = {}
+        self._locks: Dict[BarKey, asyncio.Lock] = {}
+        self._directories = CacheDirectories()
+
+    def path(self, key: BarKey) -> Path:
+        return self.root / str(key.conid) / f"{key.name}.json"
+
+    def bars_path(self, key: BarKey) -> Path:
+        return self.root / str(key.conid) / f"{key.name}.bars"
+
+    def segment_path(self, key: BarKey, number: int) -> Path:
+        return self.root / str(key.conid) / f"{key.name}.{number}.bars"
+
+    def _lock(self, key: BarKey) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def series(self, key: BarKey) -> BarSeries:
+        """
+        Returns the series for ``key``, loading it from disk on first access.
+
+        Loading blocks; in coroutines call :meth:`load` first.
+        """
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = self._load(key)
+        return series
+
+    async def load(self, key: BarKey) -> BarSeries:
+        """Returns the series for ``key``, loading it in a worker thread on first access."""
+        series = self._series.get(key)
+        if series is None:
+            async with self._lock(key):
+                series = self._series.get(key)
+                if series is None:
+                    series = await asyncio.to_thread(self._load, key)
+                    self._series[key] = series
+        return series
+
+    def _load(self, key: BarKey) -> BarSeries:
+        stored = read_json(self.path(key))
+        if stored is None:
+            return BarSeries()
+        series = BarSeries(
+            coverage=[tuple(interval) for interval in stored.get("coverage", [])],
+            meta=stored.get("meta", {}),
+            segments=[tuple(segment) for segment in stored.get("segments", [])],
+        )
+        bars_path = self.bars_path(key)
+        if bars_path.exists():
+            series.bars = read_bars(bars_path)
+        # Segments are small: combine them first, then merge into the main file once
+        appended = BarColumns()
+        for number, _ in series.segments:
+            appended = appended.merge(read_bars(self.segment_path(key, number)))
+        series.merge(appended)
+        return series
+
+    def _save(
+        self, key: BarKey, series: BarSeries, bars: BarColumns
+    ) -> List[Tuple[int, int]]:
+        """
+        Persists ``series`` after ``bars`` were merged into it.
+
+        Only ``bars`` are written, as a new segment, unless the segments are due for
+        compaction. Returns the segments the series consists of afterwards.
+        """
+        self._directories.ensure(self.path(key).parent)
+        segments = list(series.segments)
+        stale: List[Tuple[int, int]] = []
+        if len(bars):
+            appended = sum(count for _, count in segments) + len(bars)
+            if 2 * appended >= len(series.bars) or len(segments) >= MAX_SEGMENTS:
+                write_bars(self.bars_path(key), series.bars)
+                stale, segments = segments, []
+            else:
+                number = segments[-1][0] + 1 if segments else 0
+                write_bars(self.segment_path(key, number), bars)
+                segments.append((number, len(bars)))
+        atomic_write_json(
+            self.path(key),
+            {"coverage": series.coverage, "meta": series.meta, "segments": segments},
+        )
+        # Compacted segments are only removed once the sidecar no longer lists them
+        for number, _ in stale:
+            self.segment_path(key, number).unlink(missing_ok=True)
+        return segments
+
+    def _add(
+        self, key: BarKey, series: BarSeries, bars: BarColumns
+    ) -> Tuple[BarColumns, List[Tuple[int, int]]]:
+        merged = BarSeries(
+            series.bars.merge(bars), series.coverage, series.meta, series.segments
+        )
+        return merged.bars, self._save(key, merged, bars)
+
+    def missing(self, key: BarKey, start: int, end: int) -> List[Interval]:
+        """Returns the sub-ranges of ``[start, end]`` (epoch ms) not yet stored."""
+        return subtract_intervals((start, end), self.series(key).coverage)
+
+    async def add(
+        self,
+        key: BarKey,
+        bars: BarColumns,
+        covered: Optional[Interval] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Merges fetched bars into the store and persists them.
+
+        Both the merge and the write run in a worker thread; the series is updated
+        once they are done.
+
+        :param key: Series the bars belong to
+        :param bars: Bars to add
+        :param covered: Time range the bars are known to be complete for
+        :param meta: Response metadata to keep alongside the bars
+        """
+        series = await self.load(key)
+        async with self._lock(key):
+            coverage = series.coverage
+            if covered and covered[0] < covered[1]:
+                coverage = add_interval(coverage, covered)
+            snapshot = BarSeries(
+                series.bars, coverage, meta or series.meta, series.segments
+            )
+            merged, segments = await asyncio.to_thread(self._add, key, snapshot, bars)
+            series.bars = merged
+            series.coverage = snapshot.coverage
+            series.meta = snapshot.meta
+            series.segments = segments
+
+    def query(self, key: BarKey, start: int, end: int) -> BarColumns:
+        """Returns a view of the stored bars between ``start`` and ``end`` (epoch ms)."""
+        return self.series(key).slice(start, end)
+
+    def invalidate(self, key: BarKey) -> None:
+        """Drops everything stored for ``key``."""
+        self._series.pop(key, None)
+        stored = read_json(self.path(key)) or {}
+        for number, _ in stored.get("segments", []):
+            self.segment_path(key, number).unlink(missing_ok=True)
+        self.path(key).unlink(missing_ok=True)
+        self.bars_path(key).unlink(missing_ok=True)
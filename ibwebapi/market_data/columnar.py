@@ -0,0 +1,258 @@
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+    overload,
+)
+
+from ibwebapi.client.cache_io import atomic_write
+
+# Column name -> array typecode: epoch-ms timestamps and float64 OHLCV
+COLUMNS = {"t": "q", "o": "d", "h": "d", "l": "d", "c": "d", "v": "d"}
+
+_MAGIC = b"IBBARS\x01"
+# magic, byte order flag, number of bars
+_HEADER = struct.Struct("<7sBQ")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+Column = Union[array, memoryview]
+
+
+class BarView:
+    """Lazy view of a single bar; field values are read from the columns on access."""
+
+    __slots__ = ("_bars", "_i")
+
+    def __init__(self, bars: "BarColumns", i: int):
+        self._bars = bars
+        self._i = i
+
+    @property
+    def t(self) -> int:
+        return self._bars.t[self._i]
+
+    @property
+    def o(self) -> float:
+        return self._bars.o[self._i]
+
+    @property
+    def h(self) -> float:
+        return self._bars.h[self._i]
+
+    @property
+    def l(self) -> float:  # noqa: E743
+        return self._bars.l[self._i]
+
+    @property
+    def c(self) -> float:
+        return self._bars.c[self._i]
+
+    @property
+    def volume(self) -> float:
+        return self._bars.v[self._i]
+
+    @property
+    def timestamp(self) -> datetime:
+        """Bar time as a naive UTC datetime."""
+        t = datetime.fromtimestamp(self.t / 1000, tz=timezone.utc)
+        return t.replace(tzinfo=None)
+
+    def __repr__(self) -> str:
+        return (
+            f"BarView(t={self.t}, o={self.o}, h={self.h}, l={self.l}, "
+            f"c={self.c}, volume={self.volume})"
+        )
+
+
+class BarColumns:
+    """
+    Fixed-width columnar storage for OHLCV bars.
+
+    Each column is a flat buffer (``array`` in memory or a ``memoryview`` over a
+    memory-mapped file), so slicing and conversion to NumPy do not copy or build
+    per-bar objects.
+    """
+
+    __slots__ = ("t", "o", "h", "l", "c", "v", "_mmap")
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, Column]] = None,
+        _mmap: Optional[mmap.mmap] = None,
+    ):
+        columns = columns or {}
+        for name, typecode in COLUMNS.items():
+            setattr(self, name, columns.get(name, array(typecode)))
+        self._mmap = _mmap
+
+    @classmethod
+    def from_bars(cls, bars: Iterable[Dict[str, Any]]) -> "BarColumns":
+        """Builds columns from bar dictionaries as returned by the gateway."""
+        bars = bars if isinstance(bars, list) else list(bars)
+        columns = {
+            name: array(typecode, [bar.get(name) or 0 for bar in bars])
+            for name, typecode in COLUMNS.items()
+        }
+        return cls(columns).sorted()
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[float]]) -> "BarColumns":
+        """Builds columns from ``(t, o, h, l, c, v)`` tuples sorted by time."""
+        columns = {
+            name: array(typecode, (row[i] for row in rows))
+            for i, (name, typecode) in enumerate(COLUMNS.items())
+        }
+        return cls(columns)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def columns(self) -> Dict[str, Column]:
+        return {name: getattr(self, name) for name in COLUMNS}
+
+    def row(self, i: int) -> tuple:
+        return tuple(getattr(self, name)[i] for name in COLUMNS)
+
+    def to_bars(self) -> List[Dict[str, Any]]:
+        """Returns the bars as dictionaries in the gateway's format."""
+        names = list(COLUMNS)
+        return [dict(zip(names, row)) for row in zip(*self.columns().values())]
+
+    def sorted(self) -> "BarColumns":
+        """Returns the bars ordered by time, keeping the last bar for duplicate times."""
+        t = self.t
+        if all(t[i] < t[i + 1] for i in range(len(t) - 1)):
+            return self
+        latest = {t[i]: i for i in range(len(t))}
+        return BarColumns.from_rows([self.row(latest[ts]) for ts in sorted(latest)])
+
+    def between(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> "BarColumns":
+        """Returns a zero-copy view of the bars with ``start <= t <= end`` (epoch ms)."""
+        lo = 0 if start is None else bisect_left(self.t, start)
+        hi = len(self) if end is None else bisect_right(self.t, end)
+        return self[lo:hi]
+
+    def __iter__(self) -> Iterator[BarView]:
+        return (BarView(self, i) for i in range(len(self)))
+
+    @overload
+    def __getitem__(self, index: int) -> BarView: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "BarColumns": ...
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("bar index out of range")
+            return BarView(self, index)
+        return BarColumns(
+            {name: memoryview(column)[index] for name, column in self.columns().items()},
+            self._mmap,
+        )
+
+    def merge(self, other: "BarColumns") -> "BarColumns":
+        """Merges two sorted sets of bars; bars in ``other`` win on equal timestamps."""
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        first, last = other.t[0], other.t[-1]
+        lo = bisect_left(self.t, first)
+        hi = bisect_right(self.t, last)
+        middle = other
+        if lo < hi:
+            # Only the overlapping window needs row-wise merging
+            overlap = {self.t[i]: self.row(i) for i in range(lo, hi)}
+            overlap.update((other.t[i], other.row(i)) for i in range(len(other)))
+            middle = BarColumns.from_rows([overlap[ts] for ts in sorted(overlap)])
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            # Whole ranges are copied as bytes, not element by element
+            column = array(typecode)
+            own = memoryview(getattr(self, name))
+            for part in (own[:lo], memoryview(getattr(middle, name)), own[hi:]):
+                column.frombytes(part.cast("B"))
+            columns[name] = column
+        return BarColumns(columns)
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Returns the columns as NumPy arrays sharing this object's memory."""
+        import numpy as np
+
+        return {
+            name: np.frombuffer(column, dtype=np.int64 if COLUMNS[name] == "q" else np.float64)
+            for name, column in self.columns().items()
+        }
+
+    def to_pandas(self) -> Any:
+        """Returns a pandas DataFrame indexed by UTC timestamp."""
+        import pandas as pd
+
+        columns = self.to_numpy()
+        index = pd.to_datetime(columns.pop("t"), unit="ms", utc=True)
+        return pd.DataFrame(columns, index=index)
+
+    def to_arrow(self) -> Any:
+        """Returns a ``pyarrow.Table`` with one column per field."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("Arrow export requires the 'pyarrow' package") from e
+
+        return pa.table(self.to_numpy())
+
+    def write_parquet(self, path: Union[str, Path]) -> None:
+        """Exports the bars to a Parquet file."""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), str(path))
+
+
+def write_bars(path: Path, bars: BarColumns) -> None:
+    """Writes bars to ``path`` in the columnar cache format."""
+
+    def write(f: BinaryIO) -> None:
+        f.write(_HEADER.pack(_MAGIC, 1 if _LITTLE_ENDIAN else 0, len(bars)))
+        for name in COLUMNS:
+            f.write(memoryview(getattr(bars, name)).cast("B"))
+
+    # Existing files may be memory-mapped by readers, so never write them in place
+    atomic_write(Path(path), write)
+
+
+def read_bars(path: Path) -> BarColumns:
+    """Memory-maps a file written by :func:`write_bars`."""
+    with Path(path).open("rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, little_endian, count = _HEADER.unpack_from(mapped)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a bar cache file")
+    if bool(little_endian) != _LITTLE_ENDIAN:
+        raise ValueError(f"{path} was written on a machine with a different byte order")
+
+    view = memoryview(mapped)
+    offset = _HEADER.size
+    columns = {}
+    for name, typecode in COLUMNS.items():
+        size = count * 8
+        columns[name] = view[offset : offset + size].cast(typecode)
+        offset += size
+    return BarColumns(columns, mapped)
@@ -0,0 +1,49 @@
+from typing import Any, Optional
+
+
+class MarketDataField:
+    """Field codes used by market data snapshots and ``smd`` subscriptions."""
+
+    LAST = "31"
+    HIGH = "70"
+    LOW = "71"
+    CHANGE = "82"
+    CHANGE_PCT = "83"
+    BID = "84"
+    ASK_SIZE = "85"
+    ASK = "86"
+    VOLUME = "87"
+    BID_SIZE = "88"
+    LAST_SIZE = "7059"
+    OPEN = "7295"
+    CLOSE = "7296"
+    PRIOR_CLOSE = "7741"
+
+
+DEFAULT_FIELDS = [
+    MarketDataField.LAST,
+    MarketDataField.BID,
+    MarketDataField.ASK,
+    MarketDataField.BID_SIZE,
+    MarketDataField.ASK_SIZE,
+    MarketDataField.LAST_SIZE,
+    MarketDataField.VOLUME,
+]
+
+_SUFFIXES = {"K": 1e3, "M": 1e6, "B": 1e9}
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Parses gateway values such as ``"C189.25"``, ``"1,200"`` or ``"1.5K"``."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).replace(",", "").lstrip("CH")
+    multiplier = _SUFFIXES.get(text[-1:], 1)
+    if multiplier != 1:
+        text = text[:-1]
+    try:
+        return float(text) * multiplier
+    except ValueError:
+        return None
@@ -1,13 +1,62 @@
+import asyncio
 import json
 import logging
-from dataclasses import dataclass, field
-from datetime import datetime
+import re
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, Optional
-
-from ibwebapi.client.endpoints import IBKREndpoint
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from ibwebapi.client.cache_io import CacheDirectories, atomic_write_json, read_json
+from ibwebapi.client.codec import default_codec
+from ibwebapi.client.endpoints import IBKREndpoint, Priority
 from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.market_data.bar_store import BarKey, BarStore
+from ibwebapi.market_data.columnar import BarColumns, read_bars, write_bars
+from ibwebapi.market_data.fields import DEFAULT_FIELDS
+from ibwebapi.market_data.snapshot import SNAPSHOT_MAX_CONIDS, SnapshotData
+
+# Maximum number of bars the gateway returns for a single history request
+HISTORY_MAX_POINTS = 1000
+
+_UNIT_MS = {
+    "min": 60_000,
+    "h": 3_600_000,
+    "d": 86_400_000,
+    "w": 7 * 86_400_000,
+    "m": 30 * 86_400_000,
+    "y": 365 * 86_400_000,
+}
+
+
+def _duration_ms(value: str) -> int:
+    match = re.fullmatch(r"(\d+)(min|h|d|w|m|y)", value)
+    if not match:
+        raise ValueError(f"Invalid duration: {value}")
+    return int(match.group(1)) * _UNIT_MS[match.group(2)]
+
+
+def _to_epoch_ms(dt: datetime) -> int:
+    # Naive datetimes are interpreted as UTC, like the gateway's startTime
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _from_epoch_ms(ms: int) -> datetime:
+    # Bar timestamps are naive UTC throughout, matching _to_epoch_ms
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
 
 
 class TimePeriod(Enum):
@@ -72,6 +121,11 @@ class TimePeriod(Enum):
     YEAR_4 = "4y"
     YEAR_5 = "5y"
 
+    @property
+    def duration_ms(self) -> int:
+        """Approximate calendar length of the period in milliseconds."""
+        return _duration_ms(self.value)
+
 
 class BarSize(Enum):
     MIN_1 = "1min"
@@ -90,6 +144,11 @@ class BarSize(Enum):
     WEEK_1 = "1w"
     MONTH_1 = "1m"
 
+    @property
+    def duration_ms(self) -> int:
+        """Approximate length of one bar in milliseconds."""
+        return _duration_ms(self.value)
+
 
 @dataclass
 class HistoricalBar:
@@ -99,12 +158,12 @@ class HistoricalBar:
     l: float  # noqa: E741
     volume: float = field(metadata={"json_key": "v"})
     timestamp: datetime = field(
-        metadata={"json_key": "t"}, default_factory=lambda: datetime.fromtimestamp(0)
+        metadata={"json_key": "t"}, default_factory=lambda: _from_epoch_ms(0)
     )
 
     def __post_init__(self):
         if isinstance(self.timestamp, int):
-            self.timestamp = datetime.fromtimestamp(self.timestamp // 1000)
+            self.timestamp = _from_epoch_ms(self.timestamp)
 
 
 @dataclass
@@ -134,48 +193,125 @@ class HistoricalData:
     data: list[HistoricalBar] = field(default_factory=list)
 
 
+@dataclass
+class ColumnarHistoricalData(HistoricalData):
+    """
+    :class:`HistoricalData` whose bars are held in columnar arrays.
+
+    ``data`` is a :class:`BarColumns`: iterating it yields lazy bar views, and
+    ``to_numpy()``/``to_pandas()`` expose the columns without per-bar objects.
+    """
+
+    data: BarColumns = field(default_factory=BarColumns)
+
+    def between(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> "ColumnarHistoricalData":
+        """Returns a copy restricted to bars with ``start <= timestamp <= end``."""
+        bars = self.data.between(
+            _to_epoch_ms(start) if start else None,
+            _to_epoch_ms(end) if end else None,
+        )
+        return replace(self, data=bars, points=len(bars))
+
+    def to_numpy(self) -> Dict[str, Any]:
+        return self.data.to_numpy()
+
+    def to_pandas(self) -> Any:
+        return self.data.to_pandas()
+
+
+@dataclass
+class HistoricalFetchResult:
+    """Outcome of fetching historical data for one contract in a batch."""
+
+    conid: str
+    data: Optional[ColumnarHistoricalData] = None
+    error: Optional[BaseException] = None
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class HistoricalDataJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, HistoricalData):
-            return obj.__dict__
-        if isinstance(obj, HistoricalBar):
-            return {
-                field.metadata.get("json_key", field.name): getattr(obj, field.name)
-                for field in obj.__dataclass_fields__.values()
-            }
-        return super().default(obj)
+    """
+    Serializes :class:`HistoricalData` in the gateway's format (bars keyed ``o``,
+    ``c``, ``h``, ``l``, ``v`` and ``t`` in epoch milliseconds) with the default
+    codec; kept so ``json.dumps(data, cls=HistoricalDataJSONEncoder)`` still works.
+    """
+
+    def encode(self, o: Any) -> str:
+        if isinstance(o, HistoricalData):
+            o = {**o.__dict__, "data": _bars_to_json(o.data)}
+        return default_codec.dumps(o).decode()
+
+    def iterencode(self, o: Any, _one_shot: bool = False):
+        yield self.encode(o)
 
 
 class HistoricalDataJSONDecoder(json.JSONDecoder):
-    def __init__(self, *args, **kwargs):
-        json.JSONDecoder.__init__(self, object_hook=self.object_hook, *args, **kwargs)
-
-    def object_hook(self, dct: Dict[str, Any]) -> Any:
-        if all(key in dct for key in ["o", "c", "h", "l", "v", "t"]):
-            return HistoricalBar(
-                o=dct["o"],
-                c=dct["c"],
-                h=dct["h"],
-                l=dct["l"],
-                volume=dct["v"],
-                timestamp=dct["t"],
-            )
-        if "serverId" in dct and "data" in dct:
-            dct["data"] = [
-                self.object_hook(bar) if isinstance(bar, dict) else bar
-                for bar in dct["data"]
-            ]
-            return HistoricalData(**dct)
-        return dct
+    """
+    Builds :class:`HistoricalData` from a ``/iserver/marketdata/history`` body.
+
+    The body is parsed once by the default codec and the bars go through
+    :class:`BarColumns` instead of a per-object hook; kept so
+    ``json.loads(body, cls=HistoricalDataJSONDecoder)`` still works.
+    """
+
+    def decode(self, s: Any, _w: Any = None) -> Any:
+        dct = default_codec.loads(s)
+        if not isinstance(dct, dict) or "serverId" not in dct or "data" not in dct:
+            return dct
+        bars = BarColumns.from_bars(dct["data"] or [])
+        dct["data"] = [
+            HistoricalBar(o, c, h, l, v, t)  # noqa: E741
+            for t, o, h, l, c, v in zip(*bars.columns().values())
+        ]
+        return HistoricalData(**dct)
+
+
+def _bars_to_json(bars: Any) -> List[Dict[str, Any]]:
+    if isinstance(bars, BarColumns):
+        return bars.to_bars()
+    return [
+        bar
+        if isinstance(bar, dict)
+        else {
+            "o": bar.o,
+            "c": bar.c,
+            "h": bar.h,
+            "l": bar.l,
+            "v": bar.volume,
+            "t": _to_epoch_ms(bar.timestamp),
+        }
+        for bar in bars
+    ]
 
 
 class IBKRMarketData(IBKRRESTClient):
-    def __init__(self, *args, cache_dir: str = "./cache", **kwargs):
+    def __init__(
+        self,
+        *args,
+        cache_dir: str = "./cache",
+        settle_period: timedelta = timedelta(days=1),
+        max_history_concurrency: int = 10,
+        **kwargs,
+    ):
+        """
+        :param cache_dir: Directory for cached historical data
+        :param settle_period: How long bars may still change after their timestamp;
+            more recent ranges are always re-fetched
+        :param max_history_concurrency: Maximum history requests in flight per call
+        """
         super().__init__(*args, **kwargs)
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.settle_period = settle_period
+        self.max_history_concurrency = max_history_concurrency
+        self.bar_store = BarStore(self.cache_dir)
+        self._cache_directories = CacheDirectories()
         self._logger = kwargs.get("logger", logging.getLogger(__name__))
 
     def _get_cache_filename(
@@ -188,9 +324,8 @@ class IBKRMarketData(IBKRRESTClient):
         start_time: Optional[datetime],
         outside_rth: bool,
     ) -> Path:
-        # Create a subdirectory for this contract
+        # One subdirectory per contract, created on first write
         contract_dir = self.cache_dir / str(conid)
-        contract_dir.mkdir(parents=True, exist_ok=True)
 
         # Include conid in both directory and filename for clarity
         params = f"{conid}_{bar.value}_{period.value}"
@@ -200,6 +335,35 @@ class IBKRMarketData(IBKRRESTClient):
 
         return contract_dir / f"{prefix}_{params}.json"
 
+    async def _fetch_historical_data(
+        self,
+        conid: str,
+        bar: BarSize,
+        period: TimePeriod,
+        exchange: Optional[str],
+        start_time: Optional[datetime],
+        outside_rth: bool,
+        priority: Optional[Priority] = None,
+    ) -> Dict[str, Any]:
+        query_params = {
+            "conid": conid,
+            "bar": bar.value,
+            "period": period.value,
+            "outsideRth": str(outside_rth).lower(),
+        }
+
+        if exchange:
+            query_params["exchange"] = exchange
+        if start_time:
+            query_params["startTime"] = start_time.strftime("%Y%m%d-%H:%M:%S")
+
+        return await self._request(
+            "GET",
+            IBKREndpoint.HISTORICAL_DATA,
+            query_params=query_params,
+            priority=priority,
+        )
+
     async def get_historical_data_json(
         self,
         conid: str,
@@ -225,34 +389,110 @@ class IBKRMarketData(IBKRRESTClient):
             "hmd", conid, bar, period, exchange, start_time, outside_rth
         )
 
-        if not force_refresh and Path(cache_file).exists():
-            self._logger.info(f"Using cached data from {cache_file}")
-            with Path(cache_file).open("r") as f:
-                return json.load(f)
-
-        query_params = {
-            "conid": conid,
-            "bar": bar.value,
-            "period": period.value,
-            "outsideRth": str(outside_rth).lower(),
-        }
-
-        if exchange:
-            query_params["exchange"] = exchange
-        if start_time:
-            query_params["startTime"] = start_time.strftime("%Y%m%d-%H:%M:%S")
+        if not force_refresh:
+            cached = await asyncio.to_thread(self._read_cached_response, cache_file)
+            self._record_cache("history_file", cached is not None)
+            if cached is not None:
+                self._logger.info(f"Using cached data from {cache_file}")
+                return cached
 
-        response = await self._request(
-            "GET", IBKREndpoint.HISTORICAL_DATA, query_params=query_params
+        response = await self._fetch_historical_data(
+            conid, bar, period, exchange, start_time, outside_rth
         )
-        data = json.dumps(response)
 
         # Cache the response
-        with Path(cache_file).open("w") as f:
-            f.write(data)
+        await asyncio.to_thread(self._write_cached_response, cache_file, response)
+
+        return response
 
+    @staticmethod
+    def _read_cached_response(cache_file: Path) -> Optional[Dict[str, Any]]:
+        response = read_json(cache_file)
+        if response is None:
+            return None
+        # Bars live in a columnar file next to the metadata; older cache
+        # entries still carry them inline.
+        bars_file = Path(cache_file).with_suffix(".bars")
+        if "data" not in response and bars_file.exists():
+            response["data"] = read_bars(bars_file).to_bars()
         return response
-        # return response
+
+    def _write_cached_response(self, cache_file: Path, response: Dict[str, Any]) -> None:
+        self._cache_directories.ensure(Path(cache_file).parent)
+        meta = response
+        if isinstance(response, dict) and "data" in response:
+            meta = {k: v for k, v in response.items() if k != "data"}
+            write_bars(
+                Path(cache_file).with_suffix(".bars"),
+                BarColumns.from_bars(response["data"] or []),
+            )
+        atomic_write_json(cache_file, meta)
+
+    async def append_bars(
+        self,
+        conid: str,
+        bar: BarSize,
+        bars: BarColumns,
+        outside_rth: bool = False,
+        exchange: Optional[str] = None,
+        covered_until: Optional[datetime] = None,
+    ) -> None:
+        """
+        Adds locally built bars (e.g. from live ticks) to the bar store.
+
+        The bars are complete, so the windows of each run of consecutive bars are
+        marked as covered and later history requests for them are served without a
+        gateway round trip.
+
+        :param conid: Contract identifier
+        :param bar: Bar size of the given bars
+        :param bars: Completed bars sorted by time
+        :param outside_rth: Whether the bars include data outside regular trading hours
+        :param exchange: Exchange the bars belong to
+        :param covered_until: Only mark windows up to this time as covered, e.g. to
+            have more recent ranges re-fetched from the gateway (default: no limit)
+        """
+        key = BarKey(str(conid), bar.value, outside_rth, exchange)
+        duration = bar.duration_ms
+        limit = _to_epoch_ms(covered_until) if covered_until else None
+        run_start = 0
+        # Mark each run of consecutive bars as one covered interval
+        for i in range(1, len(bars) + 1):
+            if i == len(bars) or bars.t[i] != bars.t[i - 1] + duration:
+                run = bars[run_start:i]
+                run_end = run.t[-1] + duration
+                covered = (run.t[0], run_end if limit is None else min(run_end, limit))
+                await self.bar_store.add(key, run, covered)
+                run_start = i
+
+    def load_bars(
+        self,
+        conid: str,
+        bar: BarSize,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        outside_rth: bool = False,
+        exchange: Optional[str] = None,
+    ) -> BarColumns:
+        """
+        Returns locally stored bars without contacting the gateway.
+
+        The result is a zero-copy view over the memory-mapped cache; use
+        ``to_numpy()``, ``to_pandas()`` or ``to_arrow()`` to hand it to other libraries.
+
+        :param conid: Contract identifier
+        :param bar: Bar size
+        :param start: Earliest bar time to return (default: all)
+        :param end: Latest bar time to return (default: all)
+        :param outside_rth: Whether to read bars that include data outside regular trading hours
+        :param exchange: Exchange the bars were requested from
+        :return: Columnar bars
+        """
+        key = BarKey(str(conid), bar.value, outside_rth, exchange)
+        return self.bar_store.series(key).bars.between(
+            _to_epoch_ms(start) if start else None,
+            _to_epoch_ms(end) if end else None,
+        )
 
     async def get_historical_data(
         self,
@@ -263,22 +503,401 @@ class IBKRMarketData(IBKRRESTClient):
         start_time: Optional[datetime] = None,
         outside_rth: bool = False,
         force_refresh: bool = False,
+        priority: Optional[Priority] = None,
     ) -> HistoricalData:
         """
         Retrieves historical market data for a given contract.
 
+        Bars are served from the local bar store; only the parts of the requested
+        range that have not been fetched before are requested from the gateway.
+
         :param conid: Contract identifier for the ticker symbol of interest
         :param bar: Individual bars of data to be returned (e.g., '1min', '5min', '1h', '1d')
         :param period: Overall duration for which data should be returned (default: '1w')
         :param exchange: Returns the data from the specified exchange
         :param start_time: Starting date and time of the request duration
         :param outside_rth: Include data outside regular trading hours
+        :param priority: Scheduling priority of the requests (default: the endpoint's)
         :return: Dictionary containing historical market data
         """
+        meta, bars = await self._query_bar_store(
+            conid, bar, period, exchange, start_time, outside_rth, force_refresh, priority
+        )
+        return HistoricalData(**{**meta, "data": bars.to_bars(), "points": len(bars)})
+
+    async def get_historical_data_columnar(
+        self,
+        conid: str,
+        bar: BarSize,
+        period: TimePeriod = TimePeriod.WEEK_1,
+        exchange: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        outside_rth: bool = False,
+        force_refresh: bool = False,
+        priority: Optional[Priority] = None,
+    ) -> ColumnarHistoricalData:
+        """
+        Same as :meth:`get_historical_data`, but returns the bars as columnar arrays
+        (int64 epoch-ms timestamps, float64 OHLCV) instead of one object per bar.
+        """
+        meta, bars = await self._query_bar_store(
+            conid, bar, period, exchange, start_time, outside_rth, force_refresh, priority
+        )
+        return ColumnarHistoricalData(**{**meta, "data": bars, "points": len(bars)})
+
+    async def get_historical_data_many(
+        self,
+        conids: Iterable[str],
+        bar: BarSize,
+        period: TimePeriod = TimePeriod.WEEK_1,
+        exchange: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        outside_rth: bool = False,
+        max_concurrency: int = 10,
+        progress: Optional[Callable[[int, int], None]] = None,
+        priority: Priority = Priority.BULK,
+    ) -> AsyncIterator[HistoricalFetchResult]:
+        """
+        Retrieves historical market data for many contracts.
+
+        At most ``max_concurrency`` workers take contracts in turn. A contract
+        whose range is in the local bar store up to the settled time (older than
+        ``settle_period``) is answered from the store, including whatever newer bars
+        it holds; the others are fetched through the rate limiter. A failure for one
+        contract is reported in its result and does not stop the batch.
+
+        :param conids: Contract identifiers
+        :param bar: Individual bars of data to be returned
+        :param period: Overall duration for which data should be returned (default: '1w')
+        :param exchange: Returns the data from the specified exchange
+        :param start_time: Starting date and time of the request duration
+        :param outside_rth: Include data outside regular trading hours
+        :param max_concurrency: Maximum number of contracts fetched at once
+        :param progress: Called with ``(completed, total)`` after every contract
+        :param priority: Scheduling priority of the requests (default: bulk)
+        :return: Async iterator of results in completion order
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        conids = [str(conid) for conid in conids]
+        total = len(conids)
+        end = _to_epoch_ms(start_time or datetime.now(timezone.utc))
+        start = end - period.duration_ms
+        settled = _to_epoch_ms(datetime.now(timezone.utc) - self.settle_period)
+        # No bar starts between the last bar boundary and the settled time, so
+        # coverage up to that boundary is enough
+        settled -= settled % bar.duration_ms
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for conid in conids:
+            pending.put_nowait(conid)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def cached(conid: str) -> Optional[ColumnarHistoricalData]:
+            key = BarKey(conid, bar.value, outside_rth, exchange)
+            series = await self.bar_store.load(key)
+            # Unsettled bars are never marked as covered
+            if not series.meta or self.bar_store.missing(key, start, min(end, settled)):
+                return None
+            bars = self.bar_store.query(key, start, end)
+            return ColumnarHistoricalData(
+                **{**series.meta, "data": bars, "points": len(bars)}
+            )
+
+        async def worker() -> None:
+            while not pending.empty():
+                conid = pending.get_nowait()
+                try:
+                    data = await cached(conid)
+                    if data is not None:
+                        self._record_cache("bar_store", True)
+                        results.put_nowait(HistoricalFetchResult(conid, data, cached=True))
+                        continue
+                    data = await self.get_historical_data_columnar(
+                        conid,
+                        bar,
+                        period,
+                        exchange,
+                        start_time,
+                        outside_rth,
+                        priority=priority,
+                    )
+                    results.put_nowait(HistoricalFetchResult(conid, data))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._logger.error(f"Failed to fetch historical data for {conid}: {e}")
+                    results.put_nowait(HistoricalFetchResult(conid, error=e))
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(max_concurrency, total))
+        ]
+        try:
+            for completed in range(1, total + 1):
+                result = await results.get()
+                if progress:
+                    progress(completed, total)
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _query_bar_store(
+        self,
+        conid: str,
+        bar: BarSize,
+        period: TimePeriod,
+        exchange: Optional[str],
+        start_time: Optional[datetime],
+        outside_rth: bool,
+        force_refresh: bool,
+        priority: Optional[Priority] = None,
+    ) -> Tuple[Dict[str, Any], BarColumns]:
+        key = BarKey(str(conid), bar.value, outside_rth, exchange)
+        end = _to_epoch_ms(start_time or datetime.now(timezone.utc))
+        start = end - period.duration_ms
+
+        await self._fill_bar_store(key, bar, start, end, force_refresh, priority)
+
+        bars = self.bar_store.query(key, start, end)
+        return dict(self.bar_store.series(key).meta), bars
+
+    @staticmethod
+    def _period_for(duration_ms: int) -> TimePeriod:
+        """Returns the shortest period covering ``duration_ms``."""
+        periods = sorted(TimePeriod, key=lambda p: p.duration_ms)
+        for period in periods:
+            if period.duration_ms >= duration_ms:
+                return period
+        return periods[-1]
+
+    @staticmethod
+    def _max_chunk_ms(bar: BarSize, outside_rth: bool) -> int:
+        """Longest calendar span a single request can cover within the point cap."""
+        span = HISTORY_MAX_POINTS * bar.duration_ms
+        if bar.duration_ms < _UNIT_MS["d"]:
+            # Intraday bars only exist while the market is open
+            trading_hours = 16 if outside_rth else 6.5
+            return int(span * 24 / trading_hours)
+        # Daily and longer bars skip weekends
+        return span * 7 // 5
+
+    @classmethod
+    def plan_backfill(
+        cls, bar: BarSize, start: int, end: int, outside_rth: bool = False
+    ) -> List[Tuple[TimePeriod, int]]:
+        """
+        Splits ``[start, end]`` (epoch ms) into history requests.
+
+        Each chunk uses the longest period whose bars still fit in one response; the
+        last chunk uses the shortest period that covers what is left.
+
+        :return: ``(period, end time)`` pairs, newest first
+        """
+        periods = sorted(TimePeriod, key=lambda p: p.duration_ms)
+        max_span = cls._max_chunk_ms(bar, outside_rth)
+        fitting = [p for p in periods if p.duration_ms <= max_span] or periods[:1]
+        longest = fitting[-1]
+
+        chunks: List[Tuple[TimePeriod, int]] = []
+        chunk_end = end
+        while chunk_end > start:
+            remaining = chunk_end - start
+            period = (
+                longest if remaining > longest.duration_ms else cls._period_for(remaining)
+            )
+            chunks.append((period, chunk_end))
+            chunk_end -= period.duration_ms
+        return chunks
+
+    async def _fill_bar_store(
+        self,
+        key: BarKey,
+        bar: BarSize,
+        start: int,
+        end: int,
+        force_refresh: bool,
+        priority: Optional[Priority] = None,
+    ) -> None:
+        """Fetches the parts of ``[start, end]`` missing from the bar store."""
+        series = await self.bar_store.load(key)
+        gaps = [(start, end)] if force_refresh else self.bar_store.missing(key, start, end)
+        if not force_refresh:
+            self._record_cache("bar_store", not gaps)
+        if not gaps and not series.meta:
+            # Bars appended locally carry no response metadata; fetch the
+            # shortest window once to get it
+            gaps = [(max(start, end - bar.duration_ms), end)]
+        semaphore = asyncio.Semaphore(self.max_history_concurrency)
+
+        async def fetch(gap_start: int, period: TimePeriod, chunk_end: int) -> None:
+            async with semaphore:
+                await self._fetch_into_bar_store(
+                    key,
+                    bar,
+                    max(gap_start, chunk_end - period.duration_ms),
+                    chunk_end,
+                    period,
+                    priority,
+                )
+
+        while gaps:
+            results = await asyncio.gather(
+                *(
+                    fetch(gap_start, period, chunk_end)
+                    for gap_start, gap_end in gaps
+                    for period, chunk_end in self.plan_backfill(
+                        bar, gap_start, gap_end, key.outside_rth
+                    )
+                ),
+                return_exceptions=True,
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if errors:
+                raise errors[0]
+            if force_refresh:
+                return
+
+            # Capped responses leave part of a chunk uncovered; fetch those parts
+            # again as long as that makes progress. Unsettled data was just
+            # fetched and is never marked as covered, so leave it out.
+            settled = _to_epoch_ms(datetime.now(timezone.utc) - self.settle_period)
+            remaining = self.bar_store.missing(key, start, min(end, settled))
+            if sum(e - s for s, e in remaining) >= sum(e - s for s, e in gaps):
+                return
+            gaps = remaining
+
+    async def backfill(
+        self,
+        conid: str,
+        bar: BarSize,
+        start: datetime,
+        end: Optional[datetime] = None,
+        outside_rth: bool = False,
+        exchange: Optional[str] = None,
+        priority: Priority = Priority.BULK,
+    ) -> ColumnarHistoricalData:
+        """
+        Retrieves all bars between two points in time.
+
+        The range is split into as few history requests as the gateway's point cap
+        allows, and the requests run concurrently within the endpoint's rate limit.
+        Every chunk is written to the local bar store as soon as it arrives, so an
+        interrupted backfill resumes from where it stopped.
+
+        :param conid: Contract identifier for the ticker symbol of interest
+        :param bar: Individual bars of data to be returned
+        :param start: Earliest time to retrieve
+        :param end: Latest time to retrieve (default: now)
+        :param outside_rth: Include data outside regular trading hours
+        :param exchange: Returns the data from the specified exchange
+        :param priority: Scheduling priority of the requests (default: bulk)
+        :return: Columnar historical data for the whole range
+        """
+        key = BarKey(str(conid), bar.value, outside_rth, exchange)
+        end_ms = _to_epoch_ms(end or datetime.now(timezone.utc))
+        start_ms = _to_epoch_ms(start)
+
+        await self._fill_bar_store(key, bar, start_ms, end_ms, False, priority)
+
+        bars = self.bar_store.query(key, start_ms, end_ms)
+        meta = dict(self.bar_store.series(key).meta)
+        return ColumnarHistoricalData(**{**meta, "data": bars, "points": len(bars)})
+
+    async def _fetch_into_bar_store(
+        self,
+        key: BarKey,
+        bar: BarSize,
+        start: int,
+        end: int,
+        period: Optional[TimePeriod] = None,
+        priority: Optional[Priority] = None,
+    ) -> None:
+        period = period or self._period_for(end - start)
+        self._logger.info(
+            f"Fetching {key.bar} bars for {key.conid} from "
+            f"{_from_epoch_ms(start)} to {_from_epoch_ms(end)} ({period.value})"
+        )
+        response = await self._fetch_historical_data(
+            key.conid,
+            bar,
+            period,
+            key.exchange,
+            _from_epoch_ms(end),
+            key.outside_rth,
+            priority,
+        )
+        bars = BarColumns.from_bars(response.get("data") or [])
+
+        # Bars younger than the settle period may still change, and a capped
+        # response only covers the range of the bars it actually contains.
+        settled = _to_epoch_ms(datetime.now(timezone.utc) - self.settle_period)
+        covered_start = end - period.duration_ms
+        if len(bars) >= HISTORY_MAX_POINTS:
+            covered_start = bars.t[0]
+        covered = (max(covered_start, start), min(end, settled))
+
+        meta = {k: v for k, v in response.items() if k != "data"}
+        await self.bar_store.add(key, bars, covered, meta)
+
+    async def get_snapshot(
+        self,
+        conids: Iterable[int],
+        fields: Optional[Sequence[str]] = None,
+        max_polls: int = 5,
+        poll_interval: float = 0.5,
+    ) -> SnapshotData:
+        """
+        Retrieves current market data for many contracts.
+
+        Conids are sent in batches of the gateway's maximum size, all batches
+        concurrently. The gateway answers the first request for a contract with
+        an empty "warm-up" entry, so conids without any of the requested fields
+        are polled again, up to ``max_polls`` requests in total. Entries with some
+        fields are final: the gateway leaves out fields it has no value for.
+
+        :param conids: Contract identifiers
+        :param fields: Field codes to request (see ``MarketDataField``)
+        :param max_polls: Maximum number of requests per conid
+        :param poll_interval: Seconds to wait before polling missing conids again
+        :return: Columnar snapshot in the order of ``conids``; conids still
+            missing fields after the last poll are listed in ``missing``
+        """
+        conids = list(dict.fromkeys(int(c) for c in conids))
+        fields = list(fields or DEFAULT_FIELDS)
+        entries: Dict[int, Dict[str, Any]] = {}
+
+        pending = conids
+        for poll in range(max_polls):
+            if poll:
+                await asyncio.sleep(poll_interval)
+            responses = await asyncio.gather(
+                *(
+                    self._fetch_snapshot(pending[i : i + SNAPSHOT_MAX_CONIDS], fields)
+                    for i in range(0, len(pending), SNAPSHOT_MAX_CONIDS)
+                )
+            )
+            for response in responses:
+                for entry in response or []:
+                    if "conid" in entry:
+                        entries.setdefault(int(entry["conid"]), {}).update(entry)
+            # Only warm-up entries are polled again
+            pending = [
+                c for c in pending if not any(f in entries.get(c, {}) for f in fields)
+            ]
+            if not pending:
+                break
+
+        return SnapshotData.from_responses(conids, fields, entries)
 
-        data = await self.get_historical_data_json(
-            conid, bar, period, exchange, start_time, outside_rth, force_refresh
+    async def _fetch_snapshot(
+        self, conids: List[int], fields: List[str]
+    ) -> List[Dict[str, Any]]:
+        query_params = {
+            "conids": ",".join(str(c) for c in conids),
+            "fields": ",".join(fields),
+        }
+        return await self._request(
+            "GET", IBKREndpoint.MARKET_DATA_SNAPSHOT, query_params=query_params
         )
-        # The response is already parsed JSON, no need to parse it again
-        return HistoricalData(**data)
-        # return response
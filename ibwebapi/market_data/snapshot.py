@@ -0,0 +1,90 @@
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from ibwebapi.market_data.fields import parse_number
+
+# Maximum number of conids the gateway accepts in one snapshot request
+SNAPSHOT_MAX_CONIDS = 100
+
+
+class SnapshotData:
+    """
+    Columnar market data snapshot for many contracts.
+
+    Holds one int64 array of conids and update times plus one float64 array per
+    requested field, row-aligned with the conids. Values the gateway did not
+    return are NaN.
+
+    :param fields: Field codes of the value columns
+    """
+
+    __slots__ = ("fields", "conids", "updated", "values", "missing", "_rows")
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = list(fields)
+        self.conids = array("q")
+        self.updated = array("q")
+        self.values: Dict[str, array] = {f: array("d") for f in self.fields}
+        # Conids still lacking at least one field after the last poll
+        self.missing: List[int] = []
+        self._rows: Dict[int, int] = {}
+
+    @classmethod
+    def from_responses(
+        cls, conids: Iterable[int], fields: Sequence[str], entries: Dict[int, Dict[str, Any]]
+    ) -> "SnapshotData":
+        """Builds a snapshot from raw gateway entries keyed by conid, in ``conids`` order."""
+        data = cls(fields)
+        for conid in conids:
+            entry = entries.get(conid, {})
+            data.add(conid, int(entry.get("_updated", 0)), entry)
+            if any(f not in entry for f in data.fields):
+                data.missing.append(conid)
+        return data
+
+    def add(self, conid: int, updated: int, entry: Dict[str, Any]) -> None:
+        self._rows[conid] = len(self.conids)
+        self.conids.append(conid)
+        self.updated.append(updated)
+        for f, column in self.values.items():
+            value = parse_number(entry.get(f))
+            column.append(math.nan if value is None else value)
+
+    def __len__(self) -> int:
+        return len(self.conids)
+
+    def __contains__(self, conid: int) -> bool:
+        return int(conid) in self._rows
+
+    def column(self, field: str) -> array:
+        """Returns the values of one field, aligned with :attr:`conids`."""
+        return self.values[field]
+
+    def get(self, conid: int) -> Optional[Dict[str, float]]:
+        """Returns the field values for one contract."""
+        row = self._rows.get(int(conid))
+        if row is None:
+            return None
+        return {f: column[row] for f, column in self.values.items()}
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Returns the columns as NumPy arrays sharing this object's memory."""
+        import numpy as np
+
+        columns = {
+            "conid": np.frombuffer(self.conids, dtype=np.int64),
+            "updated": np.frombuffer(self.updated, dtype=np.int64),
+        }
+        for f, column in self.values.items():
+            columns[f] = np.frombuffer(column, dtype=np.float64)
+        return columns
+
+    def to_pandas(self) -> Any:
+        """Returns a pandas DataFrame indexed by conid with one column per field."""
+        import pandas as pd
+
+        columns = self.to_numpy()
+        index = pd.Index(columns.pop("conid"), name="conid")
+        columns["updated"] = pd.to_datetime(columns["updated"], unit="ms", utc=True)
+        return pd.DataFrame(columns, index=index)
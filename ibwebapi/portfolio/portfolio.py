@@ -1,16 +1,316 @@
-from typing import Any, Dict
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
 
-from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.endpoints import IBKREndpoint, Priority
 from ibwebapi.client.rest_client import IBKRRESTClient
 
+logger = logging.getLogger(__name__)
+
+# Number of positions the gateway returns per page
+POSITIONS_PAGE_SIZE = 100
+
+
+@dataclass
+class SummaryValue:
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+    isNull: bool = False
+    timestamp: Optional[int] = None
+    value: Optional[str] = None
+
+
+@dataclass
+class Position:
+    acctId: str
+    conid: int
+    contractDesc: str = ""
+    position: float = 0.0
+    mktPrice: float = 0.0
+    mktValue: float = 0.0
+    currency: Optional[str] = None
+    avgCost: float = 0.0
+    avgPrice: float = 0.0
+    realizedPnl: float = 0.0
+    unrealizedPnl: float = 0.0
+    assetClass: Optional[str] = None
+
+
+@dataclass
+class LedgerEntry:
+    currency: str
+    cashbalance: float = 0.0
+    settledcash: float = 0.0
+    netliquidationvalue: float = 0.0
+    stockmarketvalue: float = 0.0
+    unrealizedpnl: float = 0.0
+    realizedpnl: float = 0.0
+    exchangerate: float = 1.0
+    interest: float = 0.0
+    dividends: float = 0.0
+
+
+@dataclass
+class AccountSnapshot:
+    """
+    Summary, positions and ledger of one account.
+
+    Each part is fetched independently; parts that failed are left empty and their
+    error is kept in ``errors`` under "summary", "positions" or "ledger".
+    """
+
+    account_id: str
+    summary: Dict[str, SummaryValue] = field(default_factory=dict)
+    positions: List[Position] = field(default_factory=list)
+    ledger: Dict[str, LedgerEntry] = field(default_factory=dict)
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class PortfolioSnapshot:
+    """Consolidated state of several accounts taken at ``taken`` (UTC)."""
+
+    accounts: Dict[str, AccountSnapshot] = field(default_factory=dict)
+    taken: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+
+    @property
+    def ok(self) -> bool:
+        return all(account.ok for account in self.accounts.values())
+
+    @property
+    def failed(self) -> List[str]:
+        """IDs of accounts with at least one part that could not be fetched."""
+        return [
+            account_id for account_id, account in self.accounts.items() if not account.ok
+        ]
+
+    @property
+    def positions(self) -> List[Position]:
+        """Positions of all accounts."""
+        return [
+            position
+            for account in self.accounts.values()
+            for position in account.positions
+        ]
+
+    def totals(self, key: str) -> Dict[Optional[str], float]:
+        """
+        Sums an account summary value (e.g. "netliquidation") per currency over all
+        accounts that reported it.
+
+        :return: Totals keyed by currency (None for amounts without a currency)
+        """
+        totals: Dict[Optional[str], float] = {}
+        for account in self.accounts.values():
+            value = account.summary.get(key)
+            if value is not None and value.amount is not None:
+                totals[value.currency] = totals.get(value.currency, 0.0) + value.amount
+        return totals
+
+    def total(self, key: str, currency: Optional[str] = None) -> float:
+        """
+        Sums an account summary value (e.g. "netliquidation") over all accounts that
+        reported it.
+
+        :param key: Summary key
+        :param currency: Only add amounts in this currency; required if the accounts
+            report the value in more than one currency
+        :raises ValueError: If amounts in several currencies would be added up
+        """
+        totals = self.totals(key)
+        if currency is not None:
+            return totals.get(currency, 0.0)
+        if len(totals) > 1:
+            currencies = ", ".join(map(str, totals))
+            raise ValueError(
+                f"{key} is reported in several currencies ({currencies}); "
+                "pass a currency or use totals()"
+            )
+        return sum(totals.values())
+
+
+def _summary_from_json(dct: Dict[str, Any]) -> Dict[str, SummaryValue]:
+    return {
+        key: SummaryValue(
+            amount=value.get("amount"),
+            currency=value.get("currency"),
+            isNull=bool(value.get("isNull", False)),
+            timestamp=value.get("timestamp"),
+            value=value.get("value"),
+        )
+        for key, value in dct.items()
+        if isinstance(value, dict)
+    }
+
+
+def _position_from_json(dct: Dict[str, Any]) -> Position:
+    return Position(
+        acctId=dct.get("acctId", ""),
+        conid=int(dct["conid"]),
+        contractDesc=dct.get("contractDesc") or "",
+        position=dct.get("position") or 0.0,
+        mktPrice=dct.get("mktPrice") or 0.0,
+        mktValue=dct.get("mktValue") or 0.0,
+        currency=dct.get("currency"),
+        avgCost=dct.get("avgCost") or 0.0,
+        avgPrice=dct.get("avgPrice") or 0.0,
+        realizedPnl=dct.get("realizedPnl") or 0.0,
+        unrealizedPnl=dct.get("unrealizedPnl") or 0.0,
+        assetClass=dct.get("assetClass"),
+    )
+
+
+def _ledger_from_json(dct: Dict[str, Any]) -> Dict[str, LedgerEntry]:
+    return {
+        key: LedgerEntry(
+            currency=entry.get("currency", key),
+            cashbalance=entry.get("cashbalance") or 0.0,
+            settledcash=entry.get("settledcash") or 0.0,
+            netliquidationvalue=entry.get("netliquidationvalue") or 0.0,
+            stockmarketvalue=entry.get("stockmarketvalue") or 0.0,
+            unrealizedpnl=entry.get("unrealizedpnl") or 0.0,
+            realizedpnl=entry.get("realizedpnl") or 0.0,
+            exchangerate=entry.get("exchangerate") or 1.0,
+            interest=entry.get("interest") or 0.0,
+            dividends=entry.get("dividends") or 0.0,
+        )
+        for key, entry in dct.items()
+        if isinstance(entry, dict)
+    }
+
 
 class IBKRPortfolio(IBKRRESTClient):
-    async def get_account_summary(self, account_id: str) -> Dict[str, Any]:
+    async def get_account_summary(
+        self, account_id: str, priority: Optional[Priority] = None
+    ) -> Dict[str, Any]:
         """Retrieves account summary for a given account ID."""
         return await self._request(
-            "GET", IBKREndpoint.ACCOUNT_SUMMARY, path_params={"accountId": account_id}
+            "GET",
+            IBKREndpoint.ACCOUNT_SUMMARY,
+            path_params={"accountId": account_id},
+            priority=priority,
         )
 
     async def get_portfolio_accounts(self) -> Dict[str, Any]:
         """Retrieves a list of portfolio accounts."""
         return await self._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+
+    async def get_positions(
+        self, account_id: str, page: int = 0, priority: Optional[Priority] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves one page of positions for a given account ID.
+
+        :param account_id: The account to retrieve positions for
+        :param page: Page number, starting at 0; pages hold up to 100 positions
+        :param priority: Scheduling priority of the request (default: the endpoint's)
+        :return: List of dictionaries containing position information
+        """
+        response = await self._request(
+            "GET",
+            IBKREndpoint.POSITIONS,
+            path_params={"accountId": account_id, "pageId": page},
+            priority=priority,
+        )
+        return response or []
+
+    async def get_all_positions(
+        self, account_id: str, priority: Optional[Priority] = None
+    ) -> List[Dict[str, Any]]:
+        """Retrieves all positions for a given account ID, following the pages."""
+        positions: List[Dict[str, Any]] = []
+        page = 0
+        while True:
+            batch = await self.get_positions(account_id, page, priority)
+            positions.extend(batch)
+            if len(batch) < POSITIONS_PAGE_SIZE:
+                return positions
+            page += 1
+
+    async def get_ledger(
+        self, account_id: str, priority: Optional[Priority] = None
+    ) -> Dict[str, Any]:
+        """Retrieves cash balances and values by currency for a given account ID."""
+        return await self._request(
+            "GET",
+            IBKREndpoint.LEDGER,
+            path_params={"accountId": account_id},
+            priority=priority,
+        )
+
+    async def get_portfolio_snapshot(
+        self,
+        account_ids: Optional[Iterable[str]] = None,
+        positions: bool = True,
+        ledger: bool = True,
+        max_concurrency: int = 10,
+        priority: Optional[Priority] = None,
+    ) -> PortfolioSnapshot:
+        """
+        Retrieves summaries, positions and ledgers of many accounts at once.
+
+        Up to ``max_concurrency`` accounts are fetched at the same time, each with its
+        summary, position pages and ledger requested concurrently through the rate
+        limiter. A failed request only affects its part of its account; see
+        :attr:`AccountSnapshot.errors` and :attr:`PortfolioSnapshot.failed`.
+
+        :param account_ids: Accounts to include (default: all portfolio accounts)
+        :param positions: Include positions
+        :param ledger: Include ledgers
+        :param max_concurrency: Maximum number of accounts fetched at once
+        :param priority: Scheduling priority of the requests (default: the endpoints')
+        :return: Snapshot of all accounts
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        if account_ids is None:
+            # The gateway also expects this call before other portfolio requests
+            accounts = await self.get_portfolio_accounts()
+            account_ids = [
+                account.get("accountId") or account["id"] for account in accounts
+            ]
+        snapshot = PortfolioSnapshot()
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_part(account: AccountSnapshot, part: str, fetch, parse) -> None:
+            try:
+                setattr(account, part, parse(await fetch(account.account_id, priority)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Failed to fetch {part} for account {account.account_id}: {e}"
+                )
+                account.errors[part] = e
+
+        async def fetch_account(account_id: str) -> None:
+            account = snapshot.accounts[account_id] = AccountSnapshot(account_id)
+            parts = [
+                fetch_part(account, "summary", self.get_account_summary, _summary_from_json)
+            ]
+            if positions:
+                parts.append(
+                    fetch_part(
+                        account,
+                        "positions",
+                        self.get_all_positions,
+                        lambda batch: [_position_from_json(p) for p in batch],
+                    )
+                )
+            if ledger:
+                parts.append(
+                    fetch_part(account, "ledger", self.get_ledger, _ledger_from_json)
+                )
+            async with semaphore:
+                await asyncio.gather(*parts)
+
+        await asyncio.gather(*(fetch_account(account_id) for account_id in account_ids))
+        return snapshot
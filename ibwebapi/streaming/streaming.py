@@ -0,0 +1,353 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import aiohttp
+
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.market_data.columnar import BarColumns
+from ibwebapi.market_data.fields import DEFAULT_FIELDS, MarketDataField, parse_number
+from ibwebapi.market_data.market_data import BarSize, TimePeriod
+
+logger = logging.getLogger(__name__)
+
+
+class Tick(NamedTuple):
+    """Market data update for one contract; fields not in the update are None."""
+
+    conid: int
+    t: int  # epoch ms
+    last: Optional[float] = None
+    bid: Optional[float] = None
+    ask: Optional[float] = None
+    bid_size: Optional[float] = None
+    ask_size: Optional[float] = None
+    last_size: Optional[float] = None
+    volume: Optional[float] = None
+
+
+def decode_tick(message: Dict[str, Any]) -> Tick:
+    """Decodes an ``smd`` message into a :class:`Tick`."""
+    return Tick(
+        conid=int(message["conid"]),
+        t=int(message.get("_updated", 0)),
+        last=parse_number(message.get(MarketDataField.LAST)),
+        bid=parse_number(message.get(MarketDataField.BID)),
+        ask=parse_number(message.get(MarketDataField.ASK)),
+        bid_size=parse_number(message.get(MarketDataField.BID_SIZE)),
+        ask_size=parse_number(message.get(MarketDataField.ASK_SIZE)),
+        last_size=parse_number(message.get(MarketDataField.LAST_SIZE)),
+        volume=parse_number(message.get(MarketDataField.VOLUME)),
+    )
+
+
+_CLOSED = object()
+
+SubscriptionKey = Tuple[str, int]
+
+
+class Subscription:
+    """
+    One consumer's view of a streaming subscription.
+
+    Updates are buffered in a bounded queue; when the consumer falls behind, the
+    oldest update is dropped. Iterate with ``async for`` and close when done. If the
+    streamer stops on an unexpected error, the error is raised to the consumer.
+    ``interruptions`` counts the connection losses since subscribing; updates may
+    be missing around each of them.
+    """
+
+    def __init__(self, streamer: "IBKRStreamer", key: SubscriptionKey, maxsize: int):
+        self.key = key
+        self.dropped = 0
+        self.interruptions = 0
+        self._streamer = streamer
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._closed = False
+
+    def _put(self, item: Any) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    async def get(self) -> Any:
+        """Waits for the next update; raises ``StopAsyncIteration`` once closed."""
+        item = await self._queue.get()
+        if item is _CLOSED:
+            self._queue.put_nowait(_CLOSED)
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            self._queue.put_nowait(item)
+            raise item
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        return await self.get()
+
+    async def close(self) -> None:
+        """Stops receiving updates; the gateway subscription ends with its last consumer."""
+        if not self._closed:
+            self._closed = True
+            self._put(_CLOSED)
+            await self._streamer._unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class IBKRStreamer:
+    """
+    Streaming market data over the gateway WebSocket.
+
+    Uses the HTTP session (and thus the cookies) of a connected REST client. Each
+    conid has at most one gateway subscription, shared by any number of in-process
+    consumers. Subscriptions are restored automatically after a reconnect; failed
+    connection attempts, including a disconnected client or a session that is not
+    authenticated, are retried with exponential backoff.
+
+    :param client: Connected REST client whose session is reused
+    :param ws_url: WebSocket URL (default: ``<base_url>/ws``)
+    :param queue_size: Maximum buffered updates per consumer
+    :param ping_interval: Seconds between keepalive messages to the gateway
+    :param reconnect_delay: Initial delay before reconnecting
+    :param max_reconnect_delay: Maximum delay between reconnect attempts
+    """
+
+    def __init__(
+        self,
+        client: IBKRRESTClient,
+        ws_url: Optional[str] = None,
+        queue_size: int = 1000,
+        ping_interval: float = 55.0,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0,
+    ):
+        self.client = client
+        self.ws_url = ws_url or (
+            client.base_url.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+            + "/ws"
+        )
+        self.queue_size = queue_size
+        self.ping_interval = ping_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnects = 0
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._consumers: Dict[SubscriptionKey, List[Subscription]] = {}
+        self._requests: Dict[SubscriptionKey, str] = {}
+        self._fields: Dict[SubscriptionKey, List[str]] = {}
+        self._server_ids: Dict[SubscriptionKey, str] = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self) -> None:
+        """Starts the connection task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Closes the WebSocket and all subscriptions."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._close_all(_CLOSED)
+
+    def _close_all(self, item: Any) -> None:
+        for consumers in self._consumers.values():
+            for subscription in consumers:
+                subscription._closed = True
+                subscription._put(item)
+        self._consumers.clear()
+        self._requests.clear()
+        self._fields.clear()
+        self._server_ids.clear()
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> None:
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def subscribe_market_data(
+        self, conid: int, fields: Optional[Sequence[str]] = None
+    ) -> Subscription:
+        """
+        Subscribes to top-of-book updates for a contract.
+
+        All consumers of a contract share one gateway subscription, which requests
+        the union of their fields; it is re-sent when a consumer adds fields.
+
+        :param conid: Contract identifier
+        :param fields: Field codes to request (default: last, bid, ask, sizes, volume)
+        :return: Subscription yielding :class:`Tick` records
+        """
+        key = ("smd", int(conid))
+        fields = list(fields or DEFAULT_FIELDS)
+        current = self._fields.get(key)
+        if current is not None:
+            fields = current + [f for f in fields if f not in current]
+        self._fields[key] = fields
+        payload = json.dumps({"fields": fields})
+        return await self._subscribe(key, f"smd+{conid}+{payload}")
+
+    async def subscribe_bars(
+        self,
+        conid: int,
+        bar: BarSize,
+        period: TimePeriod = TimePeriod.DAY_1,
+        outside_rth: bool = False,
+        exchange: Optional[str] = None,
+    ) -> Subscription:
+        """
+        Subscribes to streaming historical bars for a contract.
+
+        Further consumers of the contract's bars must use the same parameters.
+
+        :param conid: Contract identifier
+        :param bar: Bar size
+        :param period: Initial history window
+        :param outside_rth: Include data outside regular trading hours
+        :param exchange: Exchange to take the data from
+        :return: Subscription yielding :class:`BarColumns` updates
+        :raises ValueError: If the bars are already subscribed with other parameters
+        """
+        params: Dict[str, Union[str, bool]] = {
+            "period": period.value,
+            "bar": bar.value,
+            "outsideRth": outside_rth,
+            "source": "trades",
+            "format": "%o/%c/%h/%l/%v",
+        }
+        if exchange:
+            params["exchange"] = exchange
+        return await self._subscribe(
+            ("smh", int(conid)), f"smh+{conid}+{json.dumps(params)}"
+        )
+
+    async def _subscribe(self, key: SubscriptionKey, request: str) -> Subscription:
+        previous = self._requests.get(key)
+        if previous is not None and previous != request and key[0] != "smd":
+            raise ValueError(
+                f"Already subscribed to {key[0]} for conid {key[1]} with other parameters"
+            )
+        subscription = Subscription(self, key, self.queue_size)
+        self._consumers.setdefault(key, []).append(subscription)
+        if request != previous:
+            self._requests[key] = request
+            await self._send(request)
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> None:
+        consumers = self._consumers.get(subscription.key)
+        if not consumers or subscription not in consumers:
+            return
+        consumers.remove(subscription)
+        if not consumers:
+            del self._consumers[subscription.key]
+            self._requests.pop(subscription.key, None)
+            self._fields.pop(subscription.key, None)
+            topic, conid = subscription.key
+            if topic == "smd":
+                await self._send(f"umd+{conid}+{{}}")
+            elif subscription.key in self._server_ids:
+                await self._send(f"umh+{self._server_ids.pop(subscription.key)}")
+
+    async def _send(self, message: str) -> None:
+        # While disconnected the request is kept and sent on reconnect
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.send_str(message)
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                await self._connect_and_listen()
+                delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+                # RuntimeError: the client is disconnected or its HTTP session closed,
+                # or the gateway session did not recover (SessionUnavailableError)
+                logger.warning(f"Streaming connection failed: {e}")
+            except Exception as e:
+                # Not a connection problem, so retrying would not help
+                logger.exception(f"Streaming stopped: {e}")
+                self._close_all(e)
+                return
+            self.reconnects += 1
+            logger.info(f"Reconnecting streaming connection in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _connect_and_listen(self) -> None:
+        session = self.client.session
+        if session is None:
+            raise RuntimeError("Not connected to IBKR API")
+        tickle = await self.client.tickle()
+        async with session.ws_connect(self.ws_url) as ws:
+            self._ws = ws
+            pinger = asyncio.create_task(self._ping(ws))
+            try:
+                if isinstance(tickle, dict) and tickle.get("session"):
+                    await ws.send_str(json.dumps({"session": tickle["session"]}))
+                for request in self._requests.values():
+                    await ws.send_str(request)
+                self._connected.set()
+                logger.info("Streaming connection established.")
+                async for message in ws:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        self._dispatch(message.data)
+                    elif message.type == aiohttp.WSMsgType.BINARY:
+                        self._dispatch(message.data.decode())
+                    elif message.type == aiohttp.WSMsgType.ERROR:
+                        break
+            finally:
+                pinger.cancel()
+                self._connected.clear()
+                self._ws = None
+                self._server_ids.clear()
+                for consumers in self._consumers.values():
+                    for subscription in consumers:
+                        subscription.interruptions += 1
+
+    async def _ping(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        while not ws.closed:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send_str("tic")
+
+    def _dispatch(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        topic = str(message.get("topic", ""))
+        if topic.startswith("smd+") and "conid" in message:
+            key = ("smd", int(message["conid"]))
+            update: Any = decode_tick(message)
+        elif topic.startswith("smh+"):
+            key = ("smh", int(topic[4:]))
+            if "serverId" in message:
+                self._server_ids[key] = str(message["serverId"])
+            update = BarColumns.from_bars(message.get("data") or [])
+        else:
+            return
+        for subscription in self._consumers.get(key, ()):
+            subscription._put(update)
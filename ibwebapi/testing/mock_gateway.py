@@ -0,0 +1,559 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from aiohttp import WSMsgType, web
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.market_data.market_data import HISTORY_MAX_POINTS, _duration_ms
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/v1/api"
+
+# Endpoints that keep answering while the session is unauthenticated
+_SESSION_ENDPOINTS = {IBKREndpoint.TICKLE, IBKREndpoint.AUTH_STATUS}
+
+
+@dataclass
+class EndpointBehavior:
+    """
+    Simulated behavior of one gateway endpoint.
+
+    :param rate_limit: Requests per second before answering 429 (None for no limit)
+    :param latency: Seconds added to every response
+    :param jitter: Random extra latency of up to this many seconds
+    :param fault_rates: Probability of answering with a status, e.g. ``{503: 0.01}``
+    :param payload_size: Number of records in list responses (all-conids, accounts,
+        positions per account)
+    """
+
+    rate_limit: Optional[float] = None
+    latency: float = 0.0
+    jitter: float = 0.0
+    fault_rates: Dict[int, float] = field(default_factory=dict)
+    payload_size: Optional[int] = None
+
+
+def conid_for(symbol: str) -> int:
+    """Returns the stable conid the mock gateway assigns to a symbol."""
+    return 100_000 + zlib.crc32(symbol.encode()) % 100_000_000
+
+
+class MockGateway:
+    """
+    Local stand-in for the Client Portal gateway.
+
+    Serves every path in :class:`IBKREndpoint` with synthetic but deterministic
+    payloads, and can simulate rate limits, latency, injected faults and expired
+    sessions per endpoint. The ``/ws`` WebSocket streams market data (``smd``) and
+    bars (``smh``) for subscribed contracts. Intended for tests and benchmarks::
+
+        behaviors = {IBKREndpoint.HISTORICAL_DATA: EndpointBehavior(rate_limit=5)}
+        async with MockGateway(behaviors=behaviors) as gateway:
+            async with IBKRMarketData(gateway.base_url) as client:
+                ...
+
+    :param host: Interface to listen on
+    :param port: Port to listen on (0 picks a free port)
+    :param behaviors: Behavior per endpoint
+    :param default_behavior: Behavior of endpoints not listed in ``behaviors``
+    :param global_rate_limit: Requests per second across all endpoints before answering 429
+    :param seed: Seed for latency jitter and fault injection
+    :param stream_interval: Seconds between streamed market data updates per contract
+    :param rate_limit_slack: Seconds by which requests may arrive early in the
+        one-second rate limit windows; a client spacing requests exactly
+        ``1 / rate_limit`` apart would otherwise be rejected for transit jitter alone
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        behaviors: Optional[Dict[IBKREndpoint, EndpointBehavior]] = None,
+        default_behavior: Optional[EndpointBehavior] = None,
+        global_rate_limit: Optional[float] = None,
+        seed: int = 0,
+        stream_interval: float = 0.05,
+        rate_limit_slack: float = 0.02,
+    ):
+        self.host = host
+        self.port = port
+        self.behaviors = dict(behaviors or {})
+        self.default_behavior = default_behavior or EndpointBehavior()
+        self.global_rate_limit = global_rate_limit
+        self.stream_interval = stream_interval
+        self.rate_limit_slack = rate_limit_slack
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+        # Messages received over the WebSocket, in order
+        self.ws_messages: List[str] = []
+        self._websockets: Set[web.WebSocketResponse] = set()
+        self._random = random.Random(seed)
+        self._windows: Dict[Optional[IBKREndpoint], Deque[float]] = {}
+        self._unauthorized_until = 0.0
+        self._warm_conids: set = set()
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        handlers: Dict[IBKREndpoint, Callable[[web.Request, EndpointBehavior], Any]] = {
+            IBKREndpoint.TICKLE: self._tickle,
+            IBKREndpoint.AUTH_STATUS: self._auth_status,
+            IBKREndpoint.ACCOUNT_SUMMARY: self._account_summary,
+            IBKREndpoint.PORTFOLIO_ACCOUNTS: self._portfolio_accounts,
+            IBKREndpoint.POSITIONS: self._positions,
+            IBKREndpoint.LEDGER: self._ledger,
+            IBKREndpoint.HISTORICAL_DATA: self._historical_data,
+            IBKREndpoint.MARKET_DATA_SNAPSHOT: self._snapshot,
+            IBKREndpoint.CONTRACT_SEARCH: self._contract_search,
+            IBKREndpoint.STOCK_INFO: self._stock_info,
+            IBKREndpoint.CONTRACT_DETAILS: self._contract_details,
+            IBKREndpoint.CONTRACT_INFO: self._contract_details,
+            IBKREndpoint.CONTRACT_RULES: self._contract_rules,
+            IBKREndpoint.SECDEF: self._secdef,
+            IBKREndpoint.SECDEF_INFO: self._secdef_info,
+            IBKREndpoint.ALL_CONIDS: self._all_conids,
+            IBKREndpoint.STRIKES: self._strikes,
+        }
+        for endpoint in IBKREndpoint:
+            handler = handlers.get(endpoint)
+            if handler is None:
+                logger.warning(f"No mock handler for {endpoint.name}")
+                continue
+            self.app.router.add_route(
+                "*", API_PREFIX + endpoint.value.path, self._wrap(endpoint, handler)
+            )
+        self.app.router.add_get(API_PREFIX + "/ws", self._websocket)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}{API_PREFIX}"
+
+    async def start(self) -> str:
+        """Starts serving and returns the base URL for clients."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = self._runner.addresses[0][1]
+        logger.info(f"Mock gateway listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def drop_websockets(self) -> None:
+        """Closes all WebSocket connections, as on a gateway restart."""
+        for ws in list(self._websockets):
+            await ws.close()
+
+    def expire_session(self, duration: float) -> None:
+        """Answers 401 (and reports the session as unauthenticated) for ``duration`` seconds."""
+        self._unauthorized_until = time.monotonic() + duration
+
+    @property
+    def authenticated(self) -> bool:
+        return time.monotonic() >= self._unauthorized_until
+
+    def _wrap(
+        self,
+        endpoint: IBKREndpoint,
+        handler: Callable[[web.Request, EndpointBehavior], Awaitable[Any]],
+    ) -> Callable[[web.Request], Awaitable[web.Response]]:
+        async def handle(request: web.Request) -> web.Response:
+            self.requests[endpoint.name] += 1
+            behavior = self.behaviors.get(endpoint, self.default_behavior)
+            status = self._reject(endpoint, behavior)
+            if status is None:
+                delay = behavior.latency + self._random.random() * behavior.jitter
+                if delay:
+                    await asyncio.sleep(delay)
+                payload = await handler(request, behavior)
+                response = web.json_response(payload)
+            else:
+                headers = {"Retry-After": "1"} if status == 429 else None
+                response = web.json_response(
+                    {"error": f"Mock gateway status {status}"}, status=status, headers=headers
+                )
+            self.responses[(endpoint.name, response.status)] += 1
+            return response
+
+        return handle
+
+    def _reject(self, endpoint: IBKREndpoint, behavior: EndpointBehavior) -> Optional[int]:
+        """Returns the error status to answer with, if any."""
+        if not self.authenticated and endpoint not in _SESSION_ENDPOINTS:
+            return 401
+        if not self._allow(endpoint, behavior.rate_limit):
+            return 429
+        if self.global_rate_limit and not self._allow(None, self.global_rate_limit):
+            return 429
+        for status, rate in behavior.fault_rates.items():
+            if self._random.random() < rate:
+                return status
+        return None
+
+    def _allow(self, key: Optional[IBKREndpoint], rate_limit: Optional[float]) -> bool:
+        # Sliding one-second window of accepted requests
+        if not rate_limit:
+            return True
+        now = time.monotonic()
+        window = self._windows.setdefault(key, deque())
+        while window and now - window[0] >= 1.0 - self.rate_limit_slack:
+            window.popleft()
+        if len(window) >= rate_limit:
+            return False
+        window.append(now)
+        return True
+
+    async def _websocket(self, request: web.Request) -> web.StreamResponse:
+        if not self.authenticated:
+            return web.json_response({"error": "not authenticated"}, status=401)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._websockets.add(ws)
+        streams: Dict[str, asyncio.Task] = {}
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                self.ws_messages.append(message.data)
+                # Topics look like "smd+<conid>+<json>", "umd+<conid>+{}", "umh+<id>"
+                topic, _, rest = message.data.partition("+")
+                target, _, payload = rest.partition("+")
+                if topic in ("smd", "umd", "umh") and target in streams:
+                    streams.pop(target).cancel()
+                if topic == "smd":
+                    fields = json.loads(payload or "{}").get("fields", [])
+                    streams[target] = asyncio.create_task(
+                        self._stream_ticks(ws, int(target), fields)
+                    )
+                elif topic == "smh":
+                    await self._send_bars(ws, int(target), json.loads(payload or "{}"))
+        finally:
+            for task in streams.values():
+                task.cancel()
+            self._websockets.discard(ws)
+        return ws
+
+    async def _stream_ticks(
+        self, ws: web.WebSocketResponse, conid: int, fields: List[str]
+    ) -> None:
+        update = 0
+        while not ws.closed:
+            update += 1
+            price = str(100 + conid % 50 + update % 100 / 100)
+            message = {"topic": f"smd+{conid}", "conid": conid}
+            message.update({f: price for f in fields}, _updated=int(time.time() * 1000))
+            await ws.send_json(message)
+            await asyncio.sleep(self.stream_interval)
+
+    async def _send_bars(
+        self, ws: web.WebSocketResponse, conid: int, params: Dict[str, Any]
+    ) -> None:
+        step = _query_duration_ms(params.get("bar", "1min"))
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - _query_duration_ms(params.get("period", "1d"))
+        await ws.send_json(
+            {
+                "topic": f"smh+{conid}",
+                "serverId": f"mock-{conid}",
+                "data": _bars(conid, step, start_ms, end_ms),
+            }
+        )
+
+    async def _tickle(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        return {
+            "session": "mock-session",
+            "ssoExpires": 600_000,
+            "collission": False,
+            "userId": 1,
+            "iserver": {"authStatus": await self._auth_status(request, behavior)},
+        }
+
+    async def _auth_status(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        return {"authenticated": self.authenticated, "competing": False, "connected": True}
+
+    def _accounts(self, behavior: EndpointBehavior) -> List[str]:
+        return [f"U{i:07d}" for i in range(1, (behavior.payload_size or 1) + 1)]
+
+    async def _portfolio_accounts(
+        self, request: web.Request, behavior: EndpointBehavior
+    ) -> Any:
+        return [
+            {"id": account, "accountId": account, "currency": "USD", "type": "INDIVIDUAL"}
+            for account in self._accounts(behavior)
+        ]
+
+    async def _account_summary(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        timestamp = int(time.time() * 1000)
+        return {
+            key: {"amount": amount, "currency": "USD", "isNull": False, "timestamp": timestamp}
+            for key, amount in (
+                ("netliquidation", 100_000.0),
+                ("totalcashvalue", 25_000.0),
+                ("grosspositionvalue", 75_000.0),
+                ("buyingpower", 200_000.0),
+            )
+        }
+
+    async def _positions(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        account = request.match_info["accountId"]
+        page = int(request.match_info["pageId"])
+        total = 250 if behavior.payload_size is None else behavior.payload_size
+        positions = []
+        # Pages of 100 like the real gateway
+        for i in range(page * 100, min(total, (page + 1) * 100)):
+            symbol = f"T{i:05d}"
+            quantity = float(10 + i % 90)
+            price = 100.0 + i % 50
+            positions.append(
+                {
+                    "acctId": account,
+                    "conid": conid_for(symbol),
+                    "contractDesc": symbol,
+                    "position": quantity,
+                    "mktPrice": price,
+                    "mktValue": quantity * price,
+                    "currency": "USD",
+                    "avgCost": price - 1.0,
+                    "avgPrice": price - 1.0,
+                    "realizedPnl": 0.0,
+                    "unrealizedPnl": quantity,
+                    "assetClass": "STK",
+                }
+            )
+        return positions
+
+    async def _ledger(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        account = request.match_info["accountId"]
+        timestamp = int(time.time())
+        return {
+            currency: {
+                "acctcode": account,
+                "currency": currency,
+                "key": "LedgerList",
+                "cashbalance": 25_000.0,
+                "settledcash": 25_000.0,
+                "netliquidationvalue": 100_000.0,
+                "stockmarketvalue": 75_000.0,
+                "unrealizedpnl": 1_000.0,
+                "realizedpnl": 0.0,
+                "exchangerate": 1.0,
+                "interest": 0.0,
+                "dividends": 0.0,
+                "timestamp": timestamp,
+            }
+            for currency in ("USD", "BASE")
+        }
+
+    async def _historical_data(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        query = request.query
+        conid = int(query["conid"])
+        step = _query_duration_ms(query["bar"])
+        if "startTime" in query:
+            end = datetime.strptime(query["startTime"], "%Y%m%d-%H:%M:%S")
+            end_ms = int(end.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        else:
+            end_ms = int(time.time() * 1000)
+        start_ms = end_ms - _query_duration_ms(query["period"])
+        data = _bars(conid, step, start_ms, end_ms)
+        return {
+            "serverId": "mock",
+            "symbol": f"C{conid}",
+            "text": f"Mock contract {conid}",
+            "priceFactor": "100",
+            "startTime": query.get("startTime", ""),
+            "high": "",
+            "low": "",
+            "timePeriod": query["period"],
+            "barLength": step // 1000,
+            "mdAvailability": "S",
+            "mktDataDelay": 0,
+            "outsideRth": query.get("outsideRth") == "true",
+            "tradingDayDuration": 1440,
+            "volumeFactor": 1,
+            "priceDisplayRule": 1,
+            "priceDisplayValue": "2",
+            "chartPanStartTime": "",
+            "direction": -1,
+            "negativeCapable": False,
+            "messageVersion": 2,
+            "points": len(data),
+            "travelTime": 1,
+            "data": data,
+        }
+
+    async def _snapshot(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        fields = request.query.get("fields", "31").split(",")
+        entries = []
+        for conid in (int(c) for c in request.query["conids"].split(",")):
+            entry: Dict[str, Any] = {"conid": conid, "conidEx": str(conid)}
+            # Like the real gateway, the first request for a contract only warms it up
+            if conid in self._warm_conids:
+                entry["_updated"] = int(time.time() * 1000)
+                entry.update({f: str(100 + conid % 50) for f in fields})
+            self._warm_conids.add(conid)
+            entries.append(entry)
+        return entries
+
+    async def _contract_search(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        symbol = request.query.get("symbol", "")
+        return [
+            {
+                "conid": str(conid_for(symbol)),
+                "companyHeader": f"{symbol} INC - NASDAQ",
+                "companyName": f"{symbol} INC",
+                "symbol": symbol,
+                "description": "NASDAQ",
+                "sections": [{"secType": "STK"}],
+            }
+        ]
+
+    async def _stock_info(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        symbols = [s for s in request.query.get("symbols", "").split(",") if s]
+        return {
+            symbol: [
+                {
+                    "name": f"{symbol} INC",
+                    "chineseName": None,
+                    "assetClass": "STK",
+                    "contracts": [
+                        {"conid": conid_for(symbol), "exchange": "NASDAQ", "isUS": True}
+                    ],
+                }
+            ]
+            for symbol in symbols
+        }
+
+    async def _contract_details(
+        self, request: web.Request, behavior: EndpointBehavior
+    ) -> Any:
+        conid = int(request.match_info["conid"])
+        return {
+            "con_id": conid,
+            "symbol": f"C{conid}",
+            "company_name": f"Mock contract {conid}",
+            "exchange": "NASDAQ",
+            "currency": "USD",
+            "instrument_type": "STK",
+            "valid_exchanges": "SMART,NASDAQ,NYSE",
+        }
+
+    async def _contract_rules(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        return {
+            "orderTypes": ["limit", "market", "stop"],
+            "tifTypes": ["DAY", "GTC"],
+            "defaultSize": 100,
+            "sizeIncrement": 1,
+            "increment": 0.01,
+        }
+
+    async def _secdef(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        conids = [int(c) for c in request.query.get("conids", "").split(",") if c]
+        return {
+            "secdef": [
+                {"conid": conid, "ticker": f"C{conid}", "currency": "USD", "assetClass": "STK"}
+                for conid in conids
+            ]
+        }
+
+    async def _secdef_info(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        conid = int(request.query.get("conid", 0))
+        return [
+            {
+                "conid": conid + 1,
+                "symbol": f"C{conid}",
+                "secType": request.query.get("secType", "OPT"),
+                "strike": request.query.get("strike", "0"),
+                "right": request.query.get("right", "C"),
+                "maturityDate": "20300118",
+            }
+        ]
+
+    async def _all_conids(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        exchange = request.query.get("exchange", "NASDAQ")
+        return [
+            {"ticker": ticker, "conid": conid_for(ticker), "exchange": exchange}
+            for ticker in (f"T{i:05d}" for i in range(behavior.payload_size or 1000))
+        ]
+
+    async def _strikes(self, request: web.Request, behavior: EndpointBehavior) -> Any:
+        strikes = [float(strike) for strike in range(50, 151, 5)]
+        return {"call": strikes, "put": strikes}
+
+
+def _bars(conid: int, step: int, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+    first = (start_ms // step + 1) * step
+    data = []
+    # Like the real gateway, long ranges are capped to the most recent bars
+    for t in range(first, end_ms + 1, step)[-HISTORY_MAX_POINTS:]:
+        # Deterministic price path per contract
+        base = 100 + conid % 50 + ((t // step) * 7919 + conid) % 1000 / 100
+        data.append(
+            {"t": t, "o": base, "h": base + 0.5, "l": base - 0.5, "c": base + 0.1, "v": 1000.0}
+        )
+    return data
+
+
+def _query_duration_ms(value: str) -> int:
+    try:
+        return _duration_ms(value)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a mock Client Portal gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5010)
+    parser.add_argument("--rate-limit", type=float, help="Requests per second per endpoint")
+    parser.add_argument("--global-rate-limit", type=float)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Probability of a 503")
+    args = parser.parse_args()
+
+    gateway = MockGateway(
+        args.host,
+        args.port,
+        default_behavior=EndpointBehavior(
+            rate_limit=args.rate_limit,
+            latency=args.latency,
+            jitter=args.jitter,
+            fault_rates={503: args.fault_rate} if args.fault_rate else {},
+        ),
+        global_rate_limit=args.global_rate_limit,
+    )
+
+    async def serve() -> None:
+        async with gateway:
+            await asyncio.Event().wait()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,9 @@ from datetime import datetime, timedelta
 
 from rich import print
 
-from ibwebapi.contract_search.contract_search import Exchange, IBKRContractSearch
-from ibwebapi.market_data.market_data import BarSize, IBKRMarketData, TimePeriod
-from ibwebapi.portfolio.portfolio import IBKRPortfolio
+from ibwebapi.contract_search.contract_search import Exchange
+from ibwebapi.ibkr_client import IBKRClient
+from ibwebapi.market_data.market_data import BarSize, TimePeriod
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -17,9 +17,10 @@ BASE_URL = "https://192.168.178.118:5010/v1/api"
 
 
 async def main():
-    async with IBKRMarketData(base_url=BASE_URL) as market_data_client:
+    # One client (and one connection pool / rate budget) for every API
+    async with IBKRClient(base_url=BASE_URL) as client:
         print("[bold]Getting historical data for AAPL:[/bold]")
-        historical_data = await market_data_client.get_historical_data_json(
+        historical_data = await client.get_historical_data_json(
             conid="265598",
             period=TimePeriod.WEEK_1,
             bar=BarSize.MIN_1,
@@ -39,7 +40,6 @@ async def main():
                     )
         print(formatted_data)
 
-    async with IBKRContractSearch(base_url=BASE_URL) as client:
         # Search for a contract
         print("[bold]Searching for AAPL contract:[/bold]")
         contract_details = await client.search_contract("AAPL")
@@ -7,6 +7,13 @@ setup(
     install_requires=[
         "aiohttp",  # Add your project dependencies here
     ],
+    extras_require={
+        "numpy": ["numpy"],
+        "pandas": ["numpy", "pandas"],
+        "arrow": ["numpy", "pyarrow"],
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec"],
+    },
     author="Lorenzo Lazzeri",
     author_email="dev@lazerlabs.pro",
     description="A Python client for Interactive Brokers Web API",
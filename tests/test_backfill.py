@@ -0,0 +1,59 @@
+from ibwebapi.market_data.market_data import (
+    HISTORY_MAX_POINTS,
+    BarSize,
+    IBKRMarketData,
+    TimePeriod,
+)
+
+HOUR = 3_600_000
+DAY = 24 * HOUR
+
+
+def test_chunk_span_accounts_for_trading_hours() -> None:
+    minutes = HISTORY_MAX_POINTS * BarSize.MIN_1.duration_ms
+    # 1000 one-minute bars span 1000 / 390 regular sessions
+    assert IBKRMarketData._max_chunk_ms(BarSize.MIN_1, False) == int(minutes * 24 / 6.5)
+    assert IBKRMarketData._max_chunk_ms(BarSize.MIN_1, True) == int(minutes * 24 / 16)
+    # 1000 daily bars span 1000 weekdays
+    assert IBKRMarketData._max_chunk_ms(BarSize.DAY_1, False) == 1400 * DAY
+
+
+def test_plan_covers_the_range_newest_first() -> None:
+    start, end = 0, 30 * DAY
+    plan = IBKRMarketData.plan_backfill(BarSize.MIN_1, start, end)
+    max_span = IBKRMarketData._max_chunk_ms(BarSize.MIN_1, False)
+
+    assert plan[0][1] == end
+    # Chunks are contiguous and only the last one reaches past the start
+    for (period, chunk_end), (_, next_end) in zip(plan, plan[1:]):
+        assert next_end == chunk_end - period.duration_ms
+        assert next_end > start
+    last_period, last_end = plan[-1]
+    assert last_end - last_period.duration_ms <= start
+    assert all(period.duration_ms <= max_span for period, _ in plan)
+    # The longest period within 1000 bars is two days
+    assert [period for period, _ in plan] == [TimePeriod.DAY_2] * 15
+
+
+def test_plan_uses_the_shortest_period_for_the_rest() -> None:
+    # One day and 90 minutes are left after two 2-day chunks
+    plan = IBKRMarketData.plan_backfill(BarSize.MIN_1, 0, 5 * DAY + 90 * 60_000)
+    assert [period for period, _ in plan] == [
+        TimePeriod.DAY_2,
+        TimePeriod.DAY_2,
+        TimePeriod.DAY_2,
+    ]
+
+    plan = IBKRMarketData.plan_backfill(BarSize.MIN_1, 0, 90 * 60_000)
+    assert plan == [(TimePeriod.HOUR_2, 90 * 60_000)]
+
+
+def test_coarse_bars_need_fewer_requests() -> None:
+    year = 365 * DAY
+    assert IBKRMarketData.plan_backfill(BarSize.DAY_1, 0, year) == [
+        (TimePeriod.YEAR_1, year)
+    ]
+    assert len(IBKRMarketData.plan_backfill(BarSize.HOUR_1, 0, year)) < len(
+        IBKRMarketData.plan_backfill(BarSize.MIN_5, 0, year)
+    )
+    assert IBKRMarketData.plan_backfill(BarSize.MIN_1, DAY, DAY) == []
@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.market_data.bar_aggregator import BarAggregator
+from ibwebapi.market_data.bar_store import BarKey
+from ibwebapi.market_data.columnar import BarColumns
+from ibwebapi.market_data.market_data import (
+    BarSize,
+    IBKRMarketData,
+    TimePeriod,
+    _to_epoch_ms,
+)
+from ibwebapi.streaming.streaming import Tick
+from ibwebapi.testing.mock_gateway import MockGateway
+
+BASE_URL = "https://localhost:5000/v1/api"
+MINUTE = 60_000
+
+
+class TickStream:
+    """Async tick iterator that can simulate a connection loss before a tick."""
+
+    def __init__(self, ticks: List[Tick], interrupt_before: Optional[int] = None):
+        self.ticks = ticks
+        self.interrupt_before = interrupt_before
+        self.interruptions = 0
+        self._i = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tick:
+        if self._i == len(self.ticks):
+            raise StopAsyncIteration
+        if self._i == self.interrupt_before:
+            self.interruptions += 1
+        self._i += 1
+        return self.ticks[self._i - 1]
+
+
+def trades(start: int, minutes: int) -> List[Tick]:
+    """Two trades per minute, 15 and 45 seconds into each minute after ``start``."""
+    return [
+        Tick(conid=1, t=start + i * 30_000 + 15_000, last=100.0 + i, last_size=1.0)
+        for i in range(minutes * 2)
+    ]
+
+
+def stored_bars(market_data: IBKRMarketData) -> List[int]:
+    return list(market_data.load_bars("1", BarSize.MIN_1).t)
+
+
+def test_first_and_open_bars_are_not_stored(tmp_path: Path) -> None:
+    market_data = IBKRMarketData(
+        BASE_URL, cache_dir=str(tmp_path), settle_period=timedelta(0)
+    )
+    start = _to_epoch_ms(datetime(2024, 3, 1, 14, 30))
+    ticks = trades(start, 5)
+
+    aggregator = BarAggregator([BarSize.MIN_1])
+    asyncio.run(aggregator.run(TickStream(ticks), market_data))
+
+    # The first minute was joined after it started; the last one is complete
+    # because its window ended long before the stream did
+    assert stored_bars(market_data) == [start + i * MINUTE for i in range(1, 5)]
+
+
+def test_bars_around_an_interruption_are_not_stored(tmp_path: Path) -> None:
+    market_data = IBKRMarketData(
+        BASE_URL, cache_dir=str(tmp_path), settle_period=timedelta(0)
+    )
+    start = _to_epoch_ms(datetime(2024, 3, 1, 14, 30))
+    ticks = trades(start, 6)
+
+    # Connection lost in the middle of the fourth minute
+    stream = TickStream(ticks, interrupt_before=7)
+    aggregator = BarAggregator([BarSize.MIN_1])
+    asyncio.run(aggregator.run(stream, market_data))
+
+    assert stored_bars(market_data) == [
+        start + MINUTE,
+        start + 2 * MINUTE,
+        start + 4 * MINUTE,
+        start + 5 * MINUTE,
+    ]
+
+
+def test_in_progress_bar_is_dropped_and_stored_bars_are_covered(tmp_path: Path) -> None:
+    market_data = IBKRMarketData(
+        BASE_URL, cache_dir=str(tmp_path), settle_period=timedelta(hours=1)
+    )
+    now = datetime.now(timezone.utc)
+    start = _to_epoch_ms(now - timedelta(minutes=3))
+    start -= start % MINUTE
+    ticks = trades(start, 4)
+
+    aggregator = BarAggregator([BarSize.MIN_1])
+    asyncio.run(aggregator.run(TickStream(ticks), market_data))
+
+    # The current minute has not ended yet
+    assert stored_bars(market_data) == [start + MINUTE, start + 2 * MINUTE]
+    # Live bars are complete however recent they are
+    key = BarKey("1", BarSize.MIN_1.value, False)
+    assert market_data.bar_store.series(key).coverage == [
+        (start + MINUTE, start + 3 * MINUTE)
+    ]
+
+
+def test_history_of_appended_bars_is_served_locally(tmp_path: Path) -> None:
+    end = datetime.now(timezone.utc).replace(second=0, microsecond=0, tzinfo=None)
+    end_ms = _to_epoch_ms(end)
+    rows = [
+        (end_ms - i * MINUTE, 100.0, 101.0, 99.0, 100.5, 10.0) for i in range(60, 0, -1)
+    ]
+
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+                # The response metadata is fetched once per series
+                await client.get_historical_data("1", BarSize.MIN_1, TimePeriod.MIN_1)
+                requests = gateway.requests[IBKREndpoint.HISTORICAL_DATA.name]
+
+                await client.append_bars("1", BarSize.MIN_1, BarColumns.from_rows(rows))
+                data = await client.get_historical_data_columnar(
+                    "1",
+                    BarSize.MIN_1,
+                    TimePeriod.MIN_30,
+                    start_time=end - timedelta(minutes=1),
+                )
+                assert gateway.requests[IBKREndpoint.HISTORICAL_DATA.name] == requests
+
+        assert list(data.data.t)[-1] == rows[-1][0]
+        assert list(data.data.c) == [100.5] * len(data.data)
+
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import random
+from pathlib import Path
+
+from ibwebapi.market_data.bar_store import MAX_SEGMENTS, BarKey, BarStore
+from ibwebapi.market_data.columnar import BarColumns
+
+KEY = BarKey("265598", "1min", False)
+MINUTE = 60_000
+
+
+def bars(start: int, count: int, value: float = 1.0) -> BarColumns:
+    rows = [(t * MINUTE, value, value, value, value, value) for t in range(start, start + count)]
+    return BarColumns.from_rows(rows)
+
+
+def test_chunks_are_appended_as_segments_and_compacted(tmp_path: Path) -> None:
+    store = BarStore(tmp_path)
+
+    async def backfill() -> None:
+        for i in range(100):
+            covered = (i * 100 * MINUTE, (i + 1) * 100 * MINUTE)
+            await store.add(KEY, bars(i * 100, 100), covered)
+
+    asyncio.run(backfill())
+    series = store.series(KEY)
+    assert len(series.bars) == 10_000
+    assert 0 < len(series.segments) <= MAX_SEGMENTS
+    # Segments never hold as many bars as the compacted file
+    assert 2 * sum(count for _, count in series.segments) < len(series.bars)
+
+    reloaded = BarStore(tmp_path).series(KEY)
+    assert list(reloaded.bars.t) == list(series.bars.t)
+    assert reloaded.coverage == [(0, 10_000 * MINUTE)]
+
+
+def test_newer_bars_win_after_reload(tmp_path: Path) -> None:
+    store = BarStore(tmp_path)
+    expected = {}
+    rng = random.Random(7)
+
+    async def fill() -> None:
+        for i in range(150):
+            start, count = rng.randrange(0, 3000), rng.randrange(1, 200)
+            await store.add(KEY, bars(start, count, float(i)))
+            expected.update((t * MINUTE, float(i)) for t in range(start, start + count))
+
+    asyncio.run(fill())
+    reloaded = BarStore(tmp_path).series(KEY).bars
+    assert list(reloaded.t) == sorted(expected)
+    assert list(reloaded.c) == [expected[t] for t in sorted(expected)]
+
+
+def test_invalidate_removes_segments(tmp_path: Path) -> None:
+    store = BarStore(tmp_path)
+
+    async def fill() -> None:
+        await store.add(KEY, bars(0, 1000))
+        await store.add(KEY, bars(1000, 10))
+
+    asyncio.run(fill())
+    assert store.series(KEY).segments
+    store.invalidate(KEY)
+    assert not list((tmp_path / KEY.conid).iterdir())
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+
+from ibwebapi.client.cache_io import (
+    CacheDirectories,
+    atomic_write,
+    atomic_write_json,
+    read_json,
+)
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.market_data import market_data
+from ibwebapi.market_data.market_data import BarSize, IBKRMarketData, TimePeriod
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+def test_failed_writes_leave_the_old_file(tmp_path: Path) -> None:
+    path = tmp_path / "entry.json"
+    atomic_write_json(path, {"version": 1})
+
+    def fail(f: Any) -> None:
+        f.write(b'{"version": ')
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        atomic_write(path, fail)
+    assert read_json(path) == {"version": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ["entry.json"]
+    assert read_json(tmp_path / "missing.json") is None
+
+
+def test_directories_are_created_once(tmp_path: Path, monkeypatch) -> None:
+    directories = CacheDirectories()
+    created: List[Path] = []
+    mkdir = Path.mkdir
+
+    def record(self: Path, *args: Any, **kwargs: Any) -> None:
+        created.append(self)
+        mkdir(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "mkdir", record)
+    for _ in range(3):
+        directories.ensure(tmp_path / "265598")
+    assert created == [tmp_path / "265598"]
+    assert (tmp_path / "265598").is_dir()
+
+
+def test_history_cache_is_read_and_written_off_the_loop(
+    tmp_path: Path, monkeypatch
+) -> None:
+    threads: List[threading.Thread] = []
+    for name in ("read_json", "atomic_write_json"):
+        original = getattr(market_data, name)
+
+        def record(*args: Any, original=original) -> Any:
+            threads.append(threading.current_thread())
+            return original(*args)
+
+        monkeypatch.setattr(market_data, name, record)
+
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+                fetched = await client.get_historical_data_json(
+                    "265598", BarSize.MIN_5, TimePeriod.DAY_1
+                )
+                cached = await client.get_historical_data_json(
+                    "265598", BarSize.MIN_5, TimePeriod.DAY_1
+                )
+                assert gateway.requests[IBKREndpoint.HISTORICAL_DATA.name] == 1
+                assert threading.main_thread() not in threads
+                assert len(threads) == 3
+                assert cached == json.loads(json.dumps(fetched))
+
+    asyncio.run(main())
+
+    # Bars are stored in a columnar file next to the metadata
+    files = sorted(p.suffix for p in (tmp_path / "265598").iterdir())
+    assert files == [".bars", ".json"]
+
+
+def test_inline_cache_entries_are_still_read(tmp_path: Path) -> None:
+    client = IBKRMarketData("http://localhost", cache_dir=str(tmp_path))
+    cache_file = client._get_cache_filename(
+        "hmd", "1", BarSize.MIN_1, TimePeriod.MIN_5, None, None, False
+    )
+    bars = [{"o": 1.0, "c": 1.0, "h": 1.0, "l": 1.0, "v": 1.0, "t": 60_000}]
+    cache_file.parent.mkdir(parents=True)
+    atomic_write_json(cache_file, {"symbol": "X", "data": bars})
+
+    assert client._read_cached_response(cache_file) == {"symbol": "X", "data": bars}
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from pathlib import Path
+
+from ibwebapi.client.endpoints import IBKREndpoint, Priority
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.client.transport import RecordingTransport
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway
+
+ENDPOINT = IBKREndpoint.PORTFOLIO_ACCOUNTS
+INTERACTIVE = Priority.INTERACTIVE
+SLOW = {ENDPOINT: EndpointBehavior(latency=0.2)}
+
+
+def test_identical_requests_are_coalesced() -> None:
+    async def main() -> None:
+        async with MockGateway(behaviors=SLOW) as gateway:
+            shared = IBKRSession()
+            first, second = (
+                IBKRRESTClient(gateway.base_url, keepalive=False, shared_session=shared)
+                for _ in range(2)
+            )
+            async with first, second:
+                results = await asyncio.gather(
+                    first._request("GET", ENDPOINT),
+                    first._request("GET", ENDPOINT),
+                    second._request("GET", ENDPOINT),
+                )
+            assert results[0] == results[1] == results[2]
+            assert gateway.requests[ENDPOINT.name] == 1
+            assert first.coalesced_requests + second.coalesced_requests == 2
+
+    asyncio.run(main())
+
+
+def test_requests_with_other_priority_or_transport_are_not_coalesced(
+    tmp_path: Path,
+) -> None:
+    async def main() -> None:
+        async with MockGateway(behaviors=SLOW) as gateway:
+            shared = IBKRSession()
+            recording = RecordingTransport(tmp_path / "log.jsonl")
+            plain = IBKRRESTClient(
+                gateway.base_url, keepalive=False, shared_session=shared
+            )
+            recorded = IBKRRESTClient(
+                gateway.base_url,
+                keepalive=False,
+                shared_session=shared,
+                transport=recording,
+            )
+            with recording:
+                async with plain, recorded:
+                    await asyncio.gather(
+                        plain._request("GET", ENDPOINT, priority=Priority.BULK),
+                        plain._request("GET", ENDPOINT, priority=INTERACTIVE),
+                        recorded._request("GET", ENDPOINT, priority=INTERACTIVE),
+                    )
+            assert gateway.requests[ENDPOINT.name] == 3
+            # The recording client's own request went through its transport
+            endpoints = [json.loads(line)["e"] for line in recording.path.open()]
+            assert endpoints.count(ENDPOINT.name) == 1
+
+    asyncio.run(main())
+
+
+def test_closing_the_session_clears_inflight_requests() -> None:
+    async def main() -> None:
+        async with MockGateway(behaviors=SLOW) as gateway:
+            shared = IBKRSession()
+            client = IBKRRESTClient(
+                gateway.base_url, keepalive=False, shared_session=shared
+            )
+            await client.connect()
+            request = asyncio.ensure_future(client._request("GET", ENDPOINT))
+            await asyncio.sleep(0.05)
+            assert shared.inflight
+            await shared.close()
+            assert not shared.inflight
+            await asyncio.gather(request, return_exceptions=True)
+            assert request.done()
+
+    asyncio.run(main())
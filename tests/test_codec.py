@@ -0,0 +1,192 @@
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List
+
+import pytest
+
+from ibwebapi.client.codec import JSONArrayParser, JSONCodec, get_codec
+from ibwebapi.contract_search import contract_search
+from ibwebapi.contract_search.contract_search import (
+    AssetClass,
+    Exchange,
+    StockDataDecoder,
+    StockDataEncoder,
+    decode_stock_data,
+    encode_stock_data,
+)
+from ibwebapi.market_data.columnar import BarColumns
+from ibwebapi.market_data.market_data import (
+    ColumnarHistoricalData,
+    HistoricalDataJSONDecoder,
+    HistoricalDataJSONEncoder,
+)
+
+STOCKS = {
+    "stocks": [
+        {
+            "name": "APPLE INC",
+            "chineseName": None,
+            "assetClass": "STK",
+            "contracts": [
+                {"conid": 265598, "exchange": "NASDAQ", "isUS": True},
+                {"conid": 38708077, "exchange": "MEXI", "isUS": False},
+            ],
+        }
+    ]
+}
+
+HISTORY = {
+    "serverId": "1",
+    "symbol": "AAPL",
+    "text": "APPLE INC",
+    "priceFactor": "100",
+    "startTime": "20240301-14:30:00",
+    "high": "17100/1000/0",
+    "low": "16900/500/1",
+    "timePeriod": "2min",
+    "barLength": 60,
+    "mdAvailability": "S",
+    "mktDataDelay": 0,
+    "outsideRth": False,
+    "tradingDayDuration": 390,
+    "volumeFactor": 1,
+    "priceDisplayRule": 1,
+    "priceDisplayValue": "2",
+    "chartPanStartTime": "20240301-14:30:00",
+    "direction": -1,
+    "negativeCapable": False,
+    "messageVersion": 2,
+    "points": 2,
+    "travelTime": 10,
+    "data": [
+        {"o": 170.0, "c": 171.0, "h": 171.0, "l": 169.0, "v": 1000.0, "t": 1709303400000},
+        {"o": 171.0, "c": 170.5, "h": 171.5, "l": 170.0, "v": 500.0, "t": 1709303460000},
+    ],
+}
+
+
+def available_codecs() -> list:
+    codecs = []
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            codecs.append(get_codec(name))
+        except ImportError:
+            continue
+    return codecs
+
+
+@dataclass
+class Record:
+    name: str
+    when: datetime
+    exchange: Exchange
+
+
+def chunks(data: bytes, seed: int) -> List[bytes]:
+    """Splits ``data`` at random points, including inside strings and numbers."""
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(data)), min(len(data) - 1, 40)))
+    return [data[a:b] for a, b in zip([0] + cuts, cuts + [len(data)])]
+
+
+def parse(parser: JSONArrayParser, pieces: List[bytes]) -> List[Any]:
+    elements = []
+    for piece in pieces:
+        elements += parser.feed(piece)
+    return elements + parser.close()
+
+
+@pytest.fixture(params=available_codecs(), ids=lambda codec: codec.name)
+def codec(request: Any, monkeypatch: pytest.MonkeyPatch) -> JSONCodec:
+    monkeypatch.setattr(contract_search, "default_codec", request.param)
+    return request.param
+
+
+def test_unknown_codec_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Unknown JSON codec"):
+        get_codec("simdjson")
+
+
+def test_backends_decode_any_input_and_encode_compactly(codec: JSONCodec) -> None:
+    text = '{"a": [1, 2.5, "\u00e9"], "b": null}'
+    expected = {"a": [1, 2.5, "\u00e9"], "b": None}
+    encoded = text.encode()
+    for data in (text, encoded, bytearray(encoded), memoryview(encoded)):
+        assert codec.loads(data) == expected
+
+    record = Record("AAPL", datetime(2024, 3, 1, 14, 30), Exchange.NASDAQ)
+    assert codec.dumps({"r": record, "n": [1, None]}) == (
+        b'{"r":{"name":"AAPL","when":"2024-03-01T14:30:00","exchange":"NASDAQ"},'
+        b'"n":[1,null]}'
+    )
+
+
+def test_typed_decoding_is_optional(codec: JSONCodec) -> None:
+    data = json.dumps(STOCKS)
+    if not codec.typed_decoding:
+        with pytest.raises(NotImplementedError):
+            codec.loads_as(data, contract_search.StockData)
+        return
+    assert codec.loads_as(data, contract_search.StockData) == decode_stock_data(data)
+    with pytest.raises(ValueError):
+        codec.loads_as('{"stocks": [{"name": 1}]}', contract_search.StockData)
+
+
+def test_array_parser_yields_elements_across_chunk_boundaries(codec: JSONCodec) -> None:
+    elements = [
+        {"ticker": f"T{i}", "conid": 1000 + i, "price": i / 7, "text": "},{\"]"}
+        for i in range(50)
+    ] + [12345678, -1.5e-3, "x", [1, {"a": "]"}], None, True]
+    data = json.dumps(elements).encode()
+
+    for seed in range(5):
+        assert parse(JSONArrayParser(codec), chunks(data, seed)) == elements
+    assert parse(JSONArrayParser(codec), [b" [ ", b"1", b"2 , 3", b"]"]) == [12, 3]
+
+
+def test_array_parser_handles_other_bodies(codec: JSONCodec) -> None:
+    assert parse(JSONArrayParser(codec), [b'{"error":', b' "busy"}']) == [
+        {"error": "busy"}
+    ]
+    assert parse(JSONArrayParser(codec), [b"[]"]) == []
+    with pytest.raises(ValueError):
+        parse(JSONArrayParser(codec), [b'[{"a": 1}, {"b"'])
+
+
+def test_stock_data_round_trip(codec: JSONCodec) -> None:
+    data = decode_stock_data(json.dumps(STOCKS))
+
+    contract = data.stocks[0].contracts[0]
+    assert data.stocks[0].assetClass is AssetClass.STK
+    assert (contract.conid, contract.exchange, contract.isUS) == (
+        265598,
+        Exchange.NASDAQ,
+        True,
+    )
+    assert json.loads(encode_stock_data(data)) == STOCKS
+    assert json.loads(json.dumps(data, cls=StockDataEncoder)) == STOCKS
+    assert json.loads(json.dumps(STOCKS), cls=StockDataDecoder) == data
+
+
+def test_unknown_exchange_decodes_as_unknown(codec: JSONCodec) -> None:
+    stocks = json.loads(json.dumps(STOCKS))
+    stocks["stocks"][0]["contracts"][0]["exchange"] = "NEWVENUE"
+
+    data = decode_stock_data(json.dumps(stocks).encode())
+
+    assert data.stocks[0].contracts[0].exchange is Exchange.UNKNOWN
+    assert data.stocks[0].contracts[1].exchange is Exchange.MEXI
+
+
+def test_historical_data_json_round_trip() -> None:
+    data = json.loads(json.dumps(HISTORY), cls=HistoricalDataJSONDecoder)
+
+    assert [bar.c for bar in data.data] == [171.0, 170.5]
+    assert json.loads(json.dumps(data, cls=HistoricalDataJSONEncoder)) == HISTORY
+
+    columnar = ColumnarHistoricalData(
+        **{**HISTORY, "data": BarColumns.from_bars(HISTORY["data"])}
+    )
+    assert json.loads(json.dumps(columnar, cls=HistoricalDataJSONEncoder)) == HISTORY
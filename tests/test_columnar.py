@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from ibwebapi.market_data.columnar import BarColumns, BarView, read_bars, write_bars
+from ibwebapi.market_data.market_data import (
+    BarSize,
+    ColumnarHistoricalData,
+    IBKRMarketData,
+    TimePeriod,
+)
+from ibwebapi.testing.mock_gateway import MockGateway
+
+MINUTE = 60_000
+# 2024-03-01 14:30:00 UTC
+EPOCH_MS = 1_709_303_400_000
+
+
+def bars(count: int, start: int = EPOCH_MS) -> BarColumns:
+    return BarColumns.from_rows(
+        [
+            (start + i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 10.0 * i)
+            for i in range(count)
+        ]
+    )
+
+
+def test_bars_round_trip_through_a_memory_mapped_file(tmp_path: Path) -> None:
+    path = tmp_path / "bars.bars"
+    written = bars(100)
+    write_bars(path, written)
+
+    loaded = read_bars(path)
+    assert loaded.to_bars() == written.to_bars()
+    # Columns are views over the mapped file, not copies
+    assert isinstance(loaded.t, memoryview)
+    assert loaded._mmap is not None
+
+    window = loaded.between(EPOCH_MS + 10 * MINUTE, EPOCH_MS + 19 * MINUTE)
+    assert len(window) == 10
+    assert window.t.obj is loaded.t.obj
+    assert window[0].t == EPOCH_MS + 10 * MINUTE
+
+    write_bars(path, BarColumns())
+    assert len(read_bars(path)) == 0
+
+
+def test_other_files_are_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "bars.bars"
+    path.write_bytes(b"not a bar cache file")
+    with pytest.raises(ValueError, match="not a bar cache file"):
+        read_bars(path)
+
+
+def test_gateway_bars_are_sorted_and_deduplicated() -> None:
+    columns = BarColumns.from_bars(
+        [
+            {"t": EPOCH_MS + MINUTE, "o": 2, "h": 2, "l": 2, "c": 2, "v": 2},
+            {"t": EPOCH_MS, "o": 1, "h": 1, "l": 1, "c": 1, "v": 1},
+            {"t": EPOCH_MS + MINUTE, "o": 3, "h": 3, "l": 3, "c": 3},
+        ]
+    )
+
+    assert list(columns.t) == [EPOCH_MS, EPOCH_MS + MINUTE]
+    # The last bar for a timestamp wins; missing fields are zero
+    assert columns.row(1) == (EPOCH_MS + MINUTE, 3.0, 3.0, 3.0, 3.0, 0.0)
+
+
+def test_merge_prefers_newer_bars() -> None:
+    old = bars(10)
+    new = bars(5, EPOCH_MS + 8 * MINUTE)
+    for i in range(len(new)):
+        new.c[i] = 0.0
+
+    merged = old.merge(new)
+    assert list(merged.t) == [EPOCH_MS + i * MINUTE for i in range(13)]
+    assert list(merged.c)[:8] == list(old.c)[:8]
+    assert list(merged.c)[8:] == [0.0] * 5
+    assert BarColumns().merge(new) is new and old.merge(BarColumns()) is old
+
+
+def test_numpy_export_shares_memory() -> None:
+    np = pytest.importorskip("numpy")
+    columns = bars(5)
+
+    arrays = columns.to_numpy()
+    assert arrays["t"].dtype == np.int64 and arrays["c"].dtype == np.float64
+    columns.c[0] = -1.0
+    assert arrays["c"][0] == -1.0
+
+
+def test_parquet_export(tmp_path: Path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "bars.parquet"
+
+    bars(5).write_parquet(path)
+    assert pq.read_table(str(path)).column("t").to_pylist() == list(bars(5).t)
+
+
+def test_bar_views_read_the_columns_lazily() -> None:
+    columns = bars(3)
+
+    bar = columns[-1]
+    assert isinstance(bar, BarView)
+    assert (bar.t, bar.o, bar.h, bar.l, bar.c, bar.volume) == (
+        EPOCH_MS + 2 * MINUTE,
+        102.0,
+        103.0,
+        101.0,
+        102.5,
+        20.0,
+    )
+    assert bar.timestamp == datetime(2024, 3, 1, 14, 32)
+    columns.c[2] = 0.0
+    assert bar.c == 0.0
+    assert [view.t for view in columns] == list(columns.t)
+    with pytest.raises(IndexError):
+        columns[3]
+
+
+def test_columnar_history_slices_by_time(tmp_path: Path) -> None:
+    async def main() -> ColumnarHistoricalData:
+        async with MockGateway() as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+                return await client.get_historical_data_columnar(
+                    "265598",
+                    BarSize.MIN_1,
+                    TimePeriod.HOUR_1,
+                    start_time=datetime(2024, 3, 1, 15, 30),
+                )
+
+    data = asyncio.run(main())
+    assert isinstance(data.data, BarColumns)
+    assert data.points == len(data.data) > 0
+
+    first = data.data[0].timestamp
+    window = data.between(first + timedelta(minutes=5), first + timedelta(minutes=14))
+    assert window.points == len(window.data) == 10
+    assert window.data[0].timestamp == first + timedelta(minutes=5)
+    assert window.symbol == data.symbol
+    # The original is unchanged
+    assert data.points == len(data.data) > window.points
+    assert set(data.to_numpy()) == {"t", "o", "h", "l", "c", "v"}
+
+
+def test_pandas_export() -> None:
+    pytest.importorskip("pandas")
+    frame = bars(3).to_pandas()
+    assert list(frame.columns) == ["o", "h", "l", "c", "v"]
+    assert str(frame.index.tz) == "UTC"
+    assert frame["c"].tolist() == [100.5, 101.5, 102.5]
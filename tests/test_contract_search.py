@@ -0,0 +1,130 @@
+import asyncio
+from typing import Any
+
+import aiohttp
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.contract_search.contract_search import (
+    STOCK_INFO_MAX_QUERY_LENGTH,
+    Exchange,
+    IBKRContractSearch,
+)
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway, conid_for
+
+# Enough symbols for several /trsrv/stocks batches
+SYMBOLS = [f"S{i:04d}" for i in range(STOCK_INFO_MAX_QUERY_LENGTH // 4)]
+
+
+class FailingBatchClient(IBKRContractSearch):
+    """Fails the stock info batch that contains ``S0000``."""
+
+    async def _request(self, method: str, endpoint: IBKREndpoint, **kwargs) -> Any:
+        symbols = kwargs.get("query_params", {}).get("symbols", "")
+        if endpoint is IBKREndpoint.STOCK_INFO and "S0000" in symbols.split(","):
+            raise aiohttp.ClientConnectionError("connection reset")
+        return await super()._request(method, endpoint, **kwargs)
+
+
+def test_failed_batch_leaves_other_batches_resolved() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with FailingBatchClient(gateway.base_url, keepalive=False) as client:
+                result = await client.get_contracts_for_stocks(
+                    SYMBOLS, Exchange.NASDAQ, True
+                )
+
+        assert 0 < len(result) < len(SYMBOLS)
+        assert "S0000" not in result
+        assert all(result[s] == conid_for(s) for s in result)
+
+    asyncio.run(main())
+
+
+def test_stock_info_is_cached_per_symbol() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRContractSearch(gateway.base_url, keepalive=False) as client:
+                await client.get_contracts_for_stocks(["AAPL", "MSFT"], Exchange.NASDAQ, True)
+                requests = gateway.requests[IBKREndpoint.STOCK_INFO.name]
+
+                # A different mix of cached symbols only requests the new one
+                result = await client.get_contracts_for_stocks(
+                    ["MSFT", "IBM", "AAPL"], Exchange.NASDAQ, True
+                )
+                assert gateway.requests[IBKREndpoint.STOCK_INFO.name] == requests + 1
+                assert result == {s: conid_for(s) for s in ("MSFT", "IBM", "AAPL")}
+
+                # Single-symbol lookups share the cache entries
+                assert await client.get_contract_for_stock(
+                    "AAPL", Exchange.NASDAQ, True
+                ) == conid_for("AAPL")
+                assert gateway.requests[IBKREndpoint.STOCK_INFO.name] == requests + 1
+
+    asyncio.run(main())
+
+
+def test_contract_index_is_only_used_for_its_us_status() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRContractSearch(
+                gateway.base_url, keepalive=False, use_metadata_cache=False
+            ) as client:
+                await client.build_contract_index([Exchange.NASDAQ], is_us=True)
+                assert await client.get_contract_for_stock(
+                    "T00001", Exchange.NASDAQ, True
+                ) == conid_for("T00001")
+                assert gateway.requests[IBKREndpoint.STOCK_INFO.name] == 0
+
+                # The mock gateway only lists US contracts
+                assert await client.get_contract_for_stock(
+                    "T00001", Exchange.NASDAQ, False
+                ) is None
+                assert gateway.requests[IBKREndpoint.STOCK_INFO.name] == 1
+
+                # An index of unknown US status is never used
+                await client.build_contract_index([Exchange.NASDAQ])
+                await client.get_contracts_for_stocks(["T00001"], Exchange.NASDAQ, True)
+                assert gateway.requests[IBKREndpoint.STOCK_INFO.name] == 2
+
+    asyncio.run(main())
+
+
+def stream_tasks() -> list:
+    """Unfinished tasks started by a streamed request."""
+    names = {"Queue.get", "IBKRRESTClient._send_request"}
+    return [
+        task
+        for task in asyncio.all_tasks()
+        if not task.done() and task.get_coro().__qualname__ in names
+    ]
+
+
+def test_abandoned_stream_leaves_no_tasks_behind() -> None:
+    async def main() -> None:
+        behavior = EndpointBehavior(latency=0.2, payload_size=20_000)
+        async with MockGateway(behaviors={IBKREndpoint.ALL_CONIDS: behavior}) as gateway:
+            async with IBKRContractSearch(
+                gateway.base_url, keepalive=False, use_metadata_cache=False
+            ) as client:
+                # Cancelled while waiting for the response
+                records = client.iter_all_conids(Exchange.NYSE, chunk_size=1024)
+                consumer = asyncio.ensure_future(records.__anext__())
+                await asyncio.sleep(0.05)
+                consumer.cancel()
+                await asyncio.gather(consumer, return_exceptions=True)
+                await records.aclose()
+                assert stream_tasks() == []
+
+                # Closed part-way through the body
+                records = client.iter_all_conids(Exchange.NYSE, chunk_size=1024)
+                async for _ in records:
+                    break
+                await records.aclose()
+                assert stream_tasks() == []
+
+                count = 0
+                async for _ in client.iter_all_conids(Exchange.NYSE):
+                    count += 1
+                assert count == 20_000
+
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.market_data.market_data import BarSize, IBKRMarketData, TimePeriod
+from ibwebapi.testing.mock_gateway import MockGateway
+
+CONIDS = ["265598", "8314", "4391"]
+
+
+def test_settled_ranges_are_served_from_the_bar_store(tmp_path: Path) -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+
+                async def fetch():
+                    return [
+                        result
+                        async for result in client.get_historical_data_many(
+                            CONIDS, BarSize.HOUR_1, TimePeriod.WEEK_1
+                        )
+                    ]
+
+                first = await fetch()
+                assert all(result.ok and not result.cached for result in first)
+                requests = gateway.requests[IBKREndpoint.HISTORICAL_DATA.name]
+
+                # The default end is now, whose last day is never marked as covered
+                second = await fetch()
+                assert all(result.ok and result.cached for result in second)
+                assert gateway.requests[IBKREndpoint.HISTORICAL_DATA.name] == requests
+                assert sorted(r.conid for r in second) == sorted(CONIDS)
+                assert [len(r.data.data) for r in second] == [
+                    len(r.data.data) for r in first
+                ]
+
+    asyncio.run(main())
+
+
+def test_max_concurrency_must_be_positive(tmp_path: Path) -> None:
+    async def main() -> None:
+        client = IBKRMarketData("http://localhost", cache_dir=str(tmp_path))
+        with pytest.raises(ValueError):
+            async for _ in client.get_historical_data_many(
+                CONIDS, BarSize.HOUR_1, max_concurrency=0
+            ):
+                pass
+
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+import asyncio
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+async def wait_until(condition, timeout: float = 10.0) -> None:
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.02)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_one_keepalive_per_shared_session() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession()
+            first, second = (
+                IBKRRESTClient(
+                    gateway.base_url, keepalive_interval=0.2, shared_session=shared
+                )
+                for _ in range(2)
+            )
+            await first.connect()
+            task = shared._keepalive_task
+            assert task is not None
+            await second.connect()
+            assert shared._keepalive_task is task
+
+            tickles = gateway.requests[IBKREndpoint.TICKLE.name]
+            await wait_until(
+                lambda: gateway.requests[IBKREndpoint.TICKLE.name] > tickles
+            )
+
+            # The keepalive outlives the client that started it
+            await first.disconnect()
+            assert shared._keepalive_task is task and not task.done()
+            await second.disconnect()
+            assert shared._keepalive_task is None
+            assert task.cancelled()
+
+    asyncio.run(main())
+
+
+def test_keepalive_tracks_authentication_for_all_clients() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(auth_probe_interval=0.05, max_auth_probe_interval=0.1)
+            async with IBKRRESTClient(
+                gateway.base_url, keepalive_interval=0.2, shared_session=shared
+            ) as ticking, IBKRRESTClient(
+                gateway.base_url, keepalive=False, shared_session=shared
+            ) as other:
+                assert ticking.authenticated is True
+                assert other.authenticated is True
+
+                # Longer than the gap between two rate limited tickles
+                gateway.expire_session(2.5)
+                await wait_until(lambda: other.authenticated is False)
+                assert not shared.health.healthy
+
+                await wait_until(lambda: shared.health.healthy)
+                await wait_until(lambda: other.authenticated is True)
+                assert ticking.tickle_rtt is not None
+                assert shared.health.outages == 1
+
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.contract_search import metadata_cache
+from ibwebapi.contract_search.metadata_cache import MetadataCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(metadata_cache, "time", clock)
+    return clock
+
+
+def stored_rows(path: Path) -> int:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    async def main() -> None:
+        cache = MetadataCache(max_entries=2)
+        for conid in (1, 2):
+            await cache.set(IBKREndpoint.CONTRACT_INFO, {"conid": conid}, conid)
+        # Reading 1 makes 2 the least recently used entry
+        assert await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 1}) == (True, 1)
+        await cache.set(IBKREndpoint.CONTRACT_INFO, {"conid": 3}, 3)
+
+        assert await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 2}) == (False, None)
+        assert await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 1}) == (True, 1)
+        assert await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 3}) == (True, 3)
+        assert (cache.hits, cache.misses) == (3, 1)
+
+    asyncio.run(main())
+
+
+def test_entries_expire_after_the_endpoint_ttl(clock: FakeClock) -> None:
+    async def main() -> None:
+        cache = MetadataCache(default_ttl=100, ttls={IBKREndpoint.STOCK_INFO: 10})
+        await cache.set(IBKREndpoint.STOCK_INFO, {"symbols": "AAPL"}, [265598])
+        await cache.set(IBKREndpoint.CONTRACT_INFO, {"conid": 265598}, {"symbol": "AAPL"})
+
+        clock.now += 50
+        assert await cache.get(IBKREndpoint.STOCK_INFO, {"symbols": "AAPL"}) == (
+            False,
+            None,
+        )
+        found, _ = await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 265598})
+        assert found
+
+        clock.now += 50
+        found, _ = await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 265598})
+        assert not found
+
+    asyncio.run(main())
+
+
+def test_cached_values_are_copies() -> None:
+    async def main() -> None:
+        cache = MetadataCache()
+        value = {"strikes": [100.0, 105.0]}
+        await cache.set(IBKREndpoint.STRIKES, {"conid": 1}, value)
+        value["strikes"].append(110.0)
+
+        _, cached = await cache.get(IBKREndpoint.STRIKES, {"conid": 1})
+        assert cached == {"strikes": [100.0, 105.0]}
+        cached["strikes"].clear()
+        assert await cache.get(IBKREndpoint.STRIKES, {"conid": 1}) == (
+            True,
+            {"strikes": [100.0, 105.0]},
+        )
+
+    asyncio.run(main())
+
+
+def test_entries_survive_a_restart(tmp_path: Path) -> None:
+    path = tmp_path / "metadata.sqlite"
+
+    async def main() -> None:
+        cache = MetadataCache(path=path)
+        await cache.set(IBKREndpoint.CONTRACT_INFO, {"conid": 1}, {"symbol": "AAPL"})
+        await cache.set(IBKREndpoint.CONTRACT_INFO, {"conid": 2}, {"symbol": "MSFT"})
+        cache.close()
+
+        cache = MetadataCache(path=path)
+        assert await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 1}) == (
+            True,
+            {"symbol": "AAPL"},
+        )
+        await cache.invalidate(IBKREndpoint.CONTRACT_INFO, {"conid": 1})
+        cache.close()
+
+        cache = MetadataCache(path=path)
+        found, _ = await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 1})
+        assert not found
+        found, _ = await cache.get(IBKREndpoint.CONTRACT_INFO, {"conid": 2})
+        assert found
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_expired_rows_are_purged(tmp_path: Path, clock: FakeClock) -> None:
+    path = tmp_path / "metadata.sqlite"
+
+    async def main() -> None:
+        cache = MetadataCache(path=path, ttls={IBKREndpoint.STRIKES: 10})
+        await cache.set(IBKREndpoint.STRIKES, {"conid": 1}, [100.0])
+        await cache.set(IBKREndpoint.STRIKES, {"conid": 2}, [100.0])
+        assert stored_rows(path) == 2
+
+        # Writing drops the rows that expired in the meantime
+        clock.now += 20
+        await cache.set(IBKREndpoint.STRIKES, {"conid": 3}, [100.0])
+        assert stored_rows(path) == 1
+        cache.close()
+
+        # So does opening the database
+        clock.now += 20
+        MetadataCache(path=path).close()
+        assert stored_rows(path) == 0
+
+    asyncio.run(main())
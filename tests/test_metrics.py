@@ -0,0 +1,76 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.metrics import Histogram, Metrics
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+def test_histogram_quantiles_are_bucket_bounds() -> None:
+    histogram = Histogram((0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+
+    # Upper bounds are inclusive
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert (histogram.count, histogram.sum) == (4, 5.65)
+
+
+def test_prometheus_export() -> None:
+    observed: List[Tuple[str, Dict[str, str], float]] = []
+    metrics = Metrics(callback=lambda *args: observed.append(args))
+    metrics.observe("ibkr_response_bytes", 300, buckets=(256, 1024), endpoint="TICKLE")
+    metrics.increment("ibkr_responses_total", endpoint="TICKLE", status="200")
+    metrics.increment("ibkr_responses_total", endpoint="TICKLE", status="200")
+    metrics.increment("custom_total", path='a"b\\c')
+    metrics.register_gauge("ibkr_rate_limit", "endpoint", lambda: {"TICKLE": 1.0})
+
+    assert metrics.to_prometheus().splitlines() == [
+        "# HELP ibkr_response_bytes Size of response bodies",
+        "# TYPE ibkr_response_bytes histogram",
+        'ibkr_response_bytes_bucket{endpoint="TICKLE",le="256"} 0',
+        'ibkr_response_bytes_bucket{endpoint="TICKLE",le="1024"} 1',
+        'ibkr_response_bytes_bucket{endpoint="TICKLE",le="+Inf"} 1',
+        'ibkr_response_bytes_sum{endpoint="TICKLE"} 300.0',
+        'ibkr_response_bytes_count{endpoint="TICKLE"} 1',
+        'custom_total{path="a\\"b\\\\c"} 1',
+        "# HELP ibkr_responses_total Responses by status",
+        "# TYPE ibkr_responses_total counter",
+        'ibkr_responses_total{endpoint="TICKLE",status="200"} 2',
+        "# HELP ibkr_rate_limit Currently allowed requests per second",
+        "# TYPE ibkr_rate_limit gauge",
+        'ibkr_rate_limit{endpoint="TICKLE"} 1.0',
+    ]
+    assert observed[0] == ("ibkr_response_bytes", {"endpoint": "TICKLE"}, 300)
+    assert len(observed) == 4
+
+
+def test_client_requests_are_measured() -> None:
+    async def main() -> Metrics:
+        metrics = Metrics()
+        async with MockGateway() as gateway:
+            async with IBKRRESTClient(
+                gateway.base_url, keepalive=False, metrics=metrics
+            ) as client:
+                await client._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+        return metrics
+
+    metrics = asyncio.run(main())
+    name = IBKREndpoint.PORTFOLIO_ACCOUNTS.name
+    assert metrics.counter("ibkr_responses_total", endpoint=name, status="200") == 1
+    for histogram in (
+        "ibkr_request_queue_seconds",
+        "ibkr_request_ttfb_seconds",
+        "ibkr_request_duration_seconds",
+        "ibkr_response_bytes",
+        "ibkr_response_decode_seconds",
+    ):
+        observed = metrics.histogram(histogram, endpoint=name)
+        assert observed is not None and observed.count == 1, histogram
+    exported = metrics.to_prometheus()
+    assert f'ibkr_rate_limit{{endpoint="{name}"}} 10.0' in exported
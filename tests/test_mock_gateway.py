@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.contract_search.contract_search import IBKRContractSearch
+from ibwebapi.market_data.market_data import (
+    HISTORY_MAX_POINTS,
+    BarSize,
+    IBKRMarketData,
+    TimePeriod,
+)
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway
+
+# Settled long ago, so every fetched range is marked as covered
+END = datetime(2024, 1, 10, 16, 0)
+
+
+def test_client_stays_within_the_gateway_rate_limit() -> None:
+    endpoint = IBKREndpoint.STOCK_INFO
+    rate = endpoint.value.rate_limit
+    behaviors = {endpoint: EndpointBehavior(rate_limit=rate)}
+
+    async def main() -> None:
+        async with MockGateway(behaviors=behaviors) as gateway:
+            async with IBKRContractSearch(
+                gateway.base_url, keepalive=False, use_metadata_cache=False
+            ) as client:
+                loop = asyncio.get_running_loop()
+                started = loop.time()
+                await asyncio.gather(
+                    *(client.get_stock_info(f"S{i}") for i in range(2 * rate + 1))
+                )
+                elapsed = loop.time() - started
+
+        assert gateway.responses[(endpoint.name, 200)] == 2 * rate + 1
+        assert gateway.responses[(endpoint.name, 429)] == 0
+        assert elapsed >= 1.9
+
+    asyncio.run(main())
+
+
+def test_requests_wait_for_an_expired_session_to_recover() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(auth_probe_interval=0.05, max_auth_probe_interval=0.1)
+            async with IBKRRESTClient(
+                gateway.base_url, keepalive=False, shared_session=shared
+            ) as client:
+                gateway.expire_session(1.0)
+                accounts = await asyncio.wait_for(
+                    client._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS), 10
+                )
+
+        assert accounts
+        assert gateway.responses[(IBKREndpoint.PORTFOLIO_ACCOUNTS.name, 401)] >= 1
+        assert shared.health.outages == 1
+
+    asyncio.run(main())
+
+
+def test_capped_history_responses_are_completed(tmp_path: Path) -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+                data = await client.get_historical_data_columnar(
+                    "265598", BarSize.MIN_1, TimePeriod.WEEK_1, start_time=END
+                )
+
+        # The mock gateway has bars around the clock, one per minute
+        assert len(data.data) > HISTORY_MAX_POINTS
+        assert len(data.data) >= TimePeriod.WEEK_1.duration_ms // 60_000 - 1
+        assert list(data.data.t) == sorted(set(data.data.t))
+        assert gateway.requests[IBKREndpoint.HISTORICAL_DATA.name] > 1
+
+    asyncio.run(main())
+
+
+def test_backfill_fills_the_range_once(tmp_path: Path) -> None:
+    start = END - timedelta(days=10)
+    endpoint = IBKREndpoint.HISTORICAL_DATA
+    behaviors = {endpoint: EndpointBehavior(rate_limit=endpoint.value.rate_limit)}
+
+    async def main() -> None:
+        async with MockGateway(behaviors=behaviors) as gateway:
+            async with IBKRMarketData(
+                gateway.base_url, cache_dir=str(tmp_path), keepalive=False
+            ) as client:
+                data = await client.backfill("265598", BarSize.MIN_5, start, END)
+                requests = gateway.requests[IBKREndpoint.HISTORICAL_DATA.name]
+                assert requests > 1
+
+                again = await client.backfill("265598", BarSize.MIN_5, start, END)
+                assert gateway.requests[IBKREndpoint.HISTORICAL_DATA.name] == requests
+
+        steps = {b - a for a, b in zip(data.data.t, data.data.t[1:])}
+        assert steps == {BarSize.MIN_5.duration_ms}
+        assert len(data.data) >= 10 * 24 * 12
+        assert list(again.data.t) == list(data.data.t)
+        assert gateway.responses[(IBKREndpoint.HISTORICAL_DATA.name, 429)] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from ibwebapi.portfolio.portfolio import (
+    AccountSnapshot,
+    IBKRPortfolio,
+    PortfolioSnapshot,
+    SummaryValue,
+)
+
+
+def account(account_id: str, amount: float, currency: str) -> AccountSnapshot:
+    return AccountSnapshot(
+        account_id,
+        summary={"netliquidation": SummaryValue(amount=amount, currency=currency)},
+    )
+
+
+def test_totals_are_kept_per_currency() -> None:
+    snapshot = PortfolioSnapshot(
+        {
+            "U1": account("U1", 100.0, "USD"),
+            "U2": account("U2", 50.0, "USD"),
+            "U3": account("U3", 70.0, "EUR"),
+        }
+    )
+
+    assert snapshot.totals("netliquidation") == {"USD": 150.0, "EUR": 70.0}
+    assert snapshot.total("netliquidation", "USD") == 150.0
+    assert snapshot.total("netliquidation", "CHF") == 0.0
+    with pytest.raises(ValueError, match="several currencies"):
+        snapshot.total("netliquidation")
+
+    del snapshot.accounts["U3"]
+    assert snapshot.total("netliquidation") == 150.0
+
+
+def test_max_concurrency_must_be_positive() -> None:
+    client = IBKRPortfolio("http://localhost")
+    with pytest.raises(ValueError):
+        asyncio.run(client.get_portfolio_snapshot(["U1"], max_concurrency=0))
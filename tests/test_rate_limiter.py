@@ -0,0 +1,171 @@
+import asyncio
+from typing import List
+
+from ibwebapi.client.endpoints import IBKREndpoint, Priority
+from ibwebapi.client.rate_limiter import AdaptiveRate, RateLimiter, TokenBucket
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway
+
+
+def max_in_window(times: List[float], window: float = 1.0) -> int:
+    """Largest number of timestamps inside any half-open window of ``window`` seconds."""
+    times = sorted(times)
+    best = 0
+    start = 0
+    for end, t in enumerate(times):
+        # Small tolerance for timer resolution
+        while t - times[start] >= window - 1e-6:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def acquire_all(limiter: RateLimiter, endpoint: IBKREndpoint, count: int) -> List[float]:
+    loop = asyncio.get_running_loop()
+    times: List[float] = []
+
+    async def acquire() -> None:
+        await limiter.acquire(endpoint)
+        times.append(loop.time())
+
+    await asyncio.gather(*(acquire() for _ in range(count)))
+    return times
+
+
+def test_no_window_exceeds_endpoint_rate_limit():
+    endpoint = IBKREndpoint.HISTORICAL_DATA
+    rate = endpoint.value.rate_limit
+
+    async def run() -> List[float]:
+        limiter = RateLimiter(adaptive=False)
+        times = await acquire_all(limiter, endpoint, 2 * rate + 2)
+        # An idle pause must not bank tokens for a burst
+        await asyncio.sleep(1.5)
+        times += await acquire_all(limiter, endpoint, rate + 2)
+        return times
+
+    assert max_in_window(asyncio.run(run())) <= rate
+
+
+def test_global_budget_is_not_exceeded_across_endpoints():
+    async def run() -> List[float]:
+        limiter = RateLimiter(global_rate_limit=4, adaptive=False)
+        results = await asyncio.gather(
+            acquire_all(limiter, IBKREndpoint.STOCK_INFO, 5),
+            acquire_all(limiter, IBKREndpoint.SECDEF, 5),
+        )
+        return [t for times in results for t in times]
+
+    assert max_in_window(asyncio.run(run())) <= 4
+
+
+def test_burst_is_opt_in():
+    endpoint = IBKREndpoint.STOCK_INFO
+    rate = endpoint.value.rate_limit
+
+    async def run() -> List[float]:
+        return await acquire_all(RateLimiter(burst=1.0, adaptive=False), endpoint, rate)
+
+    times = asyncio.run(run())
+    # A full bucket of ``rate`` tokens lets the first ``rate`` requests through at once
+    assert max(times) - min(times) < 0.1
+
+
+def test_bucket_serves_higher_priority_first():
+    async def run() -> List[Priority]:
+        bucket = TokenBucket(20)
+        await bucket.acquire()
+        order: List[Priority] = []
+
+        async def acquire(priority: Priority) -> None:
+            await bucket.acquire(priority)
+            order.append(priority)
+
+        await asyncio.gather(
+            acquire(Priority.BULK), acquire(Priority.NORMAL), acquire(Priority.INTERACTIVE)
+        )
+        return order
+
+    assert asyncio.run(run()) == [Priority.INTERACTIVE, Priority.NORMAL, Priority.BULK]
+
+
+def test_rate_decreases_once_per_burst_and_recovers_additively():
+    rate = AdaptiveRate(10, floor=1.0)
+
+    assert rate.on_throttled(0.0) and rate.rate == 5
+    # Rejections of requests already in flight count as the same signal
+    assert not rate.on_throttled(0.5) and rate.rate == 5
+    assert rate.on_throttled(1.5) and rate.rate == 2.5
+    assert rate.throttled == 3
+
+    assert not rate.on_success(2.0)
+    assert rate.on_success(2.5) and rate.rate == 3.5
+    for step in range(7):
+        rate.on_success(3.5 + step)
+    assert rate.rate == 10
+    assert not rate.on_success(100.0)
+
+    for step in range(10):
+        rate.on_throttled(200.0 + 2 * step)
+    assert rate.rate == 1.0
+
+
+def test_feedback_adjusts_the_endpoint_rate():
+    endpoint = IBKREndpoint.STOCK_INFO
+    ceiling = endpoint.value.rate_limit
+
+    async def run() -> None:
+        limiter = RateLimiter()
+        for status in (429, 503):
+            limiter.feedback(endpoint, status)
+        # Both arrived within one interval
+        assert limiter.effective_rate(endpoint) == ceiling / 2
+        limiter.feedback(endpoint, 404)
+        limiter.feedback(endpoint, 200)
+        assert limiter.effective_rate(endpoint) == ceiling / 2
+        assert limiter.effective_rates() == {endpoint.name: ceiling / 2}
+
+        static = RateLimiter(adaptive=False)
+        static.feedback(endpoint, 429)
+        assert static.effective_rate(endpoint) == ceiling
+
+    asyncio.run(run())
+
+
+def test_retry_after_withholds_tokens():
+    endpoint = IBKREndpoint.STOCK_INFO
+
+    async def run() -> float:
+        limiter = RateLimiter(adaptive=False)
+        await limiter.acquire(endpoint)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        limiter.feedback(endpoint, 429, retry_after=0.5)
+        await limiter.acquire(endpoint)
+        return loop.time() - started
+
+    assert 0.45 <= asyncio.run(run()) < 0.7
+
+
+def test_client_adapts_to_a_stricter_gateway():
+    endpoint = IBKREndpoint.STOCK_INFO
+
+    async def main() -> None:
+        behaviors = {endpoint: EndpointBehavior(rate_limit=4)}
+        async with MockGateway(behaviors=behaviors) as gateway:
+            async with IBKRRESTClient(gateway.base_url, keepalive=False) as client:
+                results = await asyncio.gather(
+                    *(
+                        client._request(
+                            "GET", endpoint, query_params={"symbols": f"S{i}"}
+                        )
+                        for i in range(8)
+                    )
+                )
+                rate = client.rate_limiter.effective_rate(endpoint)
+
+        assert all(results)
+        assert gateway.responses[(endpoint.name, 429)] > 0
+        assert rate < endpoint.value.rate_limit
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import asyncio
+from pathlib import Path
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.contract_search.contract_search import IBKRContractSearch
+from ibwebapi.market_data.market_data import IBKRMarketData
+from ibwebapi.portfolio.portfolio import IBKRPortfolio
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+def test_clients_share_one_pool_and_rate_budget(tmp_path: Path) -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(limit=8, ttl_dns_cache=60, keepalive_timeout=5.0)
+            market_data = IBKRMarketData(
+                gateway.base_url,
+                cache_dir=str(tmp_path),
+                keepalive=False,
+                shared_session=shared,
+            )
+            contract_search = IBKRContractSearch(
+                gateway.base_url, keepalive=False, shared_session=shared
+            )
+            portfolio = IBKRPortfolio(
+                gateway.base_url, keepalive=False, shared_session=shared
+            )
+            clients = (market_data, contract_search, portfolio)
+
+            for client in clients:
+                await client.connect()
+            http = shared.http
+            assert http is not None and shared._users == 3
+            assert http.connector.limit == 8
+            assert all(client.session is http for client in clients)
+            assert all(client.rate_limiter is shared.rate_limiter for client in clients)
+
+            # The pool stays open until the last client disconnects
+            await market_data.disconnect()
+            await contract_search.disconnect()
+            assert not http.closed
+            await portfolio._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+            await portfolio.disconnect()
+            assert http.closed and shared.http is None
+
+            # Reconnecting opens a new pool
+            async with portfolio:
+                assert shared.http is not None and shared.http is not http
+
+    asyncio.run(main())
+
+
+def test_clients_without_a_shared_session_get_their_own() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRRESTClient(
+                gateway.base_url, keepalive=False
+            ) as first, IBKRRESTClient(gateway.base_url, keepalive=False) as second:
+                assert first.shared_session is not second.shared_session
+                assert first.session is not second.session
+                assert first.rate_limiter is not second.rate_limiter
+
+    asyncio.run(main())
+
+
+def test_shared_budget_spans_clients() -> None:
+    endpoint = IBKREndpoint.PORTFOLIO_ACCOUNTS
+
+    async def main() -> float:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(global_rate_limit=5)
+            first, second = (
+                IBKRRESTClient(gateway.base_url, keepalive=False, shared_session=shared)
+                for _ in range(2)
+            )
+            async with first, second:
+                loop = asyncio.get_running_loop()
+                started = loop.time()
+                await asyncio.gather(
+                    *(
+                        # Distinct queries, so nothing is coalesced
+                        client._request("GET", endpoint, query_params={"n": f"{c}{i}"})
+                        for i in range(5)
+                        for c, client in enumerate((first, second))
+                    )
+                )
+                return loop.time() - started
+
+    # Ten requests at five per second across both clients
+    assert asyncio.run(main()) >= 1.7
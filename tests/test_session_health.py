@@ -0,0 +1,97 @@
+import asyncio
+import warnings
+
+import pytest
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.client.session import IBKRSession
+from ibwebapi.client.session_health import SessionUnavailableError
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+def test_removed_unauthorized_delays_warn() -> None:
+    with pytest.warns(DeprecationWarning, match="unauthorized_retry_delay"):
+        IBKRRESTClient("http://localhost", unauthorized_retry_delay=300.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        IBKRRESTClient("http://localhost")
+
+
+def test_recovery_does_not_depend_on_the_reporting_client() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(auth_probe_interval=0.05, max_auth_probe_interval=0.1)
+            reporter, other = (
+                IBKRRESTClient(gateway.base_url, keepalive=False, shared_session=shared)
+                for _ in range(2)
+            )
+            async with other:
+                await reporter.connect()
+                gateway.expire_session(1.0)
+                request = asyncio.ensure_future(
+                    reporter._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+                )
+                while shared.health.healthy:
+                    await asyncio.sleep(0.01)
+                # The client that saw the 401 goes away while the session recovers
+                request.cancel()
+                await reporter.disconnect()
+
+                accounts = await asyncio.wait_for(
+                    other._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS), 10
+                )
+                assert accounts
+                assert shared.health.outages == 1
+
+    asyncio.run(main())
+
+
+def test_session_reused_after_disconnecting_during_an_outage() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(auth_probe_interval=0.05, max_auth_probe_interval=0.1)
+            client = IBKRRESTClient(
+                gateway.base_url, keepalive=False, shared_session=shared, reauth_timeout=5
+            )
+            await client.connect()
+            gateway.expire_session(0.5)
+            request = asyncio.ensure_future(
+                client._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+            )
+            while shared.health.healthy:
+                await asyncio.sleep(0.01)
+            # Every client goes away while the session is reauthenticating
+            request.cancel()
+            await client.disconnect()
+            assert shared.health.healthy
+
+            while not gateway.authenticated:
+                await asyncio.sleep(0.05)
+            async with client:
+                assert await client._request("GET", IBKREndpoint.PORTFOLIO_ACCOUNTS)
+
+    asyncio.run(main())
+
+
+def test_failed_connect_releases_the_session() -> None:
+    async def never_authenticated() -> bool:
+        return False
+
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            shared = IBKRSession(auth_probe_interval=10)
+            client = IBKRRESTClient(
+                gateway.base_url,
+                keepalive=False,
+                shared_session=shared,
+                reauth_timeout=0.1,
+            )
+            shared.health.report_unauthorized(never_authenticated)
+            with pytest.raises(SessionUnavailableError):
+                await client.connect()
+            assert client.session is None
+            assert shared.http is None
+            await shared.close()
+
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+import asyncio
+from typing import Any, Dict, List
+
+from ibwebapi.market_data.fields import MarketDataField
+from ibwebapi.market_data.market_data import IBKRMarketData
+
+FIELDS = [MarketDataField.LAST, MarketDataField.BID]
+
+
+class SnapshotClient(IBKRMarketData):
+    """Answers snapshots from a script instead of the gateway."""
+
+    def __init__(self, responses: Dict[int, List[Dict[str, Any]]]):
+        super().__init__("http://localhost")
+        self.responses = responses
+        self.polls: List[List[int]] = []
+
+    async def _fetch_snapshot(self, conids: List[int], fields: List[str]) -> Any:
+        self.polls.append(conids)
+        return [self.responses[c].pop(0) for c in conids]
+
+
+def test_only_warm_up_entries_are_polled_again() -> None:
+    client = SnapshotClient(
+        {
+            # Warm-up entry first, then data
+            1: [{"conid": 1}, {"conid": 1, "31": "10", "84": "9.9"}],
+            # No bid for this contract: the entry is final as it is
+            2: [{"conid": 2, "31": "20"}],
+        }
+    )
+    snapshot = asyncio.run(client.get_snapshot([1, 2], FIELDS, poll_interval=0))
+
+    assert client.polls == [[1, 2], [1]]
+    assert snapshot.get(1) == {"31": 10.0, "84": 9.9}
+    assert snapshot.get(2)["31"] == 20.0
+    assert snapshot.missing == [2]
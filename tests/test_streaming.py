@@ -0,0 +1,132 @@
+import asyncio
+import json
+from typing import Any, Callable
+
+import pytest
+
+from ibwebapi.client.rest_client import IBKRRESTClient
+from ibwebapi.market_data.fields import MarketDataField
+from ibwebapi.market_data.market_data import BarSize, TimePeriod
+from ibwebapi.streaming.streaming import IBKRStreamer, Tick
+from ibwebapi.testing.mock_gateway import MockGateway
+
+
+async def eventually(condition: Callable[[], Any], timeout: float = 5.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def smd_fields(message: str) -> list:
+    return json.loads(message.split("+", 2)[2])["fields"]
+
+
+def test_ticks_are_delivered_and_fields_merged() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRRESTClient(gateway.base_url, keepalive=False) as client:
+                async with IBKRStreamer(client) as streamer:
+                    await streamer.wait_connected(5)
+                    first = await streamer.subscribe_market_data(265598)
+                    tick = await asyncio.wait_for(first.get(), 5)
+                    assert isinstance(tick, Tick)
+                    assert tick.conid == 265598 and tick.last is not None
+
+                    second = await streamer.subscribe_market_data(
+                        265598, [MarketDataField.LAST, "7762"]
+                    )
+                    await eventually(lambda: len(gateway.ws_messages) >= 3)
+                    requests = [m for m in gateway.ws_messages if m.startswith("smd+")]
+                    # The second consumer's extra field widened the shared subscription
+                    assert "7762" not in smd_fields(requests[0])
+                    assert set(smd_fields(requests[0])) < set(smd_fields(requests[-1]))
+                    assert "7762" in smd_fields(requests[-1])
+                    assert isinstance(await asyncio.wait_for(second.get(), 5), Tick)
+
+    asyncio.run(main())
+
+
+def test_bar_subscriptions_reject_other_parameters() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRRESTClient(gateway.base_url, keepalive=False) as client:
+                async with IBKRStreamer(client) as streamer:
+                    await streamer.wait_connected(5)
+                    bars = await streamer.subscribe_bars(265598, BarSize.MIN_5)
+                    update = await asyncio.wait_for(bars.get(), 5)
+                    assert len(update) > 0
+                    with pytest.raises(ValueError):
+                        await streamer.subscribe_bars(
+                            265598, BarSize.MIN_5, TimePeriod.WEEK_1
+                        )
+
+    asyncio.run(main())
+
+
+def test_resubscribes_after_connection_loss() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            async with IBKRRESTClient(gateway.base_url, keepalive=False) as client:
+                streamer = IBKRStreamer(client, reconnect_delay=0.05)
+                async with streamer:
+                    await streamer.wait_connected(5)
+                    subscription = await streamer.subscribe_market_data(265598)
+                    await asyncio.wait_for(subscription.get(), 5)
+
+                    await gateway.drop_websockets()
+                    await eventually(lambda: subscription.interruptions == 1)
+                    await streamer.wait_connected(5)
+                    await eventually(lambda: len(gateway.ws_messages) >= 2)
+                    # Drain updates sent before the drop, then expect fresh ones
+                    while not subscription._queue.empty():
+                        subscription._queue.get_nowait()
+                    update = await asyncio.wait_for(subscription.get(), 5)
+                    assert isinstance(update, Tick)
+                    assert streamer.reconnects == 1
+                    smd = [m for m in gateway.ws_messages if m.startswith("smd+")]
+                    assert len(smd) == 2
+
+    asyncio.run(main())
+
+
+def test_keeps_retrying_while_client_is_disconnected() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            client = IBKRRESTClient(gateway.base_url, keepalive=False)
+            streamer = IBKRStreamer(
+                client, reconnect_delay=0.05, max_reconnect_delay=0.1
+            )
+            async with streamer:
+                # Starting before the client is connected must not end the task
+                await eventually(lambda: streamer.reconnects >= 2)
+                assert not streamer._task.done()
+                async with client:
+                    await streamer.wait_connected(5)
+
+    asyncio.run(main())
+
+
+def test_keeps_retrying_while_session_is_unauthenticated() -> None:
+    async def main() -> None:
+        async with MockGateway() as gateway:
+            client = IBKRRESTClient(
+                gateway.base_url, keepalive=False, reauth_timeout=0.1
+            )
+            client.health.probe_interval = 0.05
+            async with client:
+                # Outlasts the tickle rate limit, so the tickle below sees it
+                gateway.expire_session(2.0)
+                # Reports the session as unauthenticated, parking further requests
+                await client.tickle()
+                assert not client.health.healthy
+                streamer = IBKRStreamer(
+                client, reconnect_delay=0.05, max_reconnect_delay=0.1
+            )
+                async with streamer:
+                    await eventually(lambda: streamer.reconnects >= 1)
+                    assert not streamer._task.done()
+                    await streamer.wait_connected(10)
+
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from ibwebapi.market_data.columnar import BarColumns
+from ibwebapi.market_data.market_data import HistoricalBar, _to_epoch_ms
+
+# 2024-03-01 14:30:00 UTC
+EPOCH_MS = 1_709_303_400_000
+
+
+def test_bar_timestamps_are_utc() -> None:
+    expected = datetime(2024, 3, 1, 14, 30)
+    bar = HistoricalBar(1.0, 1.0, 1.0, 1.0, 10.0, EPOCH_MS)
+    view = BarColumns.from_rows([(EPOCH_MS, 1.0, 1.0, 1.0, 1.0, 10.0)])[0]
+
+    assert bar.timestamp == expected
+    assert view.timestamp == expected
+    assert _to_epoch_ms(bar.timestamp) == EPOCH_MS
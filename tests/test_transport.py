@@ -0,0 +1,64 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ibwebapi.client.endpoints import IBKREndpoint
+from ibwebapi.client.metrics import Metrics
+from ibwebapi.client.transport import RecordingTransport, ReplayTransport, Transport
+from ibwebapi.contract_search.contract_index import ContractRecord
+from ibwebapi.contract_search.contract_search import Exchange, IBKRContractSearch
+from ibwebapi.testing.mock_gateway import EndpointBehavior, MockGateway
+
+ENDPOINT = IBKREndpoint.ALL_CONIDS
+BEHAVIORS = {ENDPOINT: EndpointBehavior(payload_size=500)}
+
+
+async def stream(client: IBKRContractSearch) -> List[ContractRecord]:
+    # Small chunks, so the array is parsed over many reads
+    return [r async for r in client.iter_all_conids(Exchange.NASDAQ, chunk_size=256)]
+
+
+def test_streamed_responses_are_recorded_and_replayed(tmp_path: Path) -> None:
+    log = tmp_path / "log.jsonl"
+
+    async def main() -> None:
+        async with MockGateway(behaviors=BEHAVIORS) as gateway:
+            with RecordingTransport(log) as recording:
+                async with IBKRContractSearch(
+                    gateway.base_url, keepalive=False, transport=recording
+                ) as client:
+                    recorded = await stream(client)
+
+        metrics = Metrics()
+        with ReplayTransport(log) as replay:
+            async with IBKRContractSearch(
+                "http://replay.invalid/v1/api",
+                keepalive=False,
+                transport=replay,
+                metrics=metrics,
+            ) as client:
+                replayed = await stream(client)
+
+        assert len(recorded) == 500
+        assert replayed == recorded
+        # Streamed requests are measured like any other request
+        name = ENDPOINT.name
+        assert metrics.counter("ibkr_responses_total", endpoint=name, status="200") == 1
+        duration = metrics.histogram("ibkr_request_duration_seconds", endpoint=name)
+        assert duration is not None and duration.count == 1
+        bodies = [r["b"] for r in map(json.loads, log.open()) if r["e"] == name]
+        size = metrics.histogram("ibkr_response_bytes", endpoint=name)
+        assert size is not None and size.sum == len(bodies[0].encode())
+
+    asyncio.run(main())
+
+
+def test_transports_must_implement_request() -> None:
+    class Incomplete(Transport):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()